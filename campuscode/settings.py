@@ -76,4 +76,61 @@ TIME_ZONE = 'UTC'
 USE_I18N = True
 USE_TZ = True
 STATIC_URL = 'static/'
-DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+
+# --- CODE EXECUTION (core.executors, core.judge) ---
+# "piston" runs code on PISTON_API; "local" runs it in rlimited subprocesses here
+JUDGE_BACKEND = "piston"
+PISTON_API = "https://emkc.org/api/v2/piston/execute"
+PISTON_TIMEOUT = 5  # seconds per execution request
+PISTON_RETRIES = 2  # extra attempts on connection errors and 429/502/503/504
+PISTON_BREAKER_THRESHOLD = 5  # consecutive failures before calls fail fast
+PISTON_BREAKER_RESET = 30  # seconds before a trial call is let through again
+PISTON_MAX_IN_FLIGHT = 8  # concurrent requests to Piston per process
+JUDGE_MAX_IN_FLIGHT = 32  # concurrent executions per process, all backends
+JUDGE_ACQUIRE_TIMEOUT = 10  # seconds to wait for a free slot before answering 503
+
+# Test cases graded concurrently per process (shared by all submissions)
+JUDGE_MAX_PARALLEL = 8
+
+# Local backend limits, per execution
+JUDGE_LOCAL_WORKERS = 4  # programs running at once
+JUDGE_LOCAL_CPU_SECONDS = 2
+JUDGE_LOCAL_WALL_SECONDS = 5
+JUDGE_LOCAL_MEMORY_MB = 256
+JUDGE_LOCAL_OUTPUT_BYTES = 1024 * 1024
+JUDGE_LOCAL_MAX_PROCESSES = 256  # processes and threads of the judge's user account; root is exempt
+# Compiled builds cached by (language, toolchain version, code hash); defaults to the temp dir
+# JUDGE_ARTIFACT_DIR = BASE_DIR / 'judge_artifacts'
+JUDGE_ARTIFACT_CACHE_SIZE = 500
+
+# Queued submissions (core.judge_queue, `manage.py run_judge`)
+JUDGE_LEASE_SECONDS = 120  # a worker's hold on a submission before others may retry it
+JUDGE_MAX_ATTEMPTS = 3
+JUDGE_UNAVAILABLE_RETRY_SECONDS = 30  # requeue delay while the backend is unavailable
+JUDGE_FAIR_WINDOW = 300  # seconds of history used to take turns between users (core.scheduler)
+JUDGE_RUN_CODE_SHARE = 0.25  # share of THROTTLE_MAX_EXECUTIONS left to run_code while submissions wait
+JUDGE_VERDICT_CACHE_SIZE = 1024  # verdicts remembered per worker for identical resubmissions
+JUDGE_CHECKER_SECONDS = 10  # wall-time limit for a problem's custom checker
+JUDGE_REJUDGE_WORKERS = 4  # submissions graded at once by `manage.py rejudge`
+
+# Per-user rate limits (core.throttle): endpoint -> (requests, per_seconds, burst)
+THROTTLE_RATES = {
+    'run_code': (20, 60, 10),
+    'submit': (10, 60, 5),
+}
+THROTTLE_MAX_EXECUTIONS = 16  # run_code executions at once across all web processes
+THROTTLE_SLOT_SECONDS = 60  # a slot left by a crashed process is reused after this long
+
+# Test case data files (core.testdata), gzip-compressed and named by SHA-256
+TESTDATA_DIR = BASE_DIR / 'testdata'
+
+# Cached report PDFs (core.reports), rendered in background processes
+REPORT_DIR = BASE_DIR / 'reports'
+REPORT_WORKERS = 2  # rendering processes per web process
+REPORT_WAIT_SECONDS = 10  # wait for a fresh PDF before serving the previous one
+
+# Admin dashboard submission insights (core.analytics), refreshed by cron
+ANALYTICS_CACHE_SECONDS = 60  # per-process cache of the latest snapshot
+TELEMETRY_RETENTION_DAYS = 7  # TestRun rows older than this are pruned by refresh_analytics
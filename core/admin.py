@@ -1,3 +1,4 @@
+from django import forms
 from django.contrib import admin
 from .models import (
     User,
@@ -7,14 +8,98 @@ from .models import (
     ForumThread,
     ForumReply,
     ForumVote,
+    XPEvent,
+    TestCase,
 )
+from .problemstats import COUNTERS
+from .rejudge import rejudge
 
 
 # Register your models here.
 admin.site.register(User)
-admin.site.register(Problem)
 admin.site.register(Contest)
 admin.site.register(ForumCategory)
 admin.site.register(ForumThread)
 admin.site.register(ForumReply)
 admin.site.register(ForumVote)
+
+
+@admin.register(XPEvent)
+class XPEventAdmin(admin.ModelAdmin):
+    list_display = ('user', 'delta', 'reason', 'created_at', 'revoked_at')
+    list_filter = ('reason',)
+    search_fields = ('user__username',)
+
+
+class TestCaseForm(forms.ModelForm):
+    """Edits a test case's input and expected output, which live in core.testdata, not in the row."""
+
+    # Larger data is shown read-only rather than loaded into a text area
+    EDIT_LIMIT = 1024 * 1024
+
+    input_data = forms.CharField(widget=forms.Textarea(attrs={'rows': 4}), required=False, strip=False)
+    expected_output = forms.CharField(widget=forms.Textarea(attrs={'rows': 4}), required=False, strip=False)
+
+    class Meta:
+        model = TestCase
+        fields = ('input_data', 'expected_output', 'is_hidden')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for name, size in (('input_data', self.instance.input_size), ('expected_output', self.instance.output_size)):
+            if size > self.EDIT_LIMIT:
+                self.fields[name].disabled = True
+                self.fields[name].help_text = f"{size} bytes, too large to edit here"
+            elif self.instance.pk:
+                self.initial[name] = getattr(self.instance, name)
+
+    def save(self, commit=True):
+        for name in ('input_data', 'expected_output'):
+            if (not self.instance.pk or name in self.changed_data) and not self.fields[name].disabled:
+                # The setters hash the text; save() writes it to the store
+                setattr(self.instance, name, self.cleaned_data[name])
+        return super().save(commit)
+
+
+class TestCaseInline(admin.StackedInline):
+    model = TestCase
+    form = TestCaseForm
+    extra = 0
+    readonly_fields = ('input_size', 'output_size', 'runs', 'failures')
+
+
+@admin.register(TestCase)
+class TestCaseAdmin(admin.ModelAdmin):
+    form = TestCaseForm
+    fields = ('problem', 'input_data', 'expected_output', 'is_hidden', 'input_size', 'output_size', 'runs', 'failures')
+    readonly_fields = ('input_size', 'output_size', 'runs', 'failures')
+    list_display = ('__str__', 'problem', 'is_hidden', 'input_size', 'output_size')
+    list_filter = ('is_hidden',)
+    list_select_related = ('problem',)
+
+
+@admin.register(Problem)
+class ProblemAdmin(admin.ModelAdmin):
+    list_display = ('title', 'difficulty', 'points', 'checker', 'acceptance')
+    # Bumped concurrently with F() by core.problemstats; saving the form must not write them back
+    readonly_fields = COUNTERS
+    inlines = [TestCaseInline]
+    actions = ['rejudge_submissions']
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+        # Leave out the counters even as loaded with this request
+        obj.save(update_fields=[
+            f.name for f in obj._meta.concrete_fields if not f.primary_key and f.name not in COUNTERS
+        ])
+
+    @admin.action(description="Rejudge submissions with stale verdicts")
+    def rejudge_submissions(self, request, queryset):
+        # Runs in the request; use `manage.py rejudge` for large rejudges
+        counts = rejudge(queryset)
+        self.message_user(
+            request,
+            f"Rejudged {counts['rejudged']} of {counts['total']} stale submissions: "
+            f"{counts['changed']} verdicts changed, {counts['failed']} could not be graded.",
+        )
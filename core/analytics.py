@@ -0,0 +1,164 @@
+"""
+Submission insights for the admin dashboard.
+
+Counting the whole Submission table on each page view does not scale, so
+the dashboard reads a snapshot instead. `manage.py refresh_analytics`
+(run it periodically, e.g. every few minutes from cron) calls refresh():
+
+1. Submissions are rolled up into SubmissionRollup, one row per hour,
+   problem, language and college. Only recent hours are recounted: those
+   since the previous run, and any that then still held a submission
+   waiting to be judged. Verdicts flipped by a rejudge in older hours are
+   picked up by `refresh_analytics --full`.
+2. A snapshot is computed from the rollup and the per-problem counters
+   (core.problemstats). It holds solve rates of the most attempted
+   problems, language usage, the last 24 hours' volume and college
+   activity over the last 30 days, plus the judge latency report of
+   core.telemetry. It is stored as an AnalyticsSnapshot.
+
+latest() returns the stored snapshot and its time. Each web process
+caches it for ANALYTICS_CACHE_SECONDS, so the dashboard costs no query
+most of the time.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Min, Q, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from . import telemetry
+from .models import AnalyticsSnapshot, Problem, Submission, SubmissionRollup, User
+
+
+CACHE_SECONDS = getattr(settings, 'ANALYTICS_CACHE_SECONDS', 60)
+CACHE_KEY = 'analytics:snapshot'
+# Submissions committed this long after they were created are still counted
+SETTLE = timedelta(minutes=5)
+TOP_PROBLEMS = 10
+COLLEGE_DAYS = 30
+
+
+def refresh(full=False):
+    """Roll up recent submissions and store a new snapshot. Returns (hours recounted, snapshot)."""
+    now = timezone.now()
+    with transaction.atomic():
+        previous = None if full else AnalyticsSnapshot.objects.order_by('-created_at').first()
+        hours = _roll_up(previous.recount_from if previous else None)
+        snapshot = AnalyticsSnapshot.objects.create(created_at=now, data=build(now), recount_from=_recount_from(now))
+        AnalyticsSnapshot.objects.exclude(pk=snapshot.pk).delete()
+    cache.delete(CACHE_KEY)
+    return hours, snapshot
+
+
+def latest():
+    """(as_of, data) of the last snapshot, or (None, None) if there is none yet."""
+    cached = cache.get(CACHE_KEY)
+    if cached is None:
+        snapshot = AnalyticsSnapshot.objects.order_by('-created_at').first()
+        cached = (snapshot.created_at, snapshot.data) if snapshot else (None, None)
+        cache.set(CACHE_KEY, cached, CACHE_SECONDS)
+    return cached
+
+
+def _recount_from(now):
+    """Start of the oldest hour that may still change after a refresh at `now`."""
+    oldest = now - SETTLE
+    unjudged = Submission.objects.filter(status__in=('Queued', 'Running')).aggregate(at=Min('submitted_at'))['at']
+    if unjudged is not None:
+        oldest = min(oldest, unjudged)
+    return _hour(oldest)
+
+
+def _hour(at):
+    return at.replace(minute=0, second=0, microsecond=0)
+
+
+def _roll_up(since):
+    """Recount the rollup rows from `since` (None: all of them). Returns the hours recounted."""
+    submissions = Submission.objects.all()
+    rollups = SubmissionRollup.objects.all()
+    if since is not None:
+        submissions = submissions.filter(submitted_at__gte=since)
+        rollups = rollups.filter(hour__gte=since)
+    rows = (
+        submissions.order_by()
+        .values('problem_id', 'language', hour=TruncHour('submitted_at'), college=F('user__college'))
+        .annotate(submissions=Count('id'), accepted=Count('id', filter=Q(passed=True)))
+    )
+    rollups.delete()
+    created = SubmissionRollup.objects.bulk_create([SubmissionRollup(**row) for row in rows], batch_size=2000)
+    return len({row.hour for row in created})
+
+
+def build(now):
+    """The snapshot's data, from the rollup, the problem counters and telemetry, as JSON-friendly values."""
+    hour = _hour(now)
+    return {
+        'problems': _problems(),
+        'languages': _languages(),
+        'hourly': _hourly(hour - timedelta(hours=23)),
+        'colleges': _colleges(now - timedelta(days=COLLEGE_DAYS)),
+        'latency': [
+            {'title': 'By Language', 'rows': telemetry.latency_report('language')},
+            {'title': 'Slowest Problems', 'rows': telemetry.latency_report('problem', limit=10)},
+        ],
+    }
+
+
+def _rate(accepted, total):
+    return round(accepted / total * 100, 1) if total else 0
+
+
+def _problems():
+    problems = Problem.objects.filter(attempts__gt=0).order_by('-attempts', 'title')[:TOP_PROBLEMS]
+    return [
+        {'title': p.title, 'difficulty': p.difficulty, 'attempts': p.attempts,
+         'solve_rate': _rate(p.accepted, p.attempts), 'solved_users': p.solved_users}
+        for p in problems
+    ]
+
+
+def _languages():
+    rows = list(
+        SubmissionRollup.objects.values('language')
+        .annotate(submissions=Sum('submissions'), accepted=Sum('accepted')).order_by('-submissions')
+    )
+    total = sum(row['submissions'] for row in rows)
+    return [
+        {'language': row['language'], 'submissions': row['submissions'],
+         'share': _rate(row['submissions'], total), 'solve_rate': _rate(row['accepted'], row['submissions'])}
+        for row in rows
+    ]
+
+
+def _hourly(start):
+    counts = dict(
+        SubmissionRollup.objects.filter(hour__gte=start).values('hour')
+        .annotate(total=Sum('submissions')).values_list('hour', 'total')
+    )
+    hours = [start + timedelta(hours=n) for n in range(24)]
+    peak = max(counts.values(), default=0)
+    return [
+        {'hour': timezone.localtime(h).strftime('%H:00'), 'submissions': counts.get(h, 0),
+         'height': round(counts.get(h, 0) / peak * 100) if peak else 0}
+        for h in hours
+    ]
+
+
+def _colleges(since):
+    students = dict(
+        User.objects.filter(role='Student').order_by().values('college')
+        .annotate(n=Count('id')).values_list('college', 'n')
+    )
+    rows = (
+        SubmissionRollup.objects.filter(hour__gte=since).values('college')
+        .annotate(submissions=Sum('submissions'), accepted=Sum('accepted')).order_by('-submissions')
+    )
+    return [
+        {'college': row['college'], 'students': students.get(row['college'], 0),
+         'submissions': row['submissions'], 'solve_rate': _rate(row['accepted'], row['submissions'])}
+        for row in rows
+    ]
@@ -0,0 +1,196 @@
+"""
+Output checkers.
+
+A checker decides whether a program's output is correct for a test case.
+Both outputs arrive as binary streams and are compared a chunk at a time,
+so memory use does not grow with the output size and reading stops at the
+first difference. A Problem picks its checker with `Problem.checker`:
+
+  exact   equal after stripping leading and trailing whitespace (default)
+  tokens  same whitespace-separated tokens
+  float   same tokens, numbers equal within `checker_epsilon`
+  custom  `Problem.checker_code` decides (exit status 0 accepts)
+"""
+import hashlib
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+
+
+CHUNK_SIZE = 1024 * 1024
+
+# Wall-time limit for one run of a custom checker
+CHECKER_SECONDS = getattr(settings, 'JUDGE_CHECKER_SECONDS', 10)
+
+
+class CheckerError(Exception):
+    """The custom checker crashed, timed out or gave no verdict."""
+
+
+def exact(actual, expected, chunk_size=CHUNK_SIZE):
+    """True if both streams are equal once leading and trailing whitespace is stripped."""
+    a = _lstrip(actual, chunk_size)
+    b = _lstrip(expected, chunk_size)
+    while True:
+        if not a:
+            a = actual.read(chunk_size)
+        if not b:
+            b = expected.read(chunk_size)
+        if not a or not b:
+            # One side ended; the rest of the other may only be whitespace
+            return _blank(a, actual, chunk_size) and _blank(b, expected, chunk_size)
+        n = min(len(a), len(b))
+        if a[:n] != b[:n]:
+            # A difference is only allowed inside trailing whitespace
+            i = _mismatch(a, b, n)
+            return _blank(a[i:], actual, chunk_size) and _blank(b[i:], expected, chunk_size)
+        a, b = a[n:], b[n:]
+
+
+def tokens(actual, expected, chunk_size=CHUNK_SIZE, equal=None):
+    """True if both streams hold the same whitespace-separated tokens.
+
+    Tokens are compared a chunk's worth at a time as lists; `equal(a, b)`
+    is only consulted for pairs that differ byte-wise.
+    """
+    a_chunks = _token_chunks(actual, chunk_size)
+    b_chunks = _token_chunks(expected, chunk_size)
+    a, b, ai, bi = [], [], 0, 0
+    while True:
+        if ai == len(a):
+            a, ai = next(a_chunks, None), 0
+        if bi == len(b):
+            b, bi = next(b_chunks, None), 0
+        if a is None or b is None:
+            return a is None and b is None
+        n = min(len(a) - ai, len(b) - bi)
+        left, right = a[ai:ai + n], b[bi:bi + n]
+        if left != right:
+            if equal is None:
+                return False
+            for x, y in zip(left, right):
+                if x != y and not equal(x, y):
+                    return False
+        ai += n
+        bi += n
+
+
+def floats(actual, expected, epsilon, chunk_size=CHUNK_SIZE):
+    """Like tokens(), but numbers match within `epsilon`, absolute or relative to the expected value."""
+    def close(x, y):
+        try:
+            got, want = float(x), float(y)
+        except ValueError:
+            return False
+        if math.isnan(got) or math.isnan(want):
+            return False
+        return abs(got - want) <= epsilon * max(1.0, abs(want))
+    return tokens(actual, expected, chunk_size, equal=close)
+
+
+def custom(actual, expected, tc, code):
+    """Run checker `code` as `python checker.py input expected actual`.
+
+    Exit status 0 accepts and 1 rejects; anything else raises CheckerError.
+    Checkers are written by problem setters and run with the judge's own
+    privileges, bounded only by CHECKER_SECONDS.
+    """
+    with tempfile.TemporaryDirectory(prefix='campuscode-checker-') as workdir:
+        paths = {name: os.path.join(workdir, name) for name in ('input', 'expected', 'actual')}
+        with tc.open_input() as stdin:
+            _save(stdin, paths['input'])
+        _save(expected, paths['expected'])
+        _save(actual, paths['actual'])
+        checker = os.path.join(workdir, 'checker.py')
+        with open(checker, 'w') as f:
+            f.write(code)
+
+        try:
+            done = subprocess.run(
+                [sys.executable, checker, paths['input'], paths['expected'], paths['actual']],
+                cwd=workdir, capture_output=True, timeout=CHECKER_SECONDS,
+            )
+        except subprocess.TimeoutExpired:
+            raise CheckerError(f"Checker did not finish within {CHECKER_SECONDS}s")
+    if done.returncode in (0, 1):
+        return done.returncode == 0
+    raise CheckerError(done.stderr.decode(errors='replace')[-2000:] or f"Checker exited with {done.returncode}")
+
+
+def for_problem(problem):
+    """The check(actual, expected, tc) function for `problem` (exact when None)."""
+    mode = problem.checker if problem is not None else 'exact'
+    if mode == 'tokens':
+        return lambda actual, expected, tc: tokens(actual, expected)
+    if mode == 'float':
+        epsilon = problem.checker_epsilon
+        return lambda actual, expected, tc: floats(actual, expected, epsilon)
+    if mode == 'custom':
+        code = problem.checker_code
+        return lambda actual, expected, tc: custom(actual, expected, tc, code)
+    return lambda actual, expected, tc: exact(actual, expected)
+
+
+def describe(problem):
+    """Everything about `problem`'s checker that can change a verdict, for cache keys."""
+    if problem is None or problem.checker == 'exact':
+        return 'exact'
+    if problem.checker == 'float':
+        return f"float:{problem.checker_epsilon!r}"
+    if problem.checker == 'custom':
+        return 'custom:' + hashlib.sha256(problem.checker_code.encode()).hexdigest()
+    return problem.checker
+
+
+def _lstrip(stream, chunk_size):
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            return b''
+        chunk = chunk.lstrip()
+        if chunk:
+            return chunk
+
+
+def _blank(head, stream, chunk_size):
+    if head.strip():
+        return False
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        if chunk.strip():
+            return False
+    return True
+
+
+def _mismatch(a, b, n):
+    # Index of the first differing byte in a[:n] / b[:n], by bisection
+    lo, hi = 0, n
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def _token_chunks(stream, chunk_size):
+    carry = b''
+    for chunk in iter(lambda: stream.read(chunk_size), b''):
+        data = carry + chunk
+        parts = data.split()
+        # The last token may continue in the next chunk
+        carry = parts.pop() if parts and not data[-1:].isspace() else b''
+        if parts:
+            yield parts
+    if carry:
+        yield [carry]
+
+
+def _save(stream, path):
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(stream, f, CHUNK_SIZE)
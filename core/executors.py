@@ -0,0 +1,574 @@
+"""
+Code execution backends.
+
+Every backend has `prepare(language, code)`, which returns a Program,
+`run(program, stdin)`, and `execute(language, code, stdin)` for both at
+once. `stdin` is a string or a binary file object (test data is streamed
+from core.testdata). When `run` is given a `stdout` file, the program's
+full output is also written there for the checkers, and "run.stdout" may
+only hold its beginning. Runs answer in the Piston response shape, so the judge and the
+editor templates do not care which backend ran the code:
+
+    {"language": ..., "version": ...,
+     "compile": {...},                       # compiled languages only
+     "run": {"stdout": ..., "stderr": ..., "output": ..., "code": ..., "signal": ...,
+             "wall_time": ms, "cpu_time": ms, "memory": bytes}}   # when the backend reports them
+
+A request the backend cannot run at all (unknown language, missing
+toolchain) gets {"message": ...} and no "run", like Piston's errors.
+`JUDGE_BACKEND` picks the backend: "piston" (default) or "local".
+"""
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+from .resilience import CircuitBreaker, ExecutionUnavailable, Gate, backoff
+
+
+BACKEND = getattr(settings, 'JUDGE_BACKEND', 'piston')
+
+PISTON_API = getattr(settings, 'PISTON_API', "https://emkc.org/api/v2/piston/execute")
+PISTON_TIMEOUT = getattr(settings, 'PISTON_TIMEOUT', 5)
+
+# Executions in flight per process, over all backends, and per backend
+MAX_IN_FLIGHT = getattr(settings, 'JUDGE_MAX_IN_FLIGHT', 32)
+PISTON_MAX_IN_FLIGHT = getattr(settings, 'PISTON_MAX_IN_FLIGHT', 8)
+# Seconds a call waits for a free slot before giving up
+ACQUIRE_TIMEOUT = getattr(settings, 'JUDGE_ACQUIRE_TIMEOUT', 10)
+
+# Retries for connection errors and 429/502/503/504 answers
+PISTON_RETRIES = getattr(settings, 'PISTON_RETRIES', 2)
+# Consecutive failures that open the circuit, and how long it stays open
+PISTON_BREAKER_THRESHOLD = getattr(settings, 'PISTON_BREAKER_THRESHOLD', 5)
+PISTON_BREAKER_RESET = getattr(settings, 'PISTON_BREAKER_RESET', 30)
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Limits for the local backend, per execution
+LOCAL_WORKERS = getattr(settings, 'JUDGE_LOCAL_WORKERS', os.cpu_count() or 4)
+LOCAL_CPU_SECONDS = getattr(settings, 'JUDGE_LOCAL_CPU_SECONDS', 2)
+LOCAL_WALL_SECONDS = getattr(settings, 'JUDGE_LOCAL_WALL_SECONDS', 5)
+LOCAL_MEMORY_MB = getattr(settings, 'JUDGE_LOCAL_MEMORY_MB', 256)
+LOCAL_OUTPUT_BYTES = getattr(settings, 'JUDGE_LOCAL_OUTPUT_BYTES', 1024 * 1024)
+# RLIMIT_NPROC counts every process and thread of the judge's user account
+LOCAL_MAX_PROCESSES = getattr(settings, 'JUDGE_LOCAL_MAX_PROCESSES', 256)
+LOCAL_COMPILE_SECONDS = getattr(settings, 'JUDGE_LOCAL_COMPILE_SECONDS', 15)
+
+# Compiled programs, keyed by (language, toolchain version, code hash)
+ARTIFACT_DIR = getattr(settings, 'JUDGE_ARTIFACT_DIR', os.path.join(tempfile.gettempdir(), 'campuscode-artifacts'))
+ARTIFACT_CACHE_SIZE = getattr(settings, 'JUDGE_ARTIFACT_CACHE_SIZE', 500)
+
+
+class Program:
+    """A submission made ready to run by an executor's `prepare`.
+
+    `compile` is the compile stage result (None for interpreted languages)
+    and `compile_time` how long it took in seconds: 0.0 when the artifact
+    came from the cache, None when the backend cannot tell. `error` is set
+    when the backend cannot run the language at all.
+    """
+
+    def __init__(self, language, code, path=None, compile=None, compile_time=None, cached=False, error=None):
+        self.language = language
+        self.code = code
+        self.path = path
+        self.compile = compile
+        self.compile_time = compile_time
+        self.cached = cached
+        self.error = error
+
+
+_global_gate = Gate(MAX_IN_FLIGHT, timeout=ACQUIRE_TIMEOUT)
+
+
+class PistonExecutor:
+    """Runs code on a Piston server over a shared keep-alive session.
+
+    Requests are capped per backend (PISTON_MAX_IN_FLIGHT) and overall
+    (JUDGE_MAX_IN_FLIGHT). Connection errors and overload answers are
+    retried with jittered backoff. Read timeouts are not retried: the
+    server is busy, and sending the work again would only add to it.
+    After PISTON_BREAKER_THRESHOLD consecutive failures the circuit opens
+    and calls fail fast with ExecutionUnavailable until a trial request
+    succeeds.
+
+    Piston has no way to keep a build between requests, so `prepare` does
+    nothing and every run compiles again on the server.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._session = None
+        self.gate = Gate(PISTON_MAX_IN_FLIGHT, timeout=ACQUIRE_TIMEOUT, parent=_global_gate)
+        self.breaker = CircuitBreaker(PISTON_BREAKER_THRESHOLD, PISTON_BREAKER_RESET)
+        self.counters = {'requests': 0, 'retries': 0, 'failures': 0, 'short_circuited': 0}
+
+    def get_session(self):
+        with self._lock:
+            if self._session is None:
+                self._session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PISTON_MAX_IN_FLIGHT)
+                self._session.mount('http://', adapter)
+                self._session.mount('https://', adapter)
+            return self._session
+
+    def execute(self, language, code, stdin):
+        return self.run(self.prepare(language, code), stdin)
+
+    def prepare(self, language, code):
+        return Program(language, code)
+
+    def run(self, program, stdin, stdout=None, output_limit=None):
+        if hasattr(stdin, 'read'):
+            # The execute API takes stdin inline in the JSON body
+            stdin = stdin.read().decode(errors='replace')
+        payload = {
+            "language": program.language,
+            "version": "*",
+            "files": [{"content": program.code}],
+            "stdin": stdin
+        }
+        response = self._post(payload)
+        if stdout is not None and 'run' in response:
+            stdout.write((response['run'].get('stdout') or "").encode())
+        return response
+
+    def _post(self, payload):
+        for attempt in range(PISTON_RETRIES + 1):
+            # Take a slot before asking the breaker, so a half-open
+            # breaker's one trial is not spent on a call that never starts
+            with self.gate.enter():
+                if not self.breaker.allow():
+                    self._count('short_circuited')
+                    retry_after = self.breaker.retry_after()
+                    raise ExecutionUnavailable(
+                        f"Execution backend is unavailable, retrying in {retry_after:.0f}s", retry_after=retry_after
+                    )
+                try:
+                    self._count('requests')
+                    response = self.get_session().post(PISTON_API, json=payload, timeout=PISTON_TIMEOUT)
+                except (requests.ConnectionError, requests.ConnectTimeout) as e:
+                    error, retryable = e, True
+                except requests.Timeout as e:
+                    error, retryable = e, False
+                except Exception:
+                    # Settle the call anyway: an unsettled trial would keep
+                    # the breaker half-open for good
+                    self._count('failures')
+                    self.breaker.record_failure()
+                    raise
+                else:
+                    if response.status_code in RETRY_STATUSES:
+                        error, retryable = requests.HTTPError(f"HTTP {response.status_code}"), True
+                    elif response.status_code >= 500:
+                        # The backend answered, but is broken: count it, and
+                        # hand its error message back like any other answer
+                        self._count('failures')
+                        self.breaker.record_failure()
+                        try:
+                            return response.json()
+                        except ValueError:
+                            # An HTML or plain-text error page
+                            return {"message": f"HTTP {response.status_code}"}
+                    else:
+                        self.breaker.record_success()
+                        return response.json()
+
+                self._count('failures')
+                self.breaker.record_failure()
+            if not retryable or attempt == PISTON_RETRIES:
+                raise error
+            self._count('retries')
+            time.sleep(backoff(attempt))
+
+    def _count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self.counters)
+        return dict(counters, in_flight=self.gate.in_flight, limit=self.gate.limit,
+                    rejected=self.gate.rejected, breaker=self.breaker.state)
+
+
+# How the local backend builds and runs each language. The source is saved
+# as `file` in the program's artifact directory and `compile` runs there;
+# `run` is started in a fresh scratch directory, with {artifact} filled in
+# with the artifact directory and {memory_mb} with the memory limit.
+# Runtimes that reserve far more address space than they use (JVM, V8) get
+# their heap capped by flag instead of RLIMIT_AS. `version` prints the
+# toolchain version that goes into the artifact cache key.
+LANGUAGES = {
+    'python': {
+        'file': 'main.py',
+        'run': ['python3', '-S', '{artifact}/main.py'],
+        'version': ['python3', '--version'],
+    },
+    'c++': {
+        'file': 'main.cpp',
+        'compile': ['g++', '-O2', '-std=c++17', '-o', 'main', 'main.cpp'],
+        'run': ['{artifact}/main'],
+        'version': ['g++', '--version'],
+    },
+    'java': {
+        'file': 'Main.java',
+        'compile': ['javac', 'Main.java'],
+        'run': ['java', '-Xmx{memory_mb}m', '-Xss64m', '-cp', '{artifact}', 'Main'],
+        'version': ['javac', '-version'],
+        'limit_address_space': False,
+    },
+    'javascript': {
+        'file': 'main.js',
+        'run': ['node', '--max-old-space-size={memory_mb}', '{artifact}/main.js'],
+        'version': ['node', '--version'],
+        'limit_address_space': False,
+    },
+}
+
+ALIASES = {
+    'py': 'python', 'python3': 'python',
+    'cpp': 'c++', 'g++': 'c++',
+    'js': 'javascript', 'node': 'javascript',
+}
+
+
+@functools.lru_cache(maxsize=None)
+def toolchain_version(name):
+    """First line the language's toolchain prints for its version, or None if it is missing."""
+    try:
+        out = subprocess.run(LANGUAGES[name]['version'], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    return ((out.stdout or out.stderr).strip().splitlines() or [''])[0]
+
+
+class LocalExecutor:
+    """Runs code in subprocesses on this machine, bounded by rlimits.
+
+    `prepare` saves and, for compiled languages, compiles a submission
+    once into an artifact directory; `run` executes it against one input.
+    Artifacts are cached on disk by (language, toolchain version, code
+    hash), so retries and resubmits of the same code skip compilation; the
+    least recently used are removed past `cache_size` entries.
+
+    Each run gets its own scratch directory, a process group that is
+    killed when the program exits or times out, and rlimits for CPU time,
+    memory, output size, processes and core dumps. The process limit
+    counts the whole user account and does not bind root. At most `workers` programs (or compilers) run at
+    once; further calls wait for a free slot. This limits resource use, it
+    does not isolate the filesystem or network: only use it for trusted
+    code or inside a container.
+    """
+
+    def __init__(self, workers=None, cpu_seconds=None, wall_seconds=None,
+                 memory_mb=None, output_bytes=None, compile_seconds=None,
+                 artifact_dir=None, cache_size=None, max_processes=None):
+        self.cpu_seconds = cpu_seconds or LOCAL_CPU_SECONDS
+        self.wall_seconds = wall_seconds or LOCAL_WALL_SECONDS
+        self.memory_mb = memory_mb or LOCAL_MEMORY_MB
+        self.output_bytes = output_bytes or LOCAL_OUTPUT_BYTES
+        self.max_processes = max_processes or LOCAL_MAX_PROCESSES
+        self.compile_seconds = compile_seconds or LOCAL_COMPILE_SECONDS
+        self.artifact_dir = artifact_dir or ARTIFACT_DIR
+        self.cache_size = cache_size or ARTIFACT_CACHE_SIZE
+        # Programs wait for a free worker; only the global cap can turn them away
+        self.gate = Gate(workers or LOCAL_WORKERS, timeout=None, parent=_global_gate)
+        self.runs = 0
+        self._lock = threading.Lock()
+        self._building = {}
+        os.makedirs(self.artifact_dir, exist_ok=True)
+
+    def execute(self, language, code, stdin):
+        return self.run(self.prepare(language, code), stdin)
+
+    def prepare(self, language, code):
+        name = ALIASES.get(language, language)
+        spec = LANGUAGES.get(name)
+        if spec is None:
+            return Program(name, code, error=f"{language} is not supported by the local executor")
+        version = toolchain_version(name)
+        if version is None:
+            return Program(name, code, error=f"{name} toolchain is not installed")
+
+        key = hashlib.sha256(f"{name}\0{version}\0{code or ''}".encode()).hexdigest()
+        path = os.path.join(self.artifact_dir, key)
+
+        # One build per key at a time; others wait and then hit the cache
+        with self._lock:
+            build_lock = self._building.setdefault(key, threading.Lock())
+        with build_lock:
+            compile_result = self._load(path)
+            if compile_result is not False:
+                os.utime(path)
+                return Program(name, code, path=path, compile=compile_result, compile_time=0.0, cached=True)
+
+            started = time.perf_counter()
+            compile_result = self._build(spec, code, path)
+            compile_time = time.perf_counter() - started
+        with self._lock:
+            self._building.pop(key, None)
+        self._evict()
+        return Program(name, code, path=path, compile=compile_result, compile_time=compile_time)
+
+    def run(self, program, stdin, stdout=None, output_limit=None):
+        """Run a prepared program on `stdin`.
+
+        `stdout`, a binary file with a file descriptor, receives the whole
+        output directly; `output_limit` then raises the output size limit
+        for this run (e.g. to fit a large expected output).
+        """
+        if program.error:
+            return {"message": program.error}
+
+        response = {"language": program.language, "version": "local"}
+        if program.compile is not None:
+            response['compile'] = program.compile
+            if program.compile['code'] != 0:
+                # Surface compiler errors where the editor looks for them
+                response['run'] = dict(program.compile)
+                return response
+
+        spec = LANGUAGES[program.language]
+        command = [part.format(memory_mb=self.memory_mb, artifact=program.path) for part in spec['run']]
+        limits = {
+            resource.RLIMIT_CPU: self.cpu_seconds,
+            resource.RLIMIT_FSIZE: max(self.output_bytes, output_limit or 0),
+            resource.RLIMIT_NPROC: self.max_processes,
+        }
+        if spec.get('limit_address_space', True):
+            limits[resource.RLIMIT_AS] = self.memory_mb * 1024 * 1024
+
+        with self.gate.enter(), tempfile.TemporaryDirectory(prefix='campuscode-') as workdir:
+            with self._lock:
+                self.runs += 1
+            result = self._spawn(command, workdir, stdin, self.wall_seconds, limits, stdout=stdout)
+
+        timed_out, output_full = result.pop('timed_out'), result.pop('output_full')
+        if timed_out:
+            _note(result, "Time limit exceeded")
+        elif result['signal'] in ('SIGXCPU', 'SIGKILL'):
+            _note(result, "CPU time limit exceeded")
+        elif output_full:
+            _note(result, "Output limit exceeded")
+        response['run'] = result
+        return response
+
+    def stats(self):
+        return {'requests': self.runs, 'in_flight': self.gate.in_flight, 'limit': self.gate.limit,
+                'rejected': self.gate.rejected}
+
+    def _load(self, path):
+        """The cached compile result at `path`: None for interpreted code, False on a miss."""
+        try:
+            with open(os.path.join(path, 'compile.json')) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return False
+
+    def _build(self, spec, code, path):
+        # Build next to the cache and rename into place, so a half-built
+        # artifact is never visible to other processes
+        building = tempfile.mkdtemp(prefix='.build-', dir=self.artifact_dir)
+        try:
+            with open(os.path.join(building, spec['file']), 'w') as f:
+                f.write(code or "")
+
+            compile_result = None
+            if 'compile' in spec:
+                # Compilers need room, so only wall time and output are bounded
+                with self.gate.enter():
+                    compile_result = self._spawn(spec['compile'], building, "", self.compile_seconds, limits={
+                        resource.RLIMIT_FSIZE: 256 * 1024 * 1024,
+                    })
+                compile_result.pop('output_full')
+                if compile_result.pop('timed_out'):
+                    _note(compile_result, "Compilation timed out")
+                if compile_result['code'] != 0:
+                    # Keep the failed result so a resubmit does not recompile,
+                    # but drop whatever the compiler left behind
+                    for entry in os.listdir(building):
+                        if entry != spec['file']:
+                            os.remove(os.path.join(building, entry))
+
+            with open(os.path.join(building, 'compile.json'), 'w') as f:
+                json.dump(compile_result, f)
+            try:
+                os.rename(building, path)
+            except OSError:
+                # Another process built the same artifact first
+                shutil.rmtree(building, ignore_errors=True)
+        except BaseException:
+            shutil.rmtree(building, ignore_errors=True)
+            raise
+        return compile_result
+
+    def _evict(self):
+        try:
+            entries = [e for e in os.scandir(self.artifact_dir) if not e.name.startswith('.')]
+        except OSError:
+            return
+        if len(entries) <= self.cache_size:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.cache_size]:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _spawn(self, command, workdir, stdin, wall_seconds, limits, stdout=None):
+        in_path = os.path.join(workdir, '.stdin')
+        out_path = os.path.join(workdir, '.stdout')
+        err_path = os.path.join(workdir, '.stderr')
+        # stdin goes through a file, so large inputs are copied in chunks
+        # and the program can read at its own pace
+        with open(in_path, 'wb') as f:
+            if hasattr(stdin, 'read'):
+                shutil.copyfileobj(stdin, f, 1024 * 1024)
+            else:
+                f.write((stdin or "").encode())
+
+        with open(in_path, 'rb') as inp, open(err_path, 'wb') as err, \
+                (open(out_path, 'w+b') if stdout is None else contextlib.nullcontext(stdout)) as out:
+            proc = subprocess.Popen(
+                _limited(command, limits), cwd=workdir, stdin=inp, stdout=out, stderr=err,
+                env={'PATH': os.environ.get('PATH', '/usr/bin:/bin'), 'HOME': workdir, 'LANG': 'C.UTF-8'},
+                start_new_session=True,
+            )
+            started = time.perf_counter()
+            timed_out = False
+            try:
+                usage = _wait(proc, wall_seconds)
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                os.killpg(proc.pid, signal.SIGKILL)
+                usage = _wait(proc, None)
+            wall = time.perf_counter() - started
+            try:
+                # Children the program forked must not outlive it
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+            out_size = os.fstat(out.fileno()).st_size
+            stdout_text = self._read(out.fileno())
+            err_size = os.fstat(err.fileno()).st_size
+        with open(err_path, 'rb') as err:
+            stderr_text = self._read(err.fileno())
+
+        returncode = proc.returncode
+        return {
+            "stdout": stdout_text,
+            "stderr": stderr_text,
+            "output": stdout_text + stderr_text,
+            "code": returncode if returncode >= 0 else None,
+            "signal": signal.Signals(-returncode).name if returncode < 0 else None,
+            # Same units as Piston: milliseconds and bytes
+            "wall_time": round(wall * 1000, 3),
+            "cpu_time": round((usage.ru_utime + usage.ru_stime) * 1000, 3),
+            "memory": usage.ru_maxrss * 1024,
+            "timed_out": timed_out,
+            "output_full": max(out_size, err_size) >= limits[resource.RLIMIT_FSIZE],
+        }
+
+    def _read(self, fd):
+        # Only the beginning is returned inline; checkers stream the rest
+        return os.pread(fd, self.output_bytes, 0).decode(errors='replace')
+
+
+# prlimit(1) options for the limits _spawn sets
+_PRLIMIT_OPTIONS = {
+    resource.RLIMIT_CORE: '--core',
+    resource.RLIMIT_CPU: '--cpu',
+    resource.RLIMIT_FSIZE: '--fsize',
+    resource.RLIMIT_AS: '--as',
+    resource.RLIMIT_NPROC: '--nproc',
+}
+_PRLIMIT = shutil.which('prlimit')
+# Fallback without prlimit: set the limits passed as JSON, then become the command
+_LIMIT_SHIM = (
+    "import json, os, resource, sys\n"
+    "for which, soft, hard in json.loads(sys.argv[1]):\n"
+    "    resource.setrlimit(which, (soft, hard))\n"
+    "os.execvp(sys.argv[2], sys.argv[2:])\n"
+)
+
+
+def _limited(command, limits):
+    """`command` wrapped so the child sets `limits` on itself before it starts.
+
+    The limits are not set from a preexec_fn: running Python between fork
+    and exec can deadlock on a lock another thread of the judge held.
+    """
+    rlimits = [(resource.RLIMIT_CORE, 0, 0)]
+    for which, value in limits.items():
+        # A hard limit a little above the soft one turns SIGXCPU
+        # into SIGKILL for programs that catch it
+        rlimits.append((which, value, value + 1 if which == resource.RLIMIT_CPU else value))
+    if _PRLIMIT:
+        options = [f"{_PRLIMIT_OPTIONS[which]}={soft}:{hard}" for which, soft, hard in rlimits]
+        return [_PRLIMIT, *options, '--', *command]
+    return [sys.executable, '-S', '-c', _LIMIT_SHIM, json.dumps(rlimits), *command]
+
+
+def _wait(proc, timeout):
+    """Reap `proc` like Popen.wait(timeout), but return its resource usage."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    delay = 0.0005
+    while True:
+        pid, status, usage = os.wait4(proc.pid, os.WNOHANG if deadline is not None else 0)
+        if pid:
+            proc.returncode = os.waitstatus_to_exitcode(status)
+            return usage
+        if time.monotonic() >= deadline:
+            raise subprocess.TimeoutExpired(proc.args, timeout)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.01)
+
+
+def _note(result, message):
+    result['stderr'] = f"{result['stderr']}\n{message}" if result['stderr'] else message
+    result['output'] = result['stdout'] + result['stderr']
+
+
+BACKENDS = {
+    'piston': PistonExecutor,
+    'local': LocalExecutor,
+}
+
+_lock = threading.Lock()
+_executors = {}
+
+
+def stats():
+    """Counters for the global execution gate and each backend started in this process."""
+    with _lock:
+        running = dict(_executors)
+    return {
+        'in_flight': _global_gate.in_flight,
+        'limit': _global_gate.limit,
+        'rejected': _global_gate.rejected,
+        'backends': {name: executor.stats() for name, executor in running.items()},
+    }
+
+
+def get_executor(name=None):
+    """The process-wide executor for `name` (default: JUDGE_BACKEND)."""
+    name = name or BACKEND
+    with _lock:
+        if name not in _executors:
+            if name not in BACKENDS:
+                raise ValueError(f"Unknown JUDGE_BACKEND {name!r}")
+            _executors[name] = BACKENDS[name]()
+        return _executors[name]
@@ -0,0 +1,89 @@
+import logging
+import time
+
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import QueuedJob, Submission
+from .ranking import refresh_ranks
+
+logger = logging.getLogger(__name__)
+
+# key -> callable(object_ids) run by the background worker
+_handlers = {}
+
+
+def job(key):
+    """Register a background job handler under `key`."""
+    def register(func):
+        _handlers[key] = func
+        return func
+    return register
+
+
+def enqueue(key, object_id=None):
+    """Mark `key` dirty, optionally for one object. Costs a single INSERT."""
+    QueuedJob.objects.create(key=key, object_id=object_id)
+
+
+def run_pending(keys=None):
+    """Run each job that has pending markers once, coalescing the markers.
+
+    Markers enqueued while a job runs are left for the next pass. A job
+    that raises keeps its markers and is retried on the next pass.
+    `keys` limits the pass to some jobs. Returns {key: (markers_consumed,
+    seconds)} for the jobs that ran.
+    """
+    ran = {}
+    for key, handler in _handlers.items():
+        if keys is not None and key not in keys:
+            continue
+        last = QueuedJob.objects.filter(key=key).order_by('-pk').values_list('pk', flat=True).first()
+        if last is None:
+            continue
+
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                claimed = QueuedJob.objects.filter(key=key, pk__lte=last)
+                object_ids = set(claimed.exclude(object_id=None).values_list('object_id', flat=True))
+                handler(object_ids)
+                consumed, _ = claimed.delete()
+        except Exception:
+            logger.exception("Background job %r failed; will retry", key)
+            continue
+        ran[key] = (consumed, time.perf_counter() - start)
+    return ran
+
+
+def queue_status():
+    """Depth and lag (age of the oldest pending marker) for each job key."""
+    now = timezone.now()
+    rows = QueuedJob.objects.values('key').annotate(depth=Count('id'), oldest=Min('enqueued_at'))
+    pending = {r['key']: r for r in rows}
+    return [
+        {
+            'key': key,
+            'depth': pending[key]['depth'] if key in pending else 0,
+            'lag': (now - pending[key]['oldest']).total_seconds() if key in pending else 0.0,
+        }
+        for key in sorted(set(_handlers) | set(pending))
+    ]
+
+
+@job('ranks')
+def _refresh_ranks(user_ids):
+    refresh_ranks(user_ids)
+
+
+@job('solve_awards')
+def _sync_solve_awards(submission_ids):
+    # Rejudged submissions whose verdict flipped (see core.rejudge)
+    from . import problemstats, userstats
+    from .xp import sync_solve_awards
+
+    pairs = set(Submission.objects.filter(pk__in=submission_ids).values_list('user_id', 'problem_id'))
+    userstats.refresh({user_id for user_id, _ in pairs})
+    problemstats.reconcile({problem_id for _, problem_id in pairs})
+    refresh_ranks(sync_solve_awards(pairs))
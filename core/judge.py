@@ -0,0 +1,218 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from . import checkers
+from .checkers import CheckerError
+from .executors import get_executor
+from .resilience import ExecutionUnavailable
+
+
+# Upper bound on test cases in flight per process, shared by all requests
+MAX_PARALLEL = getattr(settings, 'JUDGE_MAX_PARALLEL', 8)
+
+# Error message for a grading run the backend turned away; worth retrying
+UNAVAILABLE = "Execution Unavailable"
+# Error message for a backend that failed to run a case
+API_FAILED = "Execution API Failed"
+# Error message for a program that crashed on a case
+RUNTIME_ERROR = "Runtime/Compilation Error"
+
+_lock = threading.Lock()
+_pool = None
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=MAX_PARALLEL, thread_name_prefix='judge')
+        return _pool
+
+
+def execute(language, code, stdin):
+    """Run code once on the configured backend (JUDGE_BACKEND) and return its JSON response."""
+    return get_executor().execute(language, code, stdin)
+
+
+def _run_test_case(executor, program, tc, check):
+    """Grade one test case.
+
+    Returns ('passed', result, metrics), ('failed', result, metrics) or
+    ('error', (message, details), metrics). `metrics` is None when the
+    program did not run, else {"round_trip", "wall", "cpu", "memory"}:
+    milliseconds spent waiting on the executor, the backend's wall and
+    CPU milliseconds and peak memory in bytes (None when not reported).
+    """
+    # The whole output goes to a file for the checker; the response only
+    # carries its beginning, which is what a failed case shows
+    with tempfile.NamedTemporaryFile(prefix='campuscode-out-') as out:
+        started = time.perf_counter()
+        try:
+            with tc.open_input() as stdin:
+                api_result = executor.run(program, stdin, stdout=out, output_limit=2 * tc.output_size + 1024 * 1024)
+        except ExecutionUnavailable as e:
+            return 'error', (UNAVAILABLE, str(e)), None
+        except Exception as e:
+            return 'error', (API_FAILED, str(e)), None
+        run = api_result.get('run') or {}
+        metrics = {
+            "round_trip": round((time.perf_counter() - started) * 1000, 3),
+            "wall": run.get('wall_time'),
+            "cpu": run.get('cpu_time'),
+            "memory": run.get('memory'),
+        }
+
+        if 'run' not in api_result or api_result['run']['code'] != 0:
+            err_msg = api_result.get('run', {}).get('stderr', 'Unknown Error') or api_result.get('message', 'Error')
+            return 'error', (RUNTIME_ERROR, err_msg), metrics
+
+        out.seek(0)
+        try:
+            with tc.open_expected() as expected:
+                passed = check(out, expected, tc)
+        except CheckerError as e:
+            return 'error', ("Checker Error", str(e)), metrics
+
+    if passed:
+        return 'passed', {"status": "Passed"}, metrics
+    return 'failed', {
+        "status": "Failed",
+        "input": "Hidden Test Case" if tc.is_hidden else tc.input_data,
+        "expected": "Hidden" if tc.is_hidden else tc.expected_output.strip(),
+        # Handle NoneType for stdout using (var or "")
+        "actual": (api_result['run'].get('stdout') or "").strip()
+    }, metrics
+
+
+def grade(code, language, test_cases, parallel=True, check=None, observe=None):
+    """Run `code` against `test_cases` concurrently and return the verdict.
+
+    The code is prepared (compiled, for compiled languages on the local
+    backend) once and the result is run against every case. The verdict is
+    what running the cases one by one and stopping at the first
+    non-passing case would give: `results` lists a "Passed" entry per case
+    before it and then the failing case. Cases after the first known
+    failure are cancelled if they have not started yet. `parallel=False`
+    runs them one at a time instead. `check(actual, expected, tc)` judges
+    each output (see core.checkers); the default is the exact checker.
+    `observe(tc, passed, metrics)` is called for every case the program
+    finished, including ones past the cut-off, with the metrics described
+    in _run_test_case (see core.teststats and core.telemetry).
+
+    Returns one of the following, each with a "timing" entry of
+    {"compile": seconds or None, "run": seconds}:
+      {"verdict": "passed", "results": [...]}
+      {"verdict": "failed", "results": [...]}
+      {"verdict": "error", "message": ..., "details": ...}
+    """
+    test_cases = list(test_cases)
+    check = check or checkers.for_problem(None)
+    executor = get_executor()
+    try:
+        program = executor.prepare(language, code)
+    except ExecutionUnavailable as e:
+        return {"verdict": "error", "message": UNAVAILABLE, "details": str(e),
+                "timing": {"compile": None, "run": 0.0}}
+    except Exception as e:
+        return {"verdict": "error", "message": API_FAILED, "details": str(e),
+                "timing": {"compile": None, "run": 0.0}}
+
+    run_time = 0.0
+    if program.compile is not None and program.compile['code'] != 0:
+        outcome = {"verdict": "error", "message": "Compilation Error", "details": program.compile['stderr']}
+    else:
+        started = time.perf_counter()
+        outcome = _grade_cases(executor, program, test_cases, parallel, check, observe)
+        run_time = time.perf_counter() - started
+
+    compile_time = program.compile_time
+    outcome["timing"] = {
+        "compile": round(compile_time, 4) if compile_time is not None else None,
+        "run": round(run_time, 4),
+    }
+    return outcome
+
+
+def _grade_cases(executor, program, test_cases, parallel, check, observe):
+    if not parallel:
+        outcomes = []
+        for tc in test_cases:
+            outcomes.append(_run_test_case(executor, program, tc, check))
+            _observe(observe, tc, outcomes[-1])
+            if outcomes[-1][0] != 'passed':
+                break
+        return _verdict(outcomes)
+
+    pool = _get_pool()
+    futures = {pool.submit(_run_test_case, executor, program, tc, check): i for i, tc in enumerate(test_cases)}
+    outcomes = [None] * len(test_cases)
+    # Index of the earliest case known not to pass; only cases before it
+    # can still change the verdict.
+    cutoff = len(test_cases)
+
+    pending = set(futures)
+    try:
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                if future.cancelled():
+                    continue
+                outcomes[i] = future.result()
+                _observe(observe, test_cases[i], outcomes[i])
+                if outcomes[i][0] != 'passed' and i < cutoff:
+                    cutoff = i
+            # Fail fast: drop anything past the cut-off
+            for future in list(pending):
+                if futures[future] > cutoff:
+                    future.cancel()
+                    pending.discard(future)
+    finally:
+        for future in pending:
+            future.cancel()
+    return _verdict(outcomes[:cutoff + 1])
+
+
+def _judged(outcome):
+    # True or False for a case the program passed or failed, None when the
+    # backend or the checker failed instead
+    status, value, _ = outcome
+    if status == 'error' and value[0] != RUNTIME_ERROR:
+        return None
+    return status == 'passed'
+
+
+def _observe(observe, tc, outcome):
+    passed = _judged(outcome)
+    if observe is not None and passed is not None:
+        observe(tc, passed, outcome[2])
+
+
+def run_all(code, language, test_cases, check=None):
+    """Run `code` on every case without stopping early.
+
+    Returns, per case, True if it passed, False if the program failed it
+    and None if it could not be judged; or None if the code did not compile.
+    """
+    check = check or checkers.for_problem(None)
+    executor = get_executor()
+    program = executor.prepare(language, code)
+    if program.compile is not None and program.compile['code'] != 0:
+        return None
+    return [_judged(_run_test_case(executor, program, tc, check)) for tc in test_cases]
+
+
+def _verdict(outcomes):
+    results = []
+    for status, value, _ in outcomes:
+        if status == 'error':
+            message, details = value
+            return {"verdict": "error", "message": message, "details": details}
+        results.append(value)
+        if status == 'failed':
+            return {"verdict": "failed", "results": results}
+    return {"verdict": "passed", "results": results}
@@ -0,0 +1,182 @@
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from . import judge, problemstats, scheduler, telemetry, teststats, userstats, verdicts
+from .models import Submission, TestCase
+from .xp import award_xp
+
+logger = logging.getLogger(__name__)
+
+# How long a worker may hold a submission before others may take it over
+LEASE_SECONDS = getattr(settings, 'JUDGE_LEASE_SECONDS', 120)
+# Give up on a submission after this many leases expired without a result
+MAX_ATTEMPTS = getattr(settings, 'JUDGE_MAX_ATTEMPTS', 3)
+# Delay before retrying a submission the execution backend turned away
+UNAVAILABLE_RETRY_SECONDS = getattr(settings, 'JUDGE_UNAVAILABLE_RETRY_SECONDS', 30)
+
+
+def worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _claimable(now):
+    return Q(status='Queued') | Q(status='Running', lease_expires_at__lt=now)
+
+
+def claim_next(owner, lease_seconds=None):
+    """Lease the next claimable submission to `owner`, or return None.
+
+    The next submission is picked by core.scheduler: highest priority
+    class first, taking turns between users within it. The claim is a
+    conditional UPDATE on the row, so any number of workers on any number
+    of nodes can poll the same table and each submission is held by at
+    most one of them. A Running submission whose lease expired (its
+    worker died) becomes claimable again.
+    """
+    now = timezone.now()
+    expires = now + timedelta(seconds=lease_seconds or LEASE_SECONDS)
+
+    for pk in scheduler.claim_order(Submission.objects.filter(_claimable(now)), now):
+        claimed = Submission.objects.filter(_claimable(now), pk=pk).update(
+            status='Running',
+            lease_owner=owner,
+            lease_expires_at=expires,
+            attempts=F('attempts') + 1,
+            started_at=now,
+        )
+        if claimed:
+            return Submission.objects.select_related('problem', 'user').get(pk=pk)
+    return None
+
+
+def test_cases_for(problem):
+    """`problem`'s test cases in judging order (see core.teststats)."""
+    test_cases = teststats.order(TestCase.objects.filter(problem=problem).order_by('pk'))
+    if not test_cases:
+        # Fall back to the visible sample when no test cases were added
+        test_cases = [TestCase(input_data=problem.sample_input, expected_output=problem.sample_output, is_hidden=False)]
+    return test_cases
+
+
+def result_fields(outcome):
+    """(passed, verdict, result) to store on a Submission for a grading outcome."""
+    passed = outcome["verdict"] == "passed"
+    if outcome["verdict"] == "error":
+        verdict = 'Error'
+        result = {"status": "error", "message": outcome["message"], "details": outcome["details"]}
+    elif passed:
+        verdict = 'Accepted'
+        result = {"status": "success", "message": "Correct Answer!"}
+    else:
+        verdict = 'Wrong Answer'
+        result = {"status": "failed", "results": outcome["results"]}
+    if "timing" in outcome:
+        # Seconds spent compiling (0 for a cached build) and running the cases
+        result["timing"] = outcome["timing"]
+    if outcome.get("cached"):
+        # Same code already graded against the same tests; nothing was run
+        result["cached"] = True
+    return passed, verdict, result
+
+
+def judge_submission(submission, owner):
+    """Grade a leased submission and store its result.
+
+    The result is only written while `owner` still holds the lease; if the
+    lease was lost to another worker this run is discarded. If the execution
+    backend turned the run away, the submission is retried later. Returns
+    True if the result was stored.
+    """
+    version = ''
+    judged = []
+    if submission.attempts > MAX_ATTEMPTS:
+        outcome = {"verdict": "error", "message": "Judge Error",
+                   "details": "Grading did not finish after several attempts."}
+    else:
+        test_cases = test_cases_for(submission.problem)
+        version = verdicts.judge_version(submission.problem, test_cases)
+        outcome = verdicts.grade(submission.problem, submission.code, submission.language, test_cases,
+                                 observe=lambda tc, passed, metrics: judged.append((tc, passed, metrics)))
+        if outcome.get("message") == judge.UNAVAILABLE and submission.attempts < MAX_ATTEMPTS:
+            # The backend is down or saturated: retry instead of failing
+            _retry_later(submission, owner)
+            return False
+
+    problem = submission.problem
+    passed, verdict, result = result_fields(outcome)
+
+    finished_at = timezone.now()
+    with transaction.atomic():
+        stored = Submission.objects.filter(pk=submission.pk, status='Running', lease_owner=owner).update(
+            status='Finished',
+            passed=passed,
+            verdict=verdict,
+            judge_version=version,
+            finished_at=finished_at,
+            lease_owner='',
+            lease_expires_at=None,
+        )
+        if not stored:
+            return False
+        # Only the run that is kept counts, not one that is retried or discarded
+        teststats.record([(tc, passed) for tc, passed, _ in judged])
+        telemetry.record(submission, judged)
+
+        if passed:
+            problemstats.record_accepted(problem.id, userstats.record_accepted(submission, finished_at))
+            has_solved = Submission.objects.filter(
+                user=submission.user, problem=problem, passed=True
+            ).exclude(pk=submission.pk).exists()
+            # The ledger also refuses a second award for the same problem,
+            # which covers two first solves racing each other
+            if not has_solved and award_xp(submission.user, problem.points, 'problem_solved', source=problem):
+                result["message"] += f" You earned +{problem.points} XP."
+
+        Submission.objects.filter(pk=submission.pk).update(result=result)
+    return True
+
+
+def _retry_later(submission, owner):
+    # Keep the lease, but let it run out soon so another pass retries it
+    Submission.objects.filter(pk=submission.pk, status='Running', lease_owner=owner).update(
+        lease_expires_at=timezone.now() + timedelta(seconds=UNAVAILABLE_RETRY_SECONDS)
+    )
+
+
+def process_next(owner):
+    """Claim and judge one submission. Returns False when the queue is empty.
+
+    An unexpected error while judging (e.g. the database is locked) is
+    logged and the submission is retried soon; after MAX_ATTEMPTS it is
+    failed with a Judge Error.
+    """
+    submission = claim_next(owner)
+    if submission is None:
+        return False
+    try:
+        judge_submission(submission, owner)
+    except Exception:
+        logger.exception("Judging submission %s failed; it will be retried", submission.pk)
+        _retry_later(submission, owner)
+    return True
+
+
+def status_payload(submission):
+    """JSON body for the submission status endpoint."""
+    if submission.status != 'Finished':
+        # Approximate: turns between users can reorder a class
+        ahead = Submission.objects.filter(
+            Q(priority__lt=submission.priority) | Q(priority=submission.priority, id__lt=submission.id),
+            status='Queued',
+        ).count()
+        return {"status": submission.status.lower(), "submission_id": submission.id, "queue_position": ahead}
+    payload = dict(submission.result or {"status": "success" if submission.passed else "failed", "results": []})
+    payload["submission_id"] = submission.id
+    return payload
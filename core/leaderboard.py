@@ -0,0 +1,87 @@
+import base64
+import json
+
+from django.db.models import Q
+
+from .models import User
+
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+
+# Columns returned for every leaderboard row
+ROW_FIELDS = ('username', 'first_name', 'last_name', 'college', 'xp', 'level', 'global_rank', 'college_rank')
+
+
+def encode_cursor(xp, username):
+    raw = json.dumps([xp, username]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Turn a cursor back into its (xp, username) key; raises ValueError."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        xp, username = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(xp, int) or not isinstance(username, str):
+        raise ValueError('Invalid cursor')
+    return xp, username
+
+
+def _scope(college=None):
+    students = User.objects.filter(role='Student')
+    if college is not None:
+        students = students.filter(college=college)
+    return students
+
+
+def _after(xp, username):
+    # (xp, username) comes after the key in (xp DESC, username ASC) order.
+    # The outer xp__lte keeps the condition an index range seek.
+    return Q(xp__lte=xp) & (Q(xp__lt=xp) | Q(username__gt=username))
+
+
+def _before(xp, username):
+    return Q(xp__gte=xp) & (Q(xp__gt=xp) | Q(username__lt=username))
+
+
+def leaderboard_page(college=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one page of the leaderboard as (rows, next_cursor).
+
+    Keyset pagination on (xp DESC, username ASC): each page is an index
+    seek on `user_leaderboard_idx` / `user_college_board_idx` regardless of
+    how deep the page is. `next_cursor` is None on the last page.
+    """
+    qs = _scope(college).order_by('-xp', 'username')
+    if cursor:
+        qs = qs.filter(_after(*decode_cursor(cursor)))
+
+    rows = list(qs.values(*ROW_FIELDS)[:limit + 1])
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]['xp'], rows[-1]['username'])
+    return rows, next_cursor
+
+
+def neighbourhood(user, n=5, college=None):
+    """Return up to `n` rows either side of `user`, plus the user's own row.
+
+    Both halves are bounded index seeks from the user's (xp, username) key,
+    so the cost does not depend on the user's position.
+    """
+    scope = _scope(college)
+    above = list(
+        scope.filter(_before(user.xp, user.username))
+        .order_by('xp', '-username')
+        .values(*ROW_FIELDS)[:n]
+    )
+    below = list(
+        scope.filter(_after(user.xp, user.username))
+        .order_by('-xp', 'username')
+        .values(*ROW_FIELDS)[:n]
+    )
+    me = scope.filter(pk=user.pk).values(*ROW_FIELDS).first()
+    return above[::-1] + ([me] if me else []) + below
@@ -0,0 +1,70 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from core import checkers
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the output checkers on large generated outputs: time, throughput "
+        "and peak Python memory, against the old read-everything-and-strip() comparison."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100, help='Output size in MB (default 100)')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as workdir:
+            expected = os.path.join(workdir, 'expected')
+            same = os.path.join(workdir, 'same')
+            close = os.path.join(workdir, 'close')
+            early = os.path.join(workdir, 'early')
+            self._generate(expected, same, close, early, options['size'] * 1024 * 1024)
+            size_mb = os.path.getsize(expected) / (1024 * 1024)
+
+            scenarios = [
+                ('old strip() ==', same, lambda a, e: a.read().strip() == e.read().strip()),
+                ('exact', same, checkers.exact),
+                ('tokens', same, checkers.tokens),
+                ('float', same, lambda a, e: checkers.floats(a, e, 1e-6)),
+                ('float, all within eps', close, lambda a, e: checkers.floats(a, e, 1e-6)),
+                ('old strip() ==, early diff', early, lambda a, e: a.read().strip() == e.read().strip()),
+                ('exact, early diff', early, checkers.exact),
+            ]
+            self.stdout.write(f"{size_mb:.0f} MB outputs")
+            self.stdout.write(f"{'checker':<28} {'verdict':>8} {'time':>8} {'MB/s':>8} {'peak MB':>8}")
+            for name, actual, check in scenarios:
+                with open(actual, 'rb') as a, open(expected, 'rb') as e:
+                    start = time.perf_counter()
+                    ok = check(a, e)
+                    elapsed = time.perf_counter() - start
+                # Second pass for memory: tracing slows allocation-heavy checkers a lot
+                with open(actual, 'rb') as a, open(expected, 'rb') as e:
+                    tracemalloc.start()
+                    check(a, e)
+                    peak = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                    tracemalloc.stop()
+                self.stdout.write(
+                    f"{name:<28} {'pass' if ok else 'fail':>8} {elapsed:>7.2f}s {size_mb / elapsed:>8.0f} {peak:>8.1f}"
+                )
+
+    def _generate(self, expected, same, close, early, size):
+        # Lines of floats, like the output of a numeric problem
+        rng = random.Random(0)
+        with open(expected, 'w') as e, open(same, 'w') as s, open(close, 'w') as c, open(early, 'w') as x:
+            written = 0
+            first = True
+            while written < size:
+                values = [rng.uniform(-1e6, 1e6) for _ in range(10)]
+                line = ' '.join(f"{v:.6f}" for v in values) + '\n'
+                e.write(line)
+                s.write(line)
+                c.write(' '.join(f"{v * (1 + 1e-9):.6f}" for v in values) + '\n')
+                x.write('0 ' + line if first else line)
+                first = False
+                written += len(line)
@@ -0,0 +1,61 @@
+import time
+from unittest import mock
+
+import requests
+from django.core.management.base import BaseCommand
+
+from core import executors, judge
+from core.mock_piston import MockPistonServer
+from core.models import TestCase
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark grading wall time against a local mock Piston server: the old "
+        "one-connection-per-case sequential loop versus the pooled parallel judge."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tests', default='1,5,10,20', help='Comma-separated test-case counts')
+        parser.add_argument('--latency', type=float, default=0.2, help='Mock execution latency in seconds')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best is kept)')
+
+    def handle(self, *args, **options):
+        counts = [int(n) for n in options['tests'].split(',') if n]
+
+        with MockPistonServer(latency=options['latency']) as server, \
+                mock.patch.object(executors, 'PISTON_API', server.url):
+            self.stdout.write(
+                f"mock latency {options['latency'] * 1000:.0f}ms, pool size {judge.MAX_PARALLEL}\n"
+                f"{'tests':>6} {'sequential':>11} {'parallel':>9} {'speedup':>8} {'new conns':>10}"
+            )
+            for n in counts:
+                cases = [TestCase(input_data=f"{i}\n", expected_output=f"{i}", is_hidden=True) for i in range(n)]
+
+                sequential = self._best(options['repeat'], lambda: self._old_loop(server.url, cases))
+
+                before = server.stats['connections']
+                parallel = self._best(options['repeat'], lambda: judge.grade("print(input())", "python", cases))
+                conns = server.stats['connections'] - before
+
+                self.stdout.write(
+                    f"{n:>6} {sequential:>10.2f}s {parallel:>8.2f}s {sequential / parallel:>7.1f}x {conns:>10}"
+                )
+
+    def _best(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outcome = func()
+            timings.append(time.perf_counter() - start)
+            assert outcome["verdict"] == "passed", outcome
+        return min(timings)
+
+    def _old_loop(self, url, cases):
+        # The grading loop as it was: one fresh connection per case, in order
+        for tc in cases:
+            payload = {"language": "python", "version": "*", "files": [{"content": ""}], "stdin": tc.input_data}
+            result = requests.post(url, json=payload, timeout=5).json()
+            if result['run']['stdout'].strip() != tc.expected_output.strip():
+                return {"verdict": "failed"}
+        return {"verdict": "passed"}
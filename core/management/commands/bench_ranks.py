@@ -0,0 +1,96 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from core.models import User
+from core.ranking import compute_and_update_ranks, update_ranks_for_xp_change
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark incremental rank maintenance against a full recompute. "
+        "Synthetic students are created inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma-separated student counts to benchmark')
+        parser.add_argument('--events', type=int, default=200, help='XP events per size')
+        parser.add_argument('--colleges', type=int, default=20)
+        parser.add_argument('--skip-full', action='store_true',
+                            help='Do not time compute_and_update_ranks()')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        sizes = [int(s) for s in options['sizes'].split(',') if s]
+
+        self.stdout.write(f"{'students':>9} {'full (s)':>9} {'event p50':>10} {'event p95':>10} {'queries/event':>14}")
+        for size in sizes:
+            try:
+                with transaction.atomic():
+                    self._run(size, rng, options)
+                    raise _Rollback
+            except _Rollback:
+                pass
+
+    def _run(self, size, rng, options):
+        colleges = [f'College {i}' for i in range(options['colleges'])]
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'bench-{size}-{i}',
+                    college=rng.choice(colleges),
+                    # Forum and problem rewards keep XP on a coarse grid
+                    xp=rng.randrange(0, 2000) // 5 * 5,
+                )
+                for i in range(size)
+            ],
+            batch_size=5000,
+        )
+
+        # Seed consistent ranks; the incremental engine maintains them from here.
+        compute_and_update_ranks()
+
+        full = None
+        if not options['skip_full']:
+            # A pass over already-consistent ranks is what every XP award paid
+            # before incremental maintenance.
+            start = time.perf_counter()
+            compute_and_update_ranks()
+            full = time.perf_counter() - start
+
+        ids = list(User.objects.filter(role='Student').values_list('pk', flat=True))
+        timings = []
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        for _ in range(options['events']):
+            user = User.objects.get(pk=rng.choice(ids))
+            old_xp = user.xp
+            user.xp += rng.choice([2, 5, 10, 20, 50])
+            user.save(update_fields=['xp'])
+
+            with connection.execute_wrapper(count_queries):
+                start = time.perf_counter()
+                update_ranks_for_xp_change(user, old_xp)
+                timings.append(time.perf_counter() - start)
+
+        timings.sort()
+        p50 = statistics.median(timings) * 1000
+        p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+        full_col = '-' if full is None else f'{full:.3f}'
+        self.stdout.write(
+            f"{size:>9} {full_col:>9} {p50:>8.2f}ms {p95:>8.2f}ms {queries / len(timings):>14.1f}"
+        )
@@ -0,0 +1,340 @@
+import itertools
+import json
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from unittest import mock
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+from django.utils import timezone
+
+from core import executors, throttle
+from core.judge_queue import process_next
+from core.mock_piston import MockPistonServer
+from core.models import Problem, Submission, TestCase, User
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure judging throughput: drive run_code and submit_solution at a chosen "
+        "concurrency against a local mock Piston server, and report requests per second, "
+        "p50/p95/p99 latency and database queries. By default the requests go through the "
+        "Django test client into a throwaway test database, with judge workers in threads. "
+        "With --url they go to a running server instead. Requests answered with an error "
+        "status are counted apart from the timings, and make the command fail."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoints', default='run_code,submit', help='Comma-separated: run_code, submit')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8, help='Clients sending requests at once')
+        parser.add_argument('--judge-workers', type=int, default=4, help='In-process judge workers for submissions; with 0 they are judged '
+                                 'one by one after all of them are queued')
+        parser.add_argument('--tests', type=int, default=5, help='Test cases of the benchmark problem')
+        parser.add_argument('--latency', type=float, default=0.05, help='Mock execution latency in seconds')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of mock executions that fail')
+        parser.add_argument('--failure-status', type=int, default=503, help='HTTP status of a failed mock execution')
+        parser.add_argument('--mock-port', type=int, default=0,
+                            help='Port for the mock Piston server (point a --url server\'s PISTON_API at it)')
+        parser.add_argument('--url', help='Base URL of a running server to benchmark instead, e.g. http://localhost:8000')
+        parser.add_argument('--session', help='With --url: sessionid cookie of a logged-in user')
+        parser.add_argument('--problem', type=int, help='With --url: id of the problem to submit to')
+        parser.add_argument('--in-place', action='store_true',
+                            help='Use the current database instead of a throwaway one (creates bench-* rows)')
+        parser.add_argument('--output', help='Write the results as JSON to this file')
+        parser.add_argument('--allow-failures', action='store_true',
+                            help='Exit successfully even if some requests were answered with an error status')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        endpoints = [e for e in options['endpoints'].split(',') if e]
+        unknown = set(endpoints) - {'run_code', 'submit'}
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        if options['url'] and not (options['session'] and ('submit' not in endpoints or options['problem'])):
+            raise CommandError("--url needs --session, and --problem when benchmarking submit")
+
+        with ExitStack() as stack:
+            server = stack.enter_context(MockPistonServer(
+                latency=options['latency'], failure_rate=options['failure_rate'],
+                failure_status=options['failure_status'], port=options['mock_port'], seed=options['seed'],
+            ))
+            self.stdout.write(f"mock Piston at {server.url}")
+            if options['url']:
+                results = {e: self._remote(e, options) for e in endpoints}
+            else:
+                # Per-user rate limits would turn most of the benchmark away;
+                # the global execution slots stay, they are part of the cost
+                for patch in (mock.patch.object(executors, 'PISTON_API', server.url),
+                              mock.patch.object(executors, 'BACKEND', 'piston'),
+                              mock.patch.object(throttle, 'RATES', {})):
+                    stack.enter_context(patch)
+                if not options['in_place']:
+                    stack.callback(self._scratch_database())
+                results = self._local(endpoints, options)
+            results['mock'] = dict(server.stats)
+
+        report = {
+            'commit': _commit(),
+            'timestamp': timezone.now().isoformat(),
+            'config': {k: options[k] for k in ('endpoints', 'requests', 'concurrency', 'judge_workers', 'tests',
+                                               'latency', 'failure_rate', 'failure_status', 'url')},
+            'results': results,
+        }
+        failed = self._print(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"results written to {options['output']}")
+        if failed and not options['allow_failures']:
+            raise CommandError(f"{failed} requests failed; their latencies are left out of the figures above")
+
+    # --- in-process ------------------------------------------------------
+
+    def _scratch_database(self):
+        """Switch to a new test database; returns the function that drops it again."""
+        try:
+            setup_test_environment()
+        except RuntimeError:
+            pass  # already set up, e.g. under the test runner
+        settings_dict = connection.settings_dict
+        old_name, old_test_name = settings_dict['NAME'], settings_dict['TEST']['NAME']
+        workdir = tempfile.TemporaryDirectory(prefix='campuscode-bench-')
+        kept = None
+        if settings_dict['ENGINE'].endswith('sqlite3'):
+            # A file, not shared-cache memory, so concurrent writers wait for
+            # each other instead of failing with "table is locked"
+            settings_dict['TEST']['NAME'] = os.path.join(workdir.name, 'bench.sqlite3')
+            if connection.is_in_memory_db():
+                # Under the test runner: closing would not switch away from the
+                # in-memory test database, so set its connection aside
+                kept = connections[DEFAULT_DB_ALIAS]
+                connections[DEFAULT_DB_ALIAS] = connections.create_connection(DEFAULT_DB_ALIAS)
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        def drop():
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            settings_dict['TEST']['NAME'] = old_test_name
+            if kept is not None:
+                connections[DEFAULT_DB_ALIAS] = kept
+            workdir.cleanup()
+        return drop
+
+    def _local(self, endpoints, options):
+        run_id = f"{os.getpid()}-{int(time.time())}"
+        problem = Problem.objects.create(title=f'bench-{run_id}', difficulty='Easy', points=10,
+                                         statement='', input_fmt='', output_fmt='', constraints='')
+        for i in range(options['tests']):
+            TestCase.objects.create(problem=problem, input_data=str(i), expected_output=str(i))
+        users = [User.objects.create(username=f'bench-{run_id}-{i}') for i in range(options['concurrency'])]
+
+        results = {}
+        if 'run_code' in endpoints:
+            results['run_code'], _ = self._drive(users, options, lambda client, i: client.post(
+                reverse('run_code'), {'code': f'print(input()) # {i}', 'stdin': str(i)},
+                content_type='application/json',
+            ))
+        if 'submit' in endpoints:
+            results['submit'] = self._submit_local(problem, users, options)
+        return results
+
+    def _drive(self, users, options, send):
+        """Send options['requests'] requests from one client thread per user.
+
+        Returns a summary of their latencies and queries, and the responses.
+        """
+        counter = itertools.count()
+        samples, lock = [], threading.Lock()
+
+        def client_thread(user):
+            client = Client()
+            client.force_login(user)
+            try:
+                while (i := next(counter)) < options['requests']:
+                    with CaptureQueriesContext(connection) as queries:
+                        start = time.perf_counter()
+                        response = send(client, i)
+                        elapsed = time.perf_counter() - start
+                    with lock:
+                        samples.append((elapsed, response.status_code, len(queries), response))
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        _run_threads(client_thread, users)
+        wall = time.perf_counter() - started
+        summary = _summarize([s[0] for s in samples if _ok(s[1])], wall)
+        summary['failed'] = sum(not _ok(s[1]) for s in samples)
+        summary['statuses'] = _statuses(s[1] for s in samples)
+        summary['queries_per_request'] = round(sum(s[2] for s in samples) / len(samples), 2) if samples else None
+        return summary, [s[3] for s in samples]
+
+    def _submit_local(self, problem, users, options):
+        stop = threading.Event()
+        judged, judge_queries, lock = [0], [0], threading.Lock()
+
+        def worker(n):
+            owner = f"bench-worker-{n}"
+            try:
+                while True:
+                    with CaptureQueriesContext(connection) as queries:
+                        found = process_next(owner)
+                    if found:
+                        with lock:
+                            judged[0] += 1
+                            judge_queries[0] += len(queries)
+                    elif stop.is_set():
+                        return
+                    else:
+                        time.sleep(0.005)
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(options['judge_workers'])]
+        for t in workers:
+            t.start()
+        started = time.perf_counter()
+        try:
+            summary, responses = self._drive(users, options, lambda client, i: client.post(
+                reverse('submit_solution', args=[problem.id]), {'code': f'print(input()) # {i}'},
+                content_type='application/json',
+            ))
+            ids = [r.json()['submission_id'] for r in responses if r.status_code == 202]
+            if workers:
+                while Submission.objects.filter(pk__in=ids).exclude(status='Finished').exists():
+                    time.sleep(0.02)
+            else:
+                # Judge the whole backlog here once it is queued
+                stop.set()
+                worker(0)
+        finally:
+            stop.set()
+            for t in workers:
+                t.join()
+        wall = time.perf_counter() - started
+
+        done = Submission.objects.filter(pk__in=ids).values_list('submitted_at', 'finished_at', 'verdict')
+        graded = _summarize([(f - s).total_seconds() for s, f, _ in done], wall)
+        graded['verdicts'] = _statuses(v for _, _, v in done)
+        graded['queries_per_submission'] = round(judge_queries[0] / judged[0], 2) if judged[0] else None
+        return {'request': summary, 'graded': graded}
+
+    # --- against a server ------------------------------------------------
+
+    def _remote(self, endpoint, options):
+        base = options['url'].rstrip('/')
+        counter = itertools.count()
+        samples, lock = [], threading.Lock()
+
+        def client_thread(_):
+            session = requests.Session()
+            session.cookies.set('sessionid', options['session'])
+            while (i := next(counter)) < options['requests']:
+                start = time.perf_counter()
+                if endpoint == 'run_code':
+                    response = session.post(base + reverse('run_code'),
+                                            json={'code': f'print(input()) # {i}', 'stdin': str(i)})
+                else:
+                    response = session.post(base + reverse('submit_solution', args=[options['problem']]),
+                                            json={'code': f'print(input()) # {i}'})
+                    if response.status_code == 202:
+                        response = self._poll(session, base + response.json()['status_url'])
+                elapsed = time.perf_counter() - start
+                with lock:
+                    samples.append((elapsed, response.status_code))
+
+        started = time.perf_counter()
+        _run_threads(client_thread, range(options['concurrency']))
+        summary = _summarize([s[0] for s in samples if _ok(s[1])], time.perf_counter() - started)
+        summary['failed'] = sum(not _ok(s[1]) for s in samples)
+        summary['statuses'] = _statuses(s[1] for s in samples)
+        # The server's queries cannot be counted from here
+        summary['queries_per_request'] = None
+        return summary
+
+    def _poll(self, session, url):
+        while True:
+            response = session.get(url)
+            if response.status_code != 200 or response.json().get('status') not in ('queued', 'running'):
+                return response
+            time.sleep(0.05)
+
+    # --- output ----------------------------------------------------------
+
+    def _print(self, results):
+        """Write the results table; returns the number of failed requests."""
+        self.stdout.write(f"{'measure':<20} {'count':>6} {'per sec':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+        rows = []
+        if 'run_code' in results:
+            rows.append(('run_code', results['run_code'], 'queries_per_request'))
+        if 'submit' in results:
+            submit = results['submit']
+            if 'graded' in submit:
+                rows.append(('submit (request)', submit['request'], 'queries_per_request'))
+                rows.append(('submit (graded)', submit['graded'], 'queries_per_submission'))
+            else:
+                rows.append(('submit (graded)', submit, 'queries_per_request'))
+        for name, s, queries in rows:
+            q = s.get(queries)
+            self.stdout.write(
+                f"{name:<20} {s['count']:>6} {s['throughput']:>8.1f} {s['p50']:>8.1f} {s['p95']:>8.1f} "
+                f"{s['p99']:>8.1f} {q if q is not None else '-':>8}"
+            )
+        failed = 0
+        for name, s, _ in rows:
+            if s.get('failed'):
+                failed += s['failed']
+                self.stdout.write(self.style.ERROR(
+                    f"{name}: {s['failed']} of {s['count'] + s['failed']} requests FAILED, statuses {s['statuses']}"
+                ))
+        return failed
+
+
+def _run_threads(target, args):
+    threads = [threading.Thread(target=target, args=(a,)) for a in args]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _ok(status):
+    return 200 <= status < 400
+
+
+def _summarize(latencies, wall):
+    """Throughput over `wall` seconds and latency percentiles in milliseconds."""
+    ordered = sorted(latencies)
+
+    def pct(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2) if ordered else 0.0
+
+    return {
+        'count': len(ordered),
+        'seconds': round(wall, 3),
+        'throughput': round(len(ordered) / wall, 2) if wall else 0.0,
+        'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99),
+    }
+
+
+def _statuses(values):
+    counts = {}
+    for value in values:
+        counts[str(value)] = counts.get(str(value), 0) + 1
+    return counts
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
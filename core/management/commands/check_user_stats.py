@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import userstats
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the UserStats, UserProblemStatus and DailyActivity summaries with the submissions "
+        "they summarize, and list the rows that differ. Exits with an error if any do."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=50, help='Differences to list (default 50)')
+
+    def handle(self, *args, **options):
+        drift = userstats.check()
+        for kind, key, field, stored, expected in drift[:options['limit']]:
+            self.stdout.write(f"{kind} {key}: {field} is {stored}, expected {expected}")
+        if drift:
+            raise CommandError(f"{len(drift)} differences; run `manage.py rebuild_user_stats` to fix them")
+        self.stdout.write(self.style.SUCCESS("User stats match the submissions"))
@@ -0,0 +1,39 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import reports
+from core.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a ZIP of the coding reports of every student of a college. Missing or "
+        "outdated reports are rendered in parallel, one process per CPU core by default, "
+        "and stored in the report cache. Prints the time spent in each stage."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('college')
+        parser.add_argument('--output', help='ZIP file to write (default: <college>-reports.zip)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Rendering processes')
+
+    def handle(self, *args, **options):
+        college = options['college']
+        if not User.objects.filter(role='Student', college=college).exists():
+            raise CommandError(f"No students in {college!r}")
+        output = options['output'] or f"{college.replace('/', '-')}-reports.zip"
+
+        summary = {}
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as executor:
+            with open(output, 'wb') as f:
+                for chunk in reports.export_college(college, summary, executor, in_flight=2 * options['workers']):
+                    f.write(chunk)
+
+        self.stdout.write(f"{summary['students']} reports: {summary['cached']} cached, {summary['rendered']} rendered")
+        for stage, seconds in summary['timings'].items():
+            self.stdout.write(f"  {stage:<8} {seconds:>7.2f}s")
+        self.stdout.write(self.style.SUCCESS(f"Written to {output} ({os.path.getsize(output) / 1024:.0f} KB)"))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import testdata
+from core.models import TestCase
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete test data files that no TestCase refers to any more "
+        "(left behind when test cases are edited or deleted)."
+    )
+
+    def handle(self, *args, **options):
+        referenced = set()
+        for input_hash, output_hash in TestCase.objects.values_list('input_hash', 'output_hash').iterator():
+            referenced.update((input_hash, output_hash))
+        removed = testdata.prune(referenced)
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} unreferenced test data files"))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.ranking import compute_and_update_ranks
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute every Student's global and college rank from XP. "
+        "Meant for nightly reconciliation and recovery; day-to-day ranks are "
+        "maintained incrementally."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows written per UPDATE statement')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            changed = compute_and_update_ranks(chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Ranks rebuilt: {changed} rows changed in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import userstats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the UserStats, UserProblemStatus and DailyActivity summaries from all submissions. "
+        "Run after deleting problems or changing their difficulty, or when "
+        "check_user_stats reports drift."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        statuses, users, days = userstats.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"User stats rebuilt: {users} users, {statuses} user/problem rows, {days} user/day rows in {elapsed:.2f}s"
+        ))
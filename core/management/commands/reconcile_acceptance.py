@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.problemstats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Recount each problem's attempt and acceptance counters from its submissions. "
+        "Run periodically (e.g. from cron); the counters are kept up to date in between."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        corrected = reconcile()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Acceptance counters reconciled: {corrected} problems corrected in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.ranking import compute_and_update_ranks
+from core.xp import reconcile_balances
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute User.xp, level and problem_solved from the XP ledger and "
+        "submissions, then rebuild ranks if anything was corrected. Run periodically."
+    )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            corrected = reconcile_balances()
+            reranked = compute_and_update_ranks() if corrected else 0
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"XP reconciled: {corrected} users corrected, {reranked} ranks changed in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import analytics, telemetry
+
+
+class Command(BaseCommand):
+    help = (
+        "Roll recent submissions up into the analytics tables and store a new snapshot "
+        "of the admin dashboard's submission insights and judge latency. Also prunes test "
+        "runs older than TELEMETRY_RETENTION_DAYS. Run periodically (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Recount every hour, e.g. after a rejudge of old submissions')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        pruned = telemetry.prune()
+        hours, snapshot = analytics.refresh(full=options['full'])
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Analytics refreshed: {hours} hours recounted, {pruned} old test runs pruned in {elapsed:.2f}s, "
+            f"as of {snapshot.created_at:%Y-%m-%d %H:%M}"
+        ))
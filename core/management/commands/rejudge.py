@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import rejudge
+from core.models import Problem
+
+
+class Command(BaseCommand):
+    help = (
+        "Rejudge finished submissions judged against an older version of their "
+        "problem's test cases or checker, then settle XP and ranks once. Safe to "
+        "interrupt: running it again continues with what is still stale."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--problem', type=int, action='append',
+                            help='Only this problem id (repeatable; default all problems)')
+        parser.add_argument('--workers', type=int, default=rejudge.WORKERS,
+                            help=f'Submissions graded at once (default {rejudge.WORKERS})')
+
+    def handle(self, *args, **options):
+        problems = Problem.objects.filter(pk__in=options['problem']) if options['problem'] else None
+        start = time.perf_counter()
+        last = [0.0]
+
+        def progress(done, total, changed):
+            now = time.perf_counter()
+            if done == total or now - last[0] >= 1:
+                last[0] = now
+                rate = done / (now - start)
+                self.stdout.write(f"{done}/{total} rejudged, {changed} verdicts changed ({rate:.1f}/s)")
+
+        counts = rejudge.rejudge(problems, workers=options['workers'], progress=progress)
+        if not counts["total"]:
+            self.stdout.write("No stale submissions")
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Rejudged {counts['rejudged']} of {counts['total']} submissions in "
+            f"{time.perf_counter() - start:.1f}s: {counts['changed']} verdicts changed, "
+            f"{counts['failed']} left for a later run (backend errors); XP and ranks settled"
+        ))
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from core import checkers, judge, teststats
+from core.models import Submission, TestCase
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay past submissions to count the executions a one-at-a-time fail-fast "
+        "judge makes with test cases in id order versus failure-history order. "
+        "Every replayed submission runs once against all of its problem's test cases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=200, help='Most recent finished submissions to replay')
+        parser.add_argument('--problem', type=int, help='Only replay submissions to this problem id')
+
+    def handle(self, *args, **options):
+        submissions = Submission.objects.filter(status='Finished').select_related('problem').order_by('-id')
+        if options['problem']:
+            submissions = submissions.filter(problem_id=options['problem'])
+        submissions = list(submissions[:options['limit']])[::-1]
+
+        # History as it builds up over the replay, starting from nothing, so
+        # the comparison does not depend on stats the log itself produced
+        stats = {}
+        replayed = baseline = ordered = everything = skipped = 0
+        for submission in submissions:
+            cases = list(TestCase.objects.filter(problem=submission.problem).order_by('pk'))
+            if not cases:
+                skipped += 1
+                continue
+            results = judge.run_all(submission.code, submission.language, cases,
+                                    check=checkers.for_problem(submission.problem))
+            if results is None:
+                # Did not compile: no test case runs in either order
+                skipped += 1
+                continue
+            passed = dict(zip((tc.pk for tc in cases), results))
+
+            run_order = teststats.order(cases, stats)
+            calls = teststats.calls_until_verdict([passed[tc.pk] for tc in run_order])
+            for tc in run_order[:calls]:
+                if passed[tc.pk] is not None:
+                    runs, failures = stats.get(tc.pk, (0, 0))
+                    stats[tc.pk] = (runs + 1, failures + (not passed[tc.pk]))
+
+            replayed += 1
+            everything += len(cases)
+            baseline += teststats.calls_until_verdict(results)
+            ordered += calls
+
+        self.stdout.write(f"{replayed} submissions replayed, {skipped} skipped (no test cases or compile error)")
+        if not replayed:
+            return
+        saved = baseline - ordered
+        self.stdout.write(
+            f"executor calls: {everything} without fail-fast, {baseline} in id order, "
+            f"{ordered} in failure-history order"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"saved {saved} calls ({100 * saved / baseline:.1f}% of id order)"
+        ))
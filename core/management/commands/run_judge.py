@@ -0,0 +1,46 @@
+import logging
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import verdicts
+from core.judge_queue import process_next, worker_id
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        "Run a judge worker that grades queued submissions. Start as many as "
+        "needed, on any number of nodes; they share the queue through row leases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=0.5,
+                            help='Seconds to wait when the queue is empty (default 0.5)')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit instead of polling forever')
+
+    def handle(self, *args, **options):
+        owner = worker_id()
+        self.stdout.write(f"Judge worker {owner} started")
+        judged = 0
+        while True:
+            try:
+                found = process_next(owner)
+            except Exception:
+                # Claiming failed (e.g. the database is unreachable); keep the worker alive
+                logger.exception("Judge worker %s could not claim a submission", owner)
+                time.sleep(options['poll'])
+                continue
+            if found:
+                judged += 1
+                continue
+            if options['once']:
+                stats = verdicts.cache_stats()
+                self.stdout.write(
+                    f"Queue empty, judged {judged} submissions "
+                    f"({stats['hits']} answered from the verdict cache)"
+                )
+                return
+            time.sleep(options['poll'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.jobs import queue_status, run_pending
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the background worker: every interval, coalesce pending queue "
+        "markers into one run per job (rank refreshes, stats). Run a single worker."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds between passes (default 1.0)')
+        parser.add_argument('--once', action='store_true', help='Run one pass and exit')
+        parser.add_argument('--status', action='store_true', help='Print queue depth and lag and exit')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            for row in queue_status():
+                self.stdout.write(f"{row['key']:<20} depth={row['depth']:<8} lag={row['lag']:.1f}s")
+            return
+
+        while True:
+            started = time.monotonic()
+            for key, (consumed, seconds) in run_pending().items():
+                self.stdout.write(f"{key}: {consumed} markers coalesced in {seconds * 1000:.0f}ms")
+            if options['once']:
+                return
+            time.sleep(max(0.0, options['interval'] - (time.monotonic() - started)))
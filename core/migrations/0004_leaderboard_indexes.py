@@ -0,0 +1,30 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0003_user_rank_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_role_xp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='user',
+            name='user_role_college_xp_idx',
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', '-xp', 'username'], name='user_leaderboard_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'college', '-xp', 'username'], name='user_college_board_idx'),
+        ),
+    ]
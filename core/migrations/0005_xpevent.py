@@ -0,0 +1,46 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:57
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def record_opening_balances(apps, schema_editor):
+    """Seed the ledger with each user's pre-ledger XP so rollups balance."""
+    User = apps.get_model('core', 'User')
+    XPEvent = apps.get_model('core', 'XPEvent')
+    XPEvent.objects.bulk_create(
+        [
+            XPEvent(user_id=pk, delta=xp, reason='opening_balance')
+            for pk, xp in User.objects.exclude(xp=0).values_list('pk', 'xp')
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0004_leaderboard_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='XPEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField()),
+                ('reason', models.CharField(choices=[('opening_balance', 'Opening balance'), ('forum_thread', 'Forum thread created'), ('forum_reply', 'Forum reply posted'), ('reply_upvoted', 'Forum reply upvoted'), ('problem_solved', 'Problem solved'), ('adjustment', 'Manual adjustment')], max_length=30)),
+                ('source_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('source_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='contenttypes.contenttype')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='xp_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('reason', 'problem_solved')), fields=('user', 'reason', 'source_type', 'source_id'), name='xpevent_one_solve_award')],
+            },
+        ),
+        migrations.RunPython(record_opening_balances, migrations.RunPython.noop),
+    ]
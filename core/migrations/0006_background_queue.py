@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-17 03:59
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import F, Window
+from django.db.models.functions import DenseRank
+
+
+def seed_ranked_xp(apps, schema_editor):
+    """Rank every Student from current XP so ranked_xp starts consistent."""
+    User = apps.get_model('core', 'User')
+    rows = (
+        User.objects.filter(role='Student')
+        .annotate(
+            new_global=Window(DenseRank(), order_by=F('xp').desc()),
+            new_college=Window(DenseRank(), partition_by=F('college'), order_by=F('xp').desc()),
+        )
+        .values_list('pk', 'xp', 'new_global', 'new_college')
+    )
+    User.objects.bulk_update(
+        [User(pk=pk, ranked_xp=xp, global_rank=g, college_rank=c) for pk, xp, g, c in rows],
+        ['ranked_xp', 'global_rank', 'college_rank'],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('core', '0005_xpevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(db_index=True, max_length=50)),
+                ('object_id', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('enqueued_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='ranked_xp',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'ranked_xp'], name='user_ranked_xp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['role', 'college', 'ranked_xp'], name='user_college_ranked_xp_idx'),
+        ),
+        migrations.RunPython(seed_ranked_xp, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-17 04:04
+
+from django.db import migrations, models
+
+
+def backfill_verdicts(apps, schema_editor):
+    Submission = apps.get_model('core', 'Submission')
+    Submission.objects.filter(passed=True).update(verdict='Accepted')
+    Submission.objects.filter(passed=False).update(verdict='Wrong Answer')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_background_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='lease_owner',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='result',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='status',
+            field=models.CharField(choices=[('Queued', 'Queued'), ('Running', 'Running'), ('Finished', 'Finished')], default='Finished', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='verdict',
+            field=models.CharField(blank=True, choices=[('Accepted', 'Accepted'), ('Wrong Answer', 'Wrong Answer'), ('Error', 'Error')], max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'id'], name='submission_queue_idx'),
+        ),
+        migrations.RunPython(backfill_verdicts, migrations.RunPython.noop),
+    ]
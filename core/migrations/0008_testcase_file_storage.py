@@ -0,0 +1,80 @@
+# Generated by Django 6.0.1 on 2026-10-17 05:12
+
+from django.db import migrations, models
+
+
+def move_to_store(apps, schema_editor):
+    from core import testdata
+
+    TestCase = apps.get_model('core', 'TestCase')
+    pks = list(TestCase.objects.order_by('pk').values_list('pk', flat=True))
+    # A few rows at a time, so large test data is never all in memory
+    for start in range(0, len(pks), 50):
+        batch = list(TestCase.objects.filter(pk__in=pks[start:start + 50]))
+        for tc in batch:
+            tc.input_hash, tc.input_size = testdata.put(tc.input_data or "")
+            tc.output_hash, tc.output_size = testdata.put(tc.expected_output or "")
+        TestCase.objects.bulk_update(batch, ['input_hash', 'input_size', 'output_hash', 'output_size'])
+
+
+def move_to_db(apps, schema_editor):
+    from core import testdata
+
+    TestCase = apps.get_model('core', 'TestCase')
+    for pk in list(TestCase.objects.values_list('pk', flat=True)):
+        tc = TestCase.objects.get(pk=pk)
+        tc.input_data = testdata.read(tc.input_hash).decode(errors='replace')
+        tc.expected_output = testdata.read(tc.output_hash).decode(errors='replace')
+        tc.save(update_fields=['input_data', 'expected_output'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_submission_judge_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='input_hash',
+            field=models.CharField(default='', help_text='SHA-256 of the stdin given to the code', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='input_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='output_hash',
+            field=models.CharField(default='', help_text='SHA-256 of the expected stdout', max_length=64),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='output_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(move_to_store, move_to_db),
+        # A default lets the columns be re-added to existing rows when migrating back
+        migrations.AlterField(
+            model_name='testcase',
+            name='input_data',
+            field=models.TextField(default='', help_text='The stdin input given to the code'),
+        ),
+        migrations.AlterField(
+            model_name='testcase',
+            name='expected_output',
+            field=models.TextField(default='', help_text='The expected stdout output from the code'),
+        ),
+        migrations.RemoveField(
+            model_name='testcase',
+            name='input_data',
+        ),
+        migrations.RemoveField(
+            model_name='testcase',
+            name='expected_output',
+        ),
+    ]
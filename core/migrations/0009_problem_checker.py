@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_testcase_file_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='problem',
+            name='checker',
+            field=models.CharField(choices=[('exact', 'Exact (ignoring leading/trailing whitespace)'), ('tokens', 'Tokens (any whitespace between them)'), ('float', 'Tokens, numbers within epsilon'), ('custom', 'Custom checker program')], default='exact', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_code',
+            field=models.TextField(blank=True, help_text='Python checker for the custom mode, run as `checker.py input expected actual`; exit 0 accepts'),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='checker_epsilon',
+            field=models.FloatField(default=1e-06, help_text='Absolute or relative tolerance for the float checker'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_throttle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contest',
+            name='problems',
+            field=models.ManyToManyField(blank=True, related_name='contests', to='core.problem'),
+        ),
+        migrations.AddField(
+            model_name='submission',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Contest'), (1, 'Practice')], default=1),
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['status', 'priority', 'user'], name='submission_schedule_idx'),
+        ),
+    ]
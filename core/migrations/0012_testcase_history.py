@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-17 06:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_submission_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='testcase',
+            name='failures',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='testcase',
+            name='runs',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-17 07:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_testcase_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='submission',
+            name='judge_version',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 07:58
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_submission_judge_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('passed', models.BooleanField()),
+                ('round_trip_ms', models.FloatField()),
+                ('wall_ms', models.FloatField(blank=True, null=True)),
+                ('cpu_ms', models.FloatField(blank=True, null=True)),
+                ('memory_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('recorded_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('submission', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='test_runs', to='core.submission')),
+                ('test_case', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.testcase')),
+            ],
+        ),
+    ]
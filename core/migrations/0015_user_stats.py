@@ -0,0 +1,73 @@
+# Generated by Django 6.0.1 on 2026-10-17 08:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Q
+from django.db.models.functions import Coalesce
+
+
+def summarize_submissions(apps, schema_editor):
+    """Fill both tables from existing submissions, as core.userstats.rebuild() does."""
+    Submission = apps.get_model('core', 'Submission')
+    UserProblemStatus = apps.get_model('core', 'UserProblemStatus')
+    UserStats = apps.get_model('core', 'UserStats')
+    rows = (
+        Submission.objects.order_by().values('user_id', 'problem_id', 'problem__difficulty')
+        .annotate(attempts=Count('id'), accepted=Count('id', filter=Q(passed=True)),
+                  first_solved_at=Min(Coalesce('finished_at', 'submitted_at'), filter=Q(passed=True)))
+    )
+    statuses, totals = [], {}
+    for row in rows:
+        difficulty = row.pop('problem__difficulty')
+        statuses.append(UserProblemStatus(**row))
+        total = totals.setdefault(row['user_id'], UserStats(user_id=row['user_id']))
+        total.attempts += row['attempts']
+        total.accepted += row['accepted']
+        if row['first_solved_at'] is not None:
+            total.solved += 1
+            if difficulty in ('Easy', 'Medium', 'Hard'):
+                field = f"{difficulty.lower()}_solved"
+                setattr(total, field, getattr(total, field) + 1)
+    UserProblemStatus.objects.bulk_create(statuses, batch_size=2000)
+    UserStats.objects.bulk_create(totals.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_testrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('solved', models.PositiveIntegerField(default=0)),
+                ('easy_solved', models.PositiveIntegerField(default=0)),
+                ('medium_solved', models.PositiveIntegerField(default=0)),
+                ('hard_solved', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'user stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserProblemStatus',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('first_solved_at', models.DateTimeField(blank=True, null=True)),
+                ('problem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_statuses', to='core.problem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='problem_statuses', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'problem')},
+            },
+        ),
+        migrations.RunPython(summarize_submissions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-17 08:43
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_submissions(apps, schema_editor):
+    """Fill the counters from existing submissions, as core.problemstats.reconcile() does."""
+    Problem = apps.get_model('core', 'Problem')
+    Submission = apps.get_model('core', 'Submission')
+    rows = Submission.objects.order_by().values('problem_id').annotate(
+        attempts=Count('id'),
+        accepted=Count('id', filter=Q(passed=True)),
+        attempted_users=Count('user', distinct=True),
+        solved_users=Count('user', distinct=True, filter=Q(passed=True)),
+    )
+    problems = []
+    for row in rows:
+        problems.append(Problem(pk=row.pop('problem_id'), **row))
+    Problem.objects.bulk_update(problems, ['attempts', 'accepted', 'attempted_users', 'solved_users'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_user_stats'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='problem',
+            name='acceptance',
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='accepted',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='attempted_users',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='attempts',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='problem',
+            name='solved_users',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_submissions, migrations.RunPython.noop),
+    ]
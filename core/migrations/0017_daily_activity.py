@@ -0,0 +1,43 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:02
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def count_days(apps, schema_editor):
+    """Fill the table from existing submissions, as core.userstats.rebuild() does."""
+    Submission = apps.get_model('core', 'Submission')
+    DailyActivity = apps.get_model('core', 'DailyActivity')
+    rows = (
+        Submission.objects.order_by().values('user_id', day=TruncDate('submitted_at'))
+        .annotate(submissions=Count('id'), accepted=Count('id', filter=Q(passed=True)))
+    )
+    DailyActivity.objects.bulk_create([DailyActivity(**row) for row in rows], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_problem_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_activity', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'daily activity',
+                'unique_together': {('user', 'day')},
+            },
+        ),
+        migrations.RunPython(count_days, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:24
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_daily_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('data', models.JSONField()),
+                ('recount_from', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SubmissionRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('language', models.CharField(max_length=50)),
+                ('college', models.CharField(max_length=100)),
+                ('submissions', models.PositiveIntegerField(default=0)),
+                ('accepted', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='submission',
+            index=models.Index(fields=['submitted_at'], name='submission_submitted_idx'),
+        ),
+        migrations.AddField(
+            model_name='submissionrollup',
+            name='problem',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.problem'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='submissionrollup',
+            unique_together={('hour', 'problem', 'language', 'college')},
+        ),
+    ]
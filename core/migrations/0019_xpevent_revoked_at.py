@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-17 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('core', '0018_submission_analytics'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='xpevent',
+            name='xpevent_one_solve_award',
+        ),
+        migrations.AddField(
+            model_name='xpevent',
+            name='revoked_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='xpevent',
+            name='reason',
+            field=models.CharField(choices=[('opening_balance', 'Opening balance'), ('forum_thread', 'Forum thread created'), ('forum_reply', 'Forum reply posted'), ('reply_upvoted', 'Forum reply upvoted'), ('problem_solved', 'Problem solved'), ('solve_revoked', 'Solve award revoked'), ('adjustment', 'Manual adjustment')], max_length=30),
+        ),
+        migrations.AddConstraint(
+            model_name='xpevent',
+            constraint=models.UniqueConstraint(condition=models.Q(('reason', 'problem_solved'), ('revoked_at', None)), fields=('user', 'reason', 'source_type', 'source_id'), name='xpevent_one_solve_award'),
+        ),
+    ]
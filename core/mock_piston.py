@@ -0,0 +1,115 @@
+"""
+A stand-in for the Piston execute API, for tests and benchmarks.
+
+Every request "runs" by echoing stdin back as stdout after `latency`
+seconds. With probability `failure_rate`, and for the next `fail_next`
+requests, it answers HTTP `failure_status` (500) instead.
+"""
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real service
+
+    def setup(self):
+        super().setup()
+        self.server.mock.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        mock = self.server.mock
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+        mock.count('requests')
+        mock.enter()
+        try:
+            self._execute(mock, payload)
+        finally:
+            mock.leave()
+
+    def _execute(self, mock, payload):
+        if mock.latency:
+            time.sleep(mock.latency)
+
+        if mock.should_fail():
+            self._reply(mock.failure_status, {"message": "Mock Piston failure"})
+            return
+
+        stdin = payload.get('stdin') or ''
+        self._reply(200, {
+            "language": payload.get('language'),
+            "version": "mock",
+            "run": {"stdout": stdin, "stderr": "", "output": stdin, "code": 0, "signal": None,
+                    "wall_time": round(mock.latency * 1000), "cpu_time": 0, "memory": len(stdin)},
+        })
+
+    def _reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockPistonServer:
+    """Threaded local Piston look-alike. Use as a context manager."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, host='127.0.0.1', port=0, seed=None, failure_status=500):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.fail_next = 0
+        self.stats = {'connections': 0, 'requests': 0, 'in_flight': 0, 'max_in_flight': 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v2/piston/execute"
+
+    def count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def should_fail(self):
+        with self._lock:
+            if self.fail_next:
+                self.fail_next -= 1
+                return True
+            return self._rng.random() < self.failure_rate
+
+    def enter(self):
+        with self._lock:
+            self.stats['in_flight'] += 1
+            self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def leave(self):
+        with self._lock:
+            self.stats['in_flight'] -= 1
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
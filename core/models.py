@@ -1,7 +1,16 @@
+import io
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
 from django.utils import timezone
 
+from . import testdata
+
+# XP needed per level; also the scale of the dashboard XP progress bar
+XP_PER_LEVEL = 2000
+
 class User(AbstractUser):
     ROLE_CHOICES = [
         ('Student', 'Student'),
@@ -15,11 +24,24 @@ class User(AbstractUser):
     level = models.IntegerField(default=1)
     xp = models.IntegerField(default=0)
     problem_solved = models.IntegerField(default=0)
+    # XP value the stored ranks currently reflect; trails `xp` until the
+    # background worker processes the user's pending rank refresh
+    ranked_xp = models.IntegerField(null=True, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Leaderboard keyset pagination (core.leaderboard)
+            models.Index(fields=['role', '-xp', 'username'], name='user_leaderboard_idx'),
+            models.Index(fields=['role', 'college', '-xp', 'username'], name='user_college_board_idx'),
+            # Neighbour lookups for incremental rank maintenance (core.ranking)
+            models.Index(fields=['role', 'ranked_xp'], name='user_ranked_xp_idx'),
+            models.Index(fields=['role', 'college', 'ranked_xp'], name='user_college_ranked_xp_idx'),
+        ]
 
     @property
     def xp_percentage(self):
         # Cap at 100% to avoid CSS overflow errors in progress bars
-        return min((self.xp / 2000) * 100, 100)
+        return min((self.xp / XP_PER_LEVEL) * 100, 100)
     
     def __str__(self):
         return self.username
@@ -34,7 +56,6 @@ class Problem(models.Model):
     title = models.CharField(max_length=200)
     difficulty = models.CharField(max_length=20, choices=DIFFICULTY_CHOICES)
     points = models.IntegerField(default=10)
-    acceptance = models.CharField(max_length=10, default='0%')
     tags = models.CharField(max_length=200, blank=True)
     
     # Problem Description Fields
@@ -47,25 +68,126 @@ class Problem(models.Model):
     sample_input = models.TextField(blank=True, null=True)
     sample_output = models.TextField(blank=True, null=True)
 
+    # How outputs are judged (see core.checkers)
+    CHECKER_CHOICES = [
+        ('exact', 'Exact (ignoring leading/trailing whitespace)'),
+        ('tokens', 'Tokens (any whitespace between them)'),
+        ('float', 'Tokens, numbers within epsilon'),
+        ('custom', 'Custom checker program'),
+    ]
+    checker = models.CharField(max_length=10, choices=CHECKER_CHOICES, default='exact')
+    checker_epsilon = models.FloatField(default=1e-6, help_text="Absolute or relative tolerance for the float checker")
+    checker_code = models.TextField(
+        blank=True,
+        help_text="Python checker for the custom mode, run as `checker.py input expected actual`; exit 0 accepts",
+    )
+
+    # Submission counters, bumped as submissions arrive and reconciled
+    # periodically (see core.problemstats)
+    attempts = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    attempted_users = models.PositiveIntegerField(default=0)
+    solved_users = models.PositiveIntegerField(default=0)
+
+    @property
+    def acceptance(self):
+        """Share of submissions accepted, e.g. '42.5%'."""
+        if not self.attempts:
+            return '0%'
+        return f"{100 * self.accepted / self.attempts:.1f}%"
+
     def __str__(self):
         return self.title
 
 class TestCase(models.Model):
     """
     Hidden test cases used for grading code submissions via Piston.
+
+    The input and expected output live in the compressed, content-addressed
+    store in core.testdata; the row keeps their SHA-256 and size. Assigning
+    `input_data` / `expected_output` (also as constructor arguments) keeps
+    the text in memory until save() writes it to the store.
     """
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='test_cases')
-    input_data = models.TextField(help_text="The stdin input given to the code")
-    expected_output = models.TextField(help_text="The expected stdout output from the code")
+    input_hash = models.CharField(max_length=64, help_text="SHA-256 of the stdin given to the code")
+    input_size = models.BigIntegerField(default=0)
+    output_hash = models.CharField(max_length=64, help_text="SHA-256 of the expected stdout")
+    output_size = models.BigIntegerField(default=0)
     is_hidden = models.BooleanField(default=True, help_text="If True, the user won't see the input/output on failure")
+    # Judging history, used to run likely failures first (see core.teststats)
+    runs = models.PositiveIntegerField(default=0)
+    failures = models.PositiveIntegerField(default=0)
+
+    def __init__(self, *args, **kwargs):
+        self._pending = {}
+        super().__init__(*args, **kwargs)
 
     def __str__(self):
         return f"TestCase for {self.problem.title} (Hidden: {self.is_hidden})"
 
+    def _set(self, name, value):
+        data = (value or "").encode()
+        digest = testdata.digest_of(data)
+        setattr(self, f"{name}_hash", digest)
+        setattr(self, f"{name}_size", len(data))
+        self._pending[name] = data
+
+    def _open(self, name):
+        if name in self._pending:
+            return io.BytesIO(self._pending[name])
+        return testdata.open_blob(getattr(self, f"{name}_hash"))
+
+    def open_input(self):
+        """Binary stream of the stdin, read from the store in chunks."""
+        return self._open('input')
+
+    def open_expected(self):
+        """Binary stream of the expected stdout."""
+        return self._open('output')
+
+    @property
+    def input_data(self):
+        with self.open_input() as f:
+            return f.read().decode(errors='replace')
+
+    @input_data.setter
+    def input_data(self, value):
+        self._set('input', value)
+
+    @property
+    def expected_output(self):
+        with self.open_expected() as f:
+            return f.read().decode(errors='replace')
+
+    @expected_output.setter
+    def expected_output(self, value):
+        self._set('output', value)
+
+    def save(self, *args, **kwargs):
+        for data in self._pending.values():
+            testdata.put(data)
+        self._pending = {}
+        super().save(*args, **kwargs)
+
 class Submission(models.Model):
     """
     Tracks every code submission attempt.
+
+    Submissions are graded asynchronously: they start out Queued, a judge
+    worker (`manage.py run_judge`) leases one by moving it to Running and
+    stores the outcome in `result` when Finished.
     """
+    STATUS_CHOICES = [
+        ('Queued', 'Queued'),
+        ('Running', 'Running'),
+        ('Finished', 'Finished'),
+    ]
+    VERDICT_CHOICES = [
+        ('Accepted', 'Accepted'),
+        ('Wrong Answer', 'Wrong Answer'),
+        ('Error', 'Error'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='submissions')
     problem = models.ForeignKey(Problem, on_delete=models.CASCADE)
     code = models.TextField()
@@ -73,10 +195,232 @@ class Submission(models.Model):
     passed = models.BooleanField(default=False)
     submitted_at = models.DateTimeField(auto_now_add=True)
 
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Finished')
+    verdict = models.CharField(max_length=20, choices=VERDICT_CHOICES, blank=True)
+    # JSON response served to the problem page once judging finishes
+    result = models.JSONField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    # Row lease held by the judge worker currently grading this submission
+    lease_owner = models.CharField(max_length=100, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.IntegerField(default=0)
+    # verdicts.judge_version() of the tests this was judged against; a
+    # different current version means the verdict may be stale
+    judge_version = models.CharField(max_length=64, blank=True)
+
+    # Scheduling class (see core.scheduler); lower is judged first
+    PRIORITY_CHOICES = [
+        (0, 'Contest'),
+        (1, 'Practice'),
+    ]
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='submission_queue_idx'),
+            models.Index(fields=['status', 'priority', 'user'], name='submission_schedule_idx'),
+            models.Index(fields=['submitted_at'], name='submission_submitted_idx'),
+        ]
+
+    @property
+    def queue_wait(self):
+        if self.started_at:
+            return self.started_at - self.submitted_at
+        return None
+
+    @property
+    def judge_time(self):
+        if self.started_at and self.finished_at:
+            return self.finished_at - self.started_at
+        return None
+
     def __str__(self):
         status = "Passed" if self.passed else "Failed"
         return f"{self.user.username} - {self.problem.title} - {status}"
 
+class TestRun(models.Model):
+    """
+    How one test case ran for a judged submission: time spent waiting on
+    the executor, the backend's wall and CPU time, and peak memory (see
+    core.telemetry). Backend figures are null when it does not report them.
+    """
+    submission = models.ForeignKey(Submission, on_delete=models.CASCADE, related_name='test_runs')
+    test_case = models.ForeignKey(TestCase, on_delete=models.SET_NULL, null=True, blank=True)
+    passed = models.BooleanField()
+    round_trip_ms = models.FloatField()
+    wall_ms = models.FloatField(null=True, blank=True)
+    cpu_ms = models.FloatField(null=True, blank=True)
+    memory_bytes = models.BigIntegerField(null=True, blank=True)
+    recorded_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.submission_id} / {self.test_case_id}: {self.round_trip_ms:.0f}ms"
+
+class UserProblemStatus(models.Model):
+    """
+    A user's submissions to one problem, summarized (see core.userstats):
+    how many, how many passed, and when the first one passed.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='problem_statuses')
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='user_statuses')
+    attempts = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    first_solved_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('user', 'problem')
+
+    def __str__(self):
+        return f"{self.user_id} / {self.problem_id}: {self.accepted}/{self.attempts}"
+
+class UserStats(models.Model):
+    """
+    Submission totals of one user, summed over their UserProblemStatus rows
+    (see core.userstats). `solved` counts distinct problems.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    attempts = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+    solved = models.PositiveIntegerField(default=0)
+    easy_solved = models.PositiveIntegerField(default=0)
+    medium_solved = models.PositiveIntegerField(default=0)
+    hard_solved = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'user stats'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.solved} solved in {self.attempts} attempts"
+
+class DailyActivity(models.Model):
+    """
+    A user's submissions on one day, and how many of them passed (see
+    core.userstats). Activity charts and streaks read one row per day.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_activity')
+    day = models.DateField()
+    submissions = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('user', 'day')
+        verbose_name_plural = 'daily activity'
+
+    def __str__(self):
+        return f"{self.user_id} on {self.day}: {self.accepted}/{self.submissions}"
+
+class SubmissionRollup(models.Model):
+    """
+    Submissions per hour, problem, language and college (the submitter's),
+    and how many passed. Maintained by core.analytics for the admin
+    dashboard's submission insights.
+    """
+    hour = models.DateTimeField()
+    problem = models.ForeignKey(Problem, on_delete=models.CASCADE, related_name='+')
+    language = models.CharField(max_length=50)
+    college = models.CharField(max_length=100)
+    submissions = models.PositiveIntegerField(default=0)
+    accepted = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('hour', 'problem', 'language', 'college')
+
+    def __str__(self):
+        return f"{self.hour:%Y-%m-%d %H}:00 {self.problem_id}/{self.language}/{self.college}: {self.submissions}"
+
+class AnalyticsSnapshot(models.Model):
+    """
+    The admin dashboard's submission insights as computed at `created_at`
+    by `manage.py refresh_analytics` (see core.analytics). Only the latest
+    is kept.
+    """
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    data = models.JSONField()
+    # Start of the oldest hour the next refresh has to recount
+    recount_from = models.DateTimeField()
+
+    def __str__(self):
+        return f"Analytics as of {self.created_at:%Y-%m-%d %H:%M}"
+
+class XPEvent(models.Model):
+    """
+    Append-only ledger of XP awards. User.xp is a running balance of these
+    rows and is reconciled against them by `manage.py reconcile_xp`. A
+    solve award that a rejudge leaves without a passing submission is
+    offset by a 'solve_revoked' event and marked revoked_at, so the user
+    can earn it again (see xp.revoke_solve_award).
+    """
+    REASON_CHOICES = [
+        ('opening_balance', 'Opening balance'),
+        ('forum_thread', 'Forum thread created'),
+        ('forum_reply', 'Forum reply posted'),
+        ('reply_upvoted', 'Forum reply upvoted'),
+        ('problem_solved', 'Problem solved'),
+        ('solve_revoked', 'Solve award revoked'),
+        ('adjustment', 'Manual adjustment'),
+    ]
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='xp_events')
+    delta = models.IntegerField()
+    reason = models.CharField(max_length=30, choices=REASON_CHOICES)
+    source_type = models.ForeignKey(ContentType, on_delete=models.SET_NULL, null=True, blank=True)
+    source_id = models.PositiveBigIntegerField(null=True, blank=True)
+    source = GenericForeignKey('source_type', 'source_id')
+    created_at = models.DateTimeField(default=timezone.now)
+    # Set on a solve award when a 'solve_revoked' event offsets it
+    revoked_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            # A problem pays out once per user, even under concurrent submissions
+            models.UniqueConstraint(
+                fields=['user', 'reason', 'source_type', 'source_id'],
+                condition=models.Q(reason='problem_solved', revoked_at=None),
+                name='xpevent_one_solve_award',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} {self.delta:+d} XP ({self.reason})"
+
+class QueuedJob(models.Model):
+    """
+    Marker asking the background worker to run the job registered under
+    `key` (see core.jobs). Markers are insert-only; the worker coalesces all
+    pending markers for a key into a single run and then deletes them.
+    """
+    key = models.CharField(max_length=50, db_index=True)
+    object_id = models.PositiveBigIntegerField(null=True, blank=True)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} ({self.object_id})" if self.object_id else self.key
+
+class RateLimit(models.Model):
+    """
+    Token bucket of one user on one endpoint (see core.throttle), stored as
+    the Unix time at which the bucket is full again.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    tat = models.FloatField()
+
+    def __str__(self):
+        return self.key
+
+class ExecutionSlot(models.Model):
+    """
+    One of the THROTTLE_MAX_EXECUTIONS slots for code running on behalf of
+    `run_code`, leased by `holder` until `expires_at` (see core.throttle).
+    """
+    slot = models.PositiveSmallIntegerField(primary_key=True)
+    holder = models.CharField(max_length=32, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"slot {self.slot}"
+
 class Contest(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
@@ -86,6 +430,8 @@ class Contest(models.Model):
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     participants = models.IntegerField(default=0)
+    # Submissions to these problems while the contest is live are judged first
+    problems = models.ManyToManyField(Problem, blank=True, related_name='contests')
 
     @property
     def duration(self):
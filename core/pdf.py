@@ -0,0 +1,229 @@
+"""
+Rendering of the student coding report PDF.
+
+This module needs only ReportLab, not Django, so core.reports can run it
+in worker processes. `data` holds the plain values gathered by
+core.reports.report_data().
+"""
+import os
+import tempfile
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+from reportlab.platypus import Table, TableStyle
+
+
+def write_report(data, path, generated_at):
+    """Render the report for `data` to `path` atomically, so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            render_report(data, out, generated_at)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def render_report(data, out, generated_at):
+    """Draw the one-page report into the binary file `out`."""
+    c = canvas.Canvas(out, pagesize=A4)
+    width, height = A4
+    
+    # Colors
+    PRIMARY_COLOR = colors.HexColor("#1E4A7A")
+    ACCENT_COLOR = colors.HexColor("#3B82F6")
+    GREY_BG = colors.HexColor("#F3F4F6")
+    TEXT_GREY = colors.HexColor("#6B7280")
+    
+    # --- 3. DRAW HEADER ---
+    # Logo Placeholder (CC)
+    c.setFillColor(PRIMARY_COLOR)
+    c.rect(40, height - 80, 50, 50, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 24)
+    c.drawCentredString(65, height - 68, "CC")
+    
+    # Title & Date
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 20)
+    c.drawString(110, height - 55, "STUDENT CODING REPORT")
+    c.setFont("Helvetica", 10)
+    c.setFillColor(TEXT_GREY)
+    c.drawString(110, height - 70, "Generated by CampusCode Platform")
+    
+    # Report Meta (Right Side)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawRightString(width - 40, height - 50, f"DATE: {generated_at.strftime('%b %d, %Y')}")
+    c.drawRightString(width - 40, height - 65, f"ID: RPT-{generated_at.strftime('%Y')}-{data['user_id']}")
+
+    # Separator Line
+    c.setStrokeColor(colors.lightgrey)
+    c.line(40, height - 90, width - 40, height - 90)
+
+    # --- 4. SECTION 1: STUDENT PROFILE ---
+    y_position = height - 130
+    c.setFillColor(PRIMARY_COLOR)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y_position, "1. STUDENT PROFILE")
+    
+    y_position -= 20
+    
+    # Profile Data Grid
+    profile_data = [
+        ["NAME", data['name']],
+        ["USERNAME", f"@{data['username']}"],
+        ["EMAIL", data['email']],
+        ["COLLEGE", data['college'] or "N/A"],
+    ]
+    
+    # Draw Profile Grid manually for custom look
+    row_h = 25
+    col_w = 200
+    current_y = y_position
+    
+    c.setFont("Helvetica-Bold", 9)
+    c.setFillColor(TEXT_GREY)
+    
+    # Left Column
+    c.drawString(40, current_y, "NAME")
+    c.drawString(40 + col_w, current_y, "USERNAME")
+    
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 11)
+    c.drawString(40, current_y - 15, profile_data[0][1])
+    c.drawString(40 + col_w, current_y - 15, profile_data[1][1])
+    
+    current_y -= 40
+    
+    c.setFont("Helvetica-Bold", 9)
+    c.setFillColor(TEXT_GREY)
+    c.drawString(40, current_y, "EMAIL")
+    c.drawString(40 + col_w, current_y, "COLLEGE")
+    
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica", 11)
+    c.drawString(40, current_y - 15, profile_data[2][1])
+    c.drawString(40 + col_w, current_y - 15, profile_data[3][1])
+
+    # --- 5. SECTION 2: PERFORMANCE SUMMARY ---
+    y_position = current_y - 50
+    c.setFillColor(PRIMARY_COLOR)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y_position, "2. PERFORMANCE SUMMARY")
+    
+    y_position -= 20
+    
+    # Metrics Cards (Visualized as rectangles)
+    metrics = [
+        ("PROBLEMS SOLVED", str(data['solved'])),
+        ("GLOBAL RANK", f"#{data['global_rank']}"),
+        ("ACCURACY", f"{data['accuracy']:.1f}%"),
+        ("SKILL SCORE (XP)", str(data['xp']))
+    ]
+    
+    card_width = (width - 80 - 30) / 4 # 4 cards with 10px gap
+    card_height = 50
+    
+    for i, (label, value) in enumerate(metrics):
+        x = 40 + (i * (card_width + 10))
+        # Draw background
+        c.setFillColor(GREY_BG)
+        c.roundRect(x, y_position - card_height, card_width, card_height, 4, fill=1, stroke=0)
+        
+        # Draw Label
+        c.setFillColor(TEXT_GREY)
+        c.setFont("Helvetica-Bold", 7)
+        c.drawCentredString(x + card_width/2, y_position - 15, label)
+        
+        # Draw Value
+        c.setFillColor(PRIMARY_COLOR)
+        c.setFont("Helvetica-Bold", 16)
+        c.drawCentredString(x + card_width/2, y_position - 35, value)
+
+    # --- 6. SECTION 3: DIFFICULTY DISTRIBUTION (TABLE) ---
+    y_position -= (card_height + 40)
+    c.setFillColor(PRIMARY_COLOR)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y_position, "3. DIFFICULTY BREAKDOWN")
+    
+    y_position -= 10
+    
+    # Table Data
+    easy_count, med_count, hard_count = data['easy_solved'], data['medium_solved'], data['hard_solved']
+    table_data = [
+        ['LEVEL', 'SOLVED', 'ATTEMPTED', 'STATUS'],
+        ['Easy', str(easy_count), '-', 'High Proficiency' if easy_count > 10 else 'Learning'],
+        ['Medium', str(med_count), '-', 'Intermediate' if med_count > 5 else 'Learning'],
+        ['Hard', str(hard_count), '-', 'Expert' if hard_count > 2 else 'Beginner'],
+    ]
+    
+    # Create Table
+    t = Table(table_data, colWidths=[100, 100, 100, 215])
+    t.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.black),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 10),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, GREY_BG]),
+        ('ALIGN', (1, 0), (2, -1), 'CENTER'), # Center numbers
+    ]))
+    
+    # Draw Table
+    w, h = t.wrapOn(c, width, height)
+    t.drawOn(c, 40, y_position - h)
+    
+    # --- 7. SECTION 4: CONTEST HISTORY (TABLE) ---
+    y_position -= (h + 40)
+    c.setFillColor(PRIMARY_COLOR)
+    c.setFont("Helvetica-Bold", 12)
+    c.drawString(40, y_position, "4. RECENT CONTEST ACTIVITY")
+    
+    y_position -= 10
+    
+    contest_data = [['CONTEST NAME', 'DATE', 'STATUS', 'DURATION']]
+    
+    for title, date, duration in data['contests']:
+        contest_data.append([
+            title,
+            date,
+            "Participated", # Placeholder logic
+            duration
+        ])
+        
+    if len(contest_data) == 1:
+        contest_data.append(["No contest data available", "-", "-", "-"])
+
+    t2 = Table(contest_data, colWidths=[200, 100, 100, 115])
+    t2.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), PRIMARY_COLOR),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, GREY_BG]),
+    ]))
+    
+    w2, h2 = t2.wrapOn(c, width, height)
+    t2.drawOn(c, 40, y_position - h2)
+    
+    # --- FOOTER ---
+    c.setFont("Helvetica", 9)
+    c.setFillColor(TEXT_GREY)
+    c.drawString(40, 30, "CampusCode Learning Platform")
+    c.drawRightString(width - 40, 30, "Page 1 of 1")
+
+    # Finalize
+    c.showPage()
+    c.save()
@@ -0,0 +1,65 @@
+"""
+Per-problem submission counters behind the acceptance rates of the problem list.
+
+Each Problem counts its submissions (`attempts`), the accepted ones
+(`accepted`), and the distinct users who submitted (`attempted_users`)
+and solved it (`solved_users`). The counters are bumped with F()
+expressions in the transactions that create a submission and store a
+passing verdict, so the problem list reads them from its one query.
+Distinct users come from core.userstats, which knows a user's first
+attempt and first solve of a problem.
+
+reconcile() recounts them from the submissions. Run it periodically
+(`manage.py reconcile_acceptance`); rejudges reconcile the problems they
+touched.
+"""
+from django.db.models import Count, F, Q
+
+from .models import Problem, Submission
+
+
+COUNTERS = ('attempts', 'accepted', 'attempted_users', 'solved_users')
+
+
+def record_submission(problem_id, first_attempt):
+    """Count a new submission; `first_attempt` if its user never submitted to the problem before."""
+    updates = {'attempts': F('attempts') + 1}
+    if first_attempt:
+        updates['attempted_users'] = F('attempted_users') + 1
+    Problem.objects.filter(pk=problem_id).update(**updates)
+
+
+def record_accepted(problem_id, first_solve):
+    """Count a passing verdict; `first_solve` if it is its user's first for the problem."""
+    updates = {'accepted': F('accepted') + 1}
+    if first_solve:
+        updates['solved_users'] = F('solved_users') + 1
+    Problem.objects.filter(pk=problem_id).update(**updates)
+
+
+def reconcile(problem_ids=None):
+    """Recount the counters of `problem_ids` (default: all problems) from submissions. Returns problems corrected."""
+    submissions = Submission.objects.all()
+    problems = Problem.objects.only('pk', *COUNTERS)
+    if problem_ids is not None:
+        submissions = submissions.filter(problem_id__in=problem_ids)
+        problems = problems.filter(pk__in=problem_ids)
+    counts = {
+        row.pop('problem_id'): row
+        for row in submissions.order_by().values('problem_id').annotate(
+            attempts=Count('id'),
+            accepted=Count('id', filter=Q(passed=True)),
+            attempted_users=Count('user', distinct=True),
+            solved_users=Count('user', distinct=True, filter=Q(passed=True)),
+        )
+    }
+
+    to_update = []
+    for problem in problems.iterator(chunk_size=2000):
+        expected = counts.get(problem.pk, dict.fromkeys(COUNTERS, 0))
+        if any(getattr(problem, name) != expected[name] for name in COUNTERS):
+            for name in COUNTERS:
+                setattr(problem, name, expected[name])
+            to_update.append(problem)
+    Problem.objects.bulk_update(to_update, COUNTERS, batch_size=2000)
+    return len(to_update)
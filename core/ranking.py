@@ -0,0 +1,153 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import DenseRank
+
+from .models import User
+
+# Above this many dirty users a full rebuild beats per-user moves
+FULL_REBUILD_THRESHOLD = getattr(settings, 'RANK_FULL_REBUILD_THRESHOLD', 500)
+
+
+def compute_and_update_ranks(chunk_size=2000):
+    """Recalculate and persist global and college ranks for all Students.
+
+    Ranking rules:
+    - Higher XP -> better (lower) rank (1 is best).
+    - Users with equal XP receive the same rank (dense ranking).
+
+    Ranks are computed by the database with DENSE_RANK() window functions
+    and only rows whose stored rank differs are written, `chunk_size` rows
+    per UPDATE. Afterwards `ranked_xp` equals `xp` for every Student.
+    Returns the number of rows changed.
+    """
+    stale = (
+        User.objects.filter(role='Student')
+        .annotate(
+            new_global=Window(DenseRank(), order_by=F('xp').desc()),
+            new_college=Window(DenseRank(), partition_by=F('college'), order_by=F('xp').desc()),
+        )
+        .filter(
+            ~Q(global_rank=F('new_global'))
+            | ~Q(college_rank=F('new_college'))
+            | ~Q(ranked_xp=F('xp'))
+            | Q(ranked_xp__isnull=True)
+        )
+        .values_list('pk', 'xp', 'new_global', 'new_college')
+    )
+
+    # Materialise before writing: SQLite cannot safely update rows under an
+    # open cursor on the same table.
+    rows = list(stale)
+
+    changed = 0
+    for i in range(0, len(rows), chunk_size):
+        batch = [
+            User(pk=pk, ranked_xp=xp, global_rank=global_rank, college_rank=college_rank)
+            for pk, xp, global_rank, college_rank in rows[i:i + chunk_size]
+        ]
+        changed += User.objects.bulk_update(batch, ['ranked_xp', 'global_rank', 'college_rank'])
+    return changed
+
+
+def _move_in_scope(scope, field, user_pk, old_xp, new_xp):
+    """Move one user from `old_xp` to `new_xp` inside a ranking scope.
+
+    `scope` is the queryset of users ranked together and `field` the rank
+    column kept for it. Other users are placed by `ranked_xp`, the XP their
+    stored ranks reflect. Either XP value may be None, meaning the user is
+    joining or leaving the scope. With dense ranking a user's rank is one
+    plus the number of distinct XP values above theirs, so the only ranks
+    that move are those below an XP value that appeared or disappeared.
+    Returns the user's new rank (None when leaving).
+    """
+    others = scope.exclude(pk=user_pk)
+
+    new_added = new_xp is not None and not others.filter(ranked_xp=new_xp).exists()
+    old_gone = old_xp is not None and not others.filter(ranked_xp=old_xp).exists()
+
+    if old_xp is not None and new_xp is not None and new_added and old_gone:
+        # Both values changed hands: only the band in between shifts.
+        if new_xp > old_xp:
+            others.filter(ranked_xp__gt=old_xp, ranked_xp__lt=new_xp).update(**{field: F(field) + 1})
+        else:
+            others.filter(ranked_xp__gt=new_xp, ranked_xp__lt=old_xp).update(**{field: F(field) - 1})
+    elif new_added:
+        others.filter(ranked_xp__lt=new_xp).update(**{field: F(field) + 1})
+    elif old_gone:
+        others.filter(ranked_xp__lt=old_xp).update(**{field: F(field) - 1})
+
+    if new_xp is None:
+        return None
+
+    if not new_added:
+        # Share the rank of anyone already holding this XP.
+        return others.filter(ranked_xp=new_xp).values_list(field, flat=True)[0]
+
+    above = others.filter(ranked_xp__gt=new_xp).order_by('ranked_xp').values_list(field, flat=True)[:1]
+    return above[0] + 1 if above else 1
+
+
+def update_ranks_for_xp_change(user, old_xp, new_xp=None, old_college=None):
+    """Incrementally maintain dense ranks after a single Student changes.
+
+    Produces the same ranks as `compute_and_update_ranks()` but only writes
+    the rows whose global or college rank actually moves. `old_xp` is the
+    user's current `ranked_xp`; pass None for a newly ranked Student and
+    `old_college` when the college changed. `new_xp` defaults to `user.xp`.
+    The user's rank columns and `ranked_xp` are updated both in the
+    database and on the passed instance.
+    """
+    if user.role != 'Student':
+        return
+    if new_xp is None:
+        new_xp = user.xp
+    if old_college is None:
+        old_college = user.college
+
+    students = User.objects.filter(role='Student')
+
+    with transaction.atomic():
+        user.global_rank = _move_in_scope(students, 'global_rank', user.pk, old_xp, new_xp)
+
+        if old_college == user.college:
+            user.college_rank = _move_in_scope(
+                students.filter(college=user.college), 'college_rank', user.pk, old_xp, new_xp
+            )
+        else:
+            _move_in_scope(students.filter(college=old_college), 'college_rank', user.pk, old_xp, None)
+            user.college_rank = _move_in_scope(
+                students.filter(college=user.college), 'college_rank', user.pk, None, new_xp
+            )
+
+        user.ranked_xp = new_xp
+        User.objects.filter(pk=user.pk).update(
+            ranked_xp=new_xp, global_rank=user.global_rank, college_rank=user.college_rank
+        )
+
+
+def refresh_ranks(user_ids):
+    """Bring ranks up to date for users whose XP changed since last ranked.
+
+    Each user moves once from `ranked_xp` to their current `xp`, however
+    many awards they received in between. Large batches fall back to a
+    full rebuild. Returns the number of users moved or rows rebuilt.
+    """
+    if len(user_ids) > FULL_REBUILD_THRESHOLD:
+        return compute_and_update_ranks()
+
+    moved = 0
+    for user in User.objects.filter(pk__in=user_ids, role='Student').exclude(ranked_xp=F('xp')):
+        update_ranks_for_xp_change(user, user.ranked_xp)
+        moved += 1
+    return moved
+
+
+def remove_from_ranks(user):
+    """Close the rank gap left by a Student who is about to be deleted."""
+    if user.role != 'Student':
+        return
+    students = User.objects.filter(role='Student')
+    with transaction.atomic():
+        _move_in_scope(students, 'global_rank', user.pk, user.ranked_xp, None)
+        _move_in_scope(students.filter(college=user.college), 'college_rank', user.pk, user.ranked_xp, None)
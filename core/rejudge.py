@@ -0,0 +1,94 @@
+"""
+Rejudging submissions after a problem's tests or checker change.
+
+Each finished submission stores the verdicts.judge_version() it was judged
+against. rejudge() grades again only the submissions whose version differs
+from their problem's current one, several at a time through the judge. It
+stores each new verdict as soon as it is known. Progress therefore
+survives an interruption: running it again picks up what is still stale.
+
+A rejudge that flips a verdict does not touch XP directly. It queues a
+'solve_awards' job marker, and at the end all solve awards and ranks are
+settled in a single pass. Markers left by an interrupted run are settled
+by the next one, or by the background worker.
+"""
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+
+from . import judge, jobs, verdicts
+from .judge_queue import result_fields, test_cases_for
+from .models import Problem, Submission
+
+
+# Submissions graded at once during a rejudge
+WORKERS = getattr(settings, 'JUDGE_REJUDGE_WORKERS', 4)
+
+
+def stale(problems=None):
+    """[(problem, test_cases, version, submission pks)] for problems with stale verdicts."""
+    plan = []
+    for problem in (Problem.objects.all() if problems is None else problems):
+        test_cases = test_cases_for(problem)
+        version = verdicts.judge_version(problem, test_cases)
+        pks = list(
+            Submission.objects.filter(problem=problem, status='Finished')
+            .exclude(judge_version=version).order_by('pk').values_list('pk', flat=True)
+        )
+        if pks:
+            plan.append((problem, test_cases, version, pks))
+    return plan
+
+
+def rejudge(problems=None, workers=None, progress=None):
+    """Rejudge the stale submissions of `problems` (default: all) and settle XP and ranks.
+
+    `progress(done, total, changed)` is called after each submission.
+    A submission the backend could not grade is left stale for a later
+    run. Returns {"total", "rejudged", "changed", "failed"}.
+    """
+    plan = stale(problems)
+    total = sum(len(pks) for *_, pks in plan)
+    counts = {"total": total, "rejudged": 0, "changed": 0, "failed": 0}
+    workers = workers or WORKERS
+
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='rejudge')
+    try:
+        for problem, test_cases, version, pks in plan:
+            # Grading threads only run code; the database is used from here
+            queue = iter(pks)
+            running = {}
+            while True:
+                while len(running) < 2 * workers:
+                    pk = next(queue, None)
+                    if pk is None:
+                        break
+                    submission = Submission.objects.only('pk', 'code', 'language', 'passed').get(pk=pk)
+                    future = pool.submit(verdicts.grade, problem, submission.code, submission.language, test_cases)
+                    running[future] = submission
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    _store(running.pop(future), future.result(), version, counts)
+                    if progress:
+                        progress(counts["rejudged"] + counts["failed"], total, counts["changed"])
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    jobs.run_pending(keys={'solve_awards'})
+    return counts
+
+
+def _store(submission, outcome, version, counts):
+    if outcome["verdict"] == "error" and outcome["message"] in (judge.UNAVAILABLE, judge.API_FAILED):
+        counts["failed"] += 1
+        return
+    passed, verdict, result = result_fields(outcome)
+    updated = Submission.objects.filter(pk=submission.pk, status='Finished').update(
+        passed=passed, verdict=verdict, result=result, judge_version=version,
+    )
+    counts["rejudged"] += 1
+    if updated and passed != submission.passed:
+        counts["changed"] += 1
+        jobs.enqueue('solve_awards', submission.pk)
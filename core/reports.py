@@ -0,0 +1,297 @@
+"""
+Cached student report PDFs.
+
+A report is stored at REPORT_DIR/<user id>/<version>.pdf, where the
+version is a hash of everything the report shows (see report_data()).
+Requests whose data has not changed get the stored file, or 304 Not
+Modified when the browser already has it (the version is the ETag).
+
+When the data has changed, the PDF is rendered by core.pdf in a pool of
+REPORT_WORKERS processes, never in the web process itself. The request
+waits up to REPORT_WAIT_SECONDS for it. If it is not ready by then, the
+user's previous report is served if there is one; otherwise
+ReportPending is raised. Concurrent requests for the same version share
+one render, and a finished render replaces the user's older versions.
+"""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+import zipfile
+from concurrent import futures
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import pdf, userstats
+from .models import Contest, User, UserStats
+
+
+REPORT_DIR = getattr(settings, 'REPORT_DIR', os.path.join(settings.BASE_DIR, 'reports'))
+# Processes rendering PDFs, per web process
+WORKERS = getattr(settings, 'REPORT_WORKERS', 2)
+# How long a request waits for a fresh PDF before falling back
+WAIT_SECONDS = getattr(settings, 'REPORT_WAIT_SECONDS', 10)
+
+_pool = None
+_renders = {}
+_lock = threading.Lock()
+
+
+class ReportPending(Exception):
+    """The report is still being generated; try again in `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=2):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def report_data(user):
+    """Everything the report shows, as plain values: the user's profile, stats and recent contests."""
+    return _data(user, userstats.stats_for(user), _recent_contests())
+
+
+def college_data(college):
+    """report_data() for every student of `college`, from two queries."""
+    contests = _recent_contests()
+    students = User.objects.filter(role='Student', college=college).select_related('stats').order_by('username')
+    return [_data(user, _stats_of(user), contests) for user in students]
+
+
+def _data(user, summary, contests):
+    return {
+        'user_id': user.id,
+        'name': f"{user.first_name} {user.last_name}" if user.first_name else user.username,
+        'username': user.username,
+        'email': user.email,
+        'college': user.college,
+        'global_rank': user.global_rank,
+        'xp': user.xp,
+        'solved': summary.solved,
+        'accuracy': (summary.accepted / summary.attempts * 100) if summary.attempts else 0,
+        'easy_solved': summary.easy_solved,
+        'medium_solved': summary.medium_solved,
+        'hard_solved': summary.hard_solved,
+        'contests': contests,
+    }
+
+
+def _recent_contests():
+    contests = Contest.objects.filter(status='Past').order_by('-start_time')[:5]
+    return [[c.title, c.start_time.strftime('%Y-%m-%d'), str(c.duration)] for c in contests]
+
+
+def _stats_of(user):
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return UserStats(user=user)
+
+
+def version(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def path_for(user_id, report_version):
+    return os.path.join(REPORT_DIR, str(user_id), f"{report_version}.pdf")
+
+
+def get(user, wait=None):
+    """(open binary file, version) of `user`'s current report, rendering it if needed. The caller closes the file.
+
+    Falls back to the previous report, with its own version, when the
+    current one is not ready within `wait` seconds (default WAIT_SECONDS).
+    """
+    data = report_data(user)
+    current = version(data)
+    path = path_for(user.id, current)
+    report = _open(path)
+    if report is None:
+        future = render(data, current)
+        try:
+            future.result(timeout=WAIT_SECONDS if wait is None else wait)
+        except TimeoutError:
+            pass
+        report = _open(path)
+    if report is not None:
+        return report, current
+
+    # A render finishing now removes the previous reports, but only after
+    # writing its own: keep looking until one of them opens
+    while (previous := _latest(user.id, exclude=path)) is not None:
+        report = _open(previous)
+        if report is not None:
+            return report, os.path.splitext(os.path.basename(previous))[0]
+    report = _open(path)
+    if report is None:
+        raise ReportPending("Your report is being generated, try again in a moment")
+    return report, current
+
+
+def render(data, report_version, executor=None):
+    """Start rendering `data` in `executor` (default: the shared pool), or join the render already running for it.
+
+    Returns its Future.
+    """
+    path = path_for(data['user_id'], report_version)
+    with _lock:
+        future = _renders.get(path)
+        if future is not None:
+            return future
+        try:
+            future = (executor or _get_pool()).submit(pdf.write_report, data, path, timezone.now())
+        except BrokenProcessPool:
+            if executor is not None:
+                raise
+            # A worker died (e.g. killed for memory); start a new pool
+            _reset_pool()
+            future = _get_pool().submit(pdf.write_report, data, path, timezone.now())
+        _renders[path] = future
+    # Outside the lock: runs right away if the render is already done
+    future.add_done_callback(lambda f: _finished(path, f))
+    return future
+
+
+def export_college(college, summary, executor=None, in_flight=None):
+    """Yield a ZIP archive of the reports of every student of `college`, a piece at a time.
+
+    Stats are collected in a few set-based queries. Reports already in the
+    cache are used as they are; the rest are rendered in parallel by
+    `executor` (default: the shared report pool) and go into the cache
+    too. At most `in_flight` renders (default twice WORKERS) are submitted
+    at a time, so students' own report requests on the shared pool only
+    queue behind a few of them. Each PDF is streamed into the archive from
+    its file as soon as it is ready, so no more than one is held in
+    memory. `summary` is filled with counts and the seconds spent
+    collecting, waiting for renders, and writing the archive. The archive
+    ends with summary.txt.
+    """
+    start = time.perf_counter()
+    timings = dict.fromkeys(('collect', 'render', 'zip'), 0.0)
+    students = college_data(college)
+    timings['collect'] = time.perf_counter() - start
+
+    ready, missing = [], []
+    for data in students:
+        current = version(data)
+        path = path_for(data['user_id'], current)
+        if os.path.exists(path):
+            ready.append((data, path))
+        else:
+            missing.append((data, current, path))
+    summary.update(college=college, students=len(students), cached=len(ready), rendered=len(missing), timings=timings)
+
+    in_flight = in_flight or 2 * WORKERS
+    missing.reverse()
+    running = {}
+
+    def submit():
+        while missing and len(running) < in_flight:
+            data, current, path = missing.pop()
+            running[render(data, current, executor)] = (data, path)
+
+    out = _Chunks()
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as archive:
+        def add(data, path):
+            started = time.perf_counter()
+            archive.write(path, f"{data['username']}.pdf")
+            timings['zip'] += time.perf_counter() - started
+
+        submit()
+        for data, path in ready:
+            add(data, path)
+            yield out.take()
+        while running:
+            waiting = time.perf_counter()
+            done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+            timings['render'] += time.perf_counter() - waiting
+            for future in done:
+                future.result()
+                add(*running.pop(future))
+                submit()
+                yield out.take()
+
+        timings['total'] = time.perf_counter() - start
+        archive.writestr('summary.txt', _describe(summary))
+    yield out.take()
+
+
+def _describe(summary):
+    lines = [f"{summary['students']} students of {summary['college']}: "
+             f"{summary['cached']} reports from the cache, {summary['rendered']} rendered"]
+    lines += [f"{stage}: {seconds:.2f}s" for stage, seconds in summary['timings'].items()]
+    return '\n'.join(lines) + '\n'
+
+
+class _Chunks:
+    """A write-only file collecting what is written to it until take() hands it out."""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def _finished(path, future):
+    with _lock:
+        _renders.pop(path, None)
+    if future.exception() is None:
+        for old in glob.glob(os.path.join(os.path.dirname(path), '*.pdf')):
+            if old != path:
+                _remove(old)
+
+
+def _open(path):
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def _latest(user_id, exclude):
+    paths = [p for p in glob.glob(os.path.join(REPORT_DIR, str(user_id), '*.pdf')) if p != exclude]
+    return max(paths, key=_mtime, default=None)
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: forking a threaded web process can copy held locks
+        _pool = ProcessPoolExecutor(max_workers=WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _pool
+
+
+def _reset_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+    _pool = None
@@ -0,0 +1,122 @@
+"""
+Building blocks that keep the judge well-behaved when its execution
+backend is slow or down: concurrency gates, a circuit breaker and
+jittered retry delays.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ExecutionUnavailable(Exception):
+    """The backend cannot take this request now; try again in `retry_after` seconds."""
+
+    def __init__(self, message, retry_after=1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Gate:
+    """Caps how many calls are in flight, optionally inside a shared parent gate.
+
+    `enter()` waits up to `timeout` seconds for a slot and raises
+    ExecutionUnavailable if none frees up, so callers queue briefly instead
+    of piling up without bound.
+    """
+
+    def __init__(self, limit, timeout=10, parent=None):
+        self.limit = limit
+        self.timeout = timeout
+        self.parent = parent
+        self.in_flight = 0
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def enter(self):
+        with self.parent.enter() if self.parent else _nothing():
+            if not self._slots.acquire(timeout=self.timeout):
+                with self._lock:
+                    self.rejected += 1
+                raise ExecutionUnavailable("Execution capacity is exhausted, try again shortly")
+            with self._lock:
+                self.in_flight += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self.in_flight -= 1
+                self._slots.release()
+
+
+@contextmanager
+def _nothing():
+    yield
+
+
+class CircuitBreaker:
+    """Stops calling a backend after `threshold` consecutive failures.
+
+    While open, `allow()` is False until `reset_after` seconds have passed;
+    then one trial call is let through (half-open). Its success closes the
+    breaker, its failure opens it again.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+    def __init__(self, threshold=5, reset_after=30, clock=time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if self._clock() - self.opened_at >= self.reset_after:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def retry_after(self):
+        with self._lock:
+            if self.opened_at is None:
+                return 0
+            return max(0, self.reset_after - (self._clock() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self._clock()
+            self._trial = False
+
+
+def backoff(attempt, base=0.1, cap=2.0):
+    """Full-jitter exponential delay before retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
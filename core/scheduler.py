@@ -0,0 +1,128 @@
+"""
+Judge scheduling.
+
+Work is served in priority classes:
+
+  contest   submissions to a problem of a contest that is live, going by
+            Contest.start_time / end_time at the time of submission
+  practice  all other submissions
+  run_code  ad-hoc runs from the editor
+
+Queued submissions are claimed class by class. Within a class, users take
+turns: the next submission comes from the user the judge has started the
+fewest submissions for in the last FAIR_WINDOW seconds, so one heavy
+submitter cannot starve the others. "Run Code" runs synchronously in the
+web process and is not queued. While submissions are waiting it may only
+use RUN_CODE_SHARE of the execution slots (core.throttle).
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from . import throttle
+from .models import Contest, Submission
+
+
+CONTEST, PRACTICE, RUN_CODE = 0, 1, 2
+CLASS_NAMES = {CONTEST: 'contest', PRACTICE: 'practice', RUN_CODE: 'run_code'}
+
+# Seconds of history used to decide whose turn it is within a class
+FAIR_WINDOW = getattr(settings, 'JUDGE_FAIR_WINDOW', 300)
+# Fraction of the execution slots left to run_code while submissions wait
+RUN_CODE_SHARE = getattr(settings, 'JUDGE_RUN_CODE_SHARE', 0.25)
+
+_lock = threading.Lock()
+_run_code = {'admitted': 0, 'shed': 0, 'wait': 0.0}
+
+
+def priority_for(problem, at=None):
+    """Priority class of a submission to `problem` made at `at` (default now)."""
+    at = at or timezone.now()
+    live = Contest.objects.filter(problems=problem, start_time__lte=at, end_time__gt=at).exists()
+    return CONTEST if live else PRACTICE
+
+
+def claim_order(claimable, now, limit=10):
+    """Pks of the next submissions to judge among `claimable`, best first.
+
+    Only the highest waiting class is considered. Each user contributes
+    their oldest submission, and users served least in the last
+    FAIR_WINDOW seconds come first, then the longest waiting.
+    """
+    top = claimable.aggregate(top=Min('priority'))['top']
+    if top is None:
+        return []
+    heads = list(
+        claimable.filter(priority=top).order_by().values('user').annotate(first=Min('id')).values_list('user', 'first')
+    )
+    served = dict(
+        Submission.objects.filter(user__in=[user for user, _ in heads],
+                                  started_at__gte=now - timedelta(seconds=FAIR_WINDOW))
+        .order_by().values('user').annotate(n=Count('id')).values_list('user', 'n')
+    )
+    heads.sort(key=lambda head: (served.get(head[0], 0), head[1]))
+    return [first for _, first in heads[:limit]]
+
+
+def run_code_slots():
+    """Execution slots run_code may use right now."""
+    slots = throttle.MAX_EXECUTIONS
+    if slots and Submission.objects.filter(status='Queued').exists():
+        return max(1, int(slots * RUN_CODE_SHARE))
+    return slots
+
+
+@contextmanager
+def run_code_slot():
+    """Admit one run_code execution or raise throttle.Throttled, counting both for queue_stats()."""
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        try:
+            stack.enter_context(throttle.execution_slot(limit=run_code_slots()))
+        except throttle.Throttled:
+            with _lock:
+                _run_code['shed'] += 1
+            raise
+        with _lock:
+            _run_code['admitted'] += 1
+            _run_code['wait'] += time.perf_counter() - start
+        yield
+
+
+def queue_stats(window=3600):
+    """Per class: submissions waiting, the oldest wait, and waits of those started in the last `window` seconds.
+
+    Times are in seconds. The run_code row counts this process only.
+    """
+    now = timezone.now()
+    rows = []
+    for priority in (CONTEST, PRACTICE):
+        queued = Submission.objects.filter(status='Queued', priority=priority)
+        oldest = queued.aggregate(oldest=Min('submitted_at'))['oldest']
+        waits = sorted(
+            (started - submitted).total_seconds()
+            for submitted, started in Submission.objects.filter(
+                priority=priority, started_at__gte=now - timedelta(seconds=window)
+            ).values_list('submitted_at', 'started_at')
+        )
+        rows.append({
+            'class': CLASS_NAMES[priority],
+            'waiting': queued.count(),
+            'oldest': (now - oldest).total_seconds() if oldest else 0.0,
+            'started': len(waits),
+            'avg_wait': sum(waits) / len(waits) if waits else 0.0,
+            'p95_wait': waits[int(0.95 * (len(waits) - 1))] if waits else 0.0,
+            'shed': 0,
+        })
+    with _lock:
+        admitted, shed, wait = _run_code['admitted'], _run_code['shed'], _run_code['wait']
+    rows.append({
+        'class': CLASS_NAMES[RUN_CODE], 'waiting': 0, 'oldest': 0.0, 'started': admitted,
+        'avg_wait': wait / admitted if admitted else 0.0, 'p95_wait': None, 'shed': shed,
+    })
+    return rows
@@ -0,0 +1,133 @@
+"""
+Judge performance telemetry.
+
+Every test case a judge worker runs is stored as a TestRun: the time the
+judge waited on the executor (round trip), the backend's wall and CPU time
+and the program's peak memory. latency_report() groups the recent runs
+(and the queue wait of their submissions) by language or problem into
+percentiles and histograms. It reads every run of the window, so the
+admin dashboard shows it from the analytics snapshot (core.analytics)
+rather than computing it per request. prune() drops runs older than
+TELEMETRY_RETENTION_DAYS.
+"""
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Problem, Submission, TestRun
+
+
+# Upper bounds of the histogram buckets in milliseconds; one more bucket
+# holds everything slower
+BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+RETENTION_DAYS = getattr(settings, 'TELEMETRY_RETENTION_DAYS', 7)
+
+# Problems are grouped by id, since titles need not be unique, and shown by title
+GROUPS = {
+    'language': ('submission__language', 'language'),
+    'problem': ('submission__problem_id', 'problem_id'),
+}
+
+
+def record(submission, runs):
+    """Store (test_case, passed, metrics) triples from judge.grade's `observe` for `submission`."""
+    now = timezone.now()
+    TestRun.objects.bulk_create([
+        TestRun(
+            submission=submission,
+            test_case=tc if tc.pk else None,
+            passed=passed,
+            round_trip_ms=metrics["round_trip"],
+            wall_ms=metrics["wall"],
+            cpu_ms=metrics["cpu"],
+            memory_bytes=metrics["memory"],
+            recorded_at=now,
+        )
+        for tc, passed, metrics in runs
+    ])
+
+
+def prune(days=None):
+    """Delete test runs recorded more than `days` (default RETENTION_DAYS) ago. Returns how many."""
+    since = timezone.now() - timedelta(days=RETENTION_DAYS if days is None else days)
+    deleted, _ = TestRun.objects.filter(recorded_at__lt=since).delete()
+    return deleted
+
+
+def histogram(values, buckets=BUCKETS_MS):
+    counts = [0] * (len(buckets) + 1)
+    for value in values:
+        counts[bisect_left(buckets, value)] += 1
+    return counts
+
+
+def summarize(values, buckets=BUCKETS_MS):
+    """Count, p50, p95 and max of `values` (None ignored), plus a histogram when `buckets` is given."""
+    values = sorted(v for v in values if v is not None)
+    summary = {
+        'count': len(values),
+        'p50': _percentile(values, 0.50),
+        'p95': _percentile(values, 0.95),
+        'max': values[-1] if values else None,
+    }
+    if buckets:
+        counts = histogram(values, buckets)
+        top = max(counts) or 1
+        labels = [f"≤{b}" for b in buckets] + [f">{buckets[-1]}"]
+        summary['histogram'] = [
+            {'label': label, 'count': n, 'height': round(100 * n / top)} for label, n in zip(labels, counts)
+        ]
+    return summary
+
+
+def latency_report(group='language', hours=24, limit=None):
+    """Per language or problem over the last `hours`: queue wait, round trip, wall, CPU and memory.
+
+    Times are milliseconds and memory bytes. Rows are sorted by p95 round
+    trip, slowest first, and cut to `limit`.
+    """
+    run_field, submission_field = GROUPS[group]
+    since = timezone.now() - timedelta(hours=hours)
+
+    metrics = {}
+    runs = TestRun.objects.filter(recorded_at__gte=since).values_list(
+        run_field, 'round_trip_ms', 'wall_ms', 'cpu_ms', 'memory_bytes'
+    )
+    for key, round_trip, wall, cpu, memory in runs.iterator(chunk_size=5000):
+        row = metrics.setdefault(key, {'round_trip': [], 'wall': [], 'cpu': [], 'memory': [], 'queue_wait': []})
+        row['round_trip'].append(round_trip)
+        row['wall'].append(wall)
+        row['cpu'].append(cpu)
+        row['memory'].append(memory)
+
+    started = Submission.objects.filter(started_at__gte=since).values_list(submission_field, 'submitted_at', 'started_at')
+    for key, submitted_at, started_at in started.iterator(chunk_size=5000):
+        if key in metrics:
+            metrics[key]['queue_wait'].append((started_at - submitted_at).total_seconds() * 1000)
+
+    names = {key: key for key in metrics}
+    if group == 'problem':
+        names = dict(Problem.objects.filter(pk__in=metrics).values_list('pk', 'title'))
+    rows = [
+        {
+            'name': names.get(key, key),
+            'tests': len(values['round_trip']),
+            'queue_wait': summarize(values['queue_wait']),
+            'round_trip': summarize(values['round_trip']),
+            'wall': summarize(values['wall']),
+            'cpu': summarize(values['cpu']),
+            'memory': summarize(values['memory'], buckets=None),
+        }
+        for key, values in metrics.items()
+    ]
+    rows.sort(key=lambda row: row['round_trip']['p95'] or 0, reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
@@ -0,0 +1,93 @@
+"""
+Content-addressed, gzip-compressed storage for test case data.
+
+A blob is stored once under its SHA-256 (of the uncompressed bytes) at
+TESTDATA_DIR/ab/abcdef....gz, however many test cases use it. Rows in the
+database only keep the digest and the size.
+"""
+import gzip
+import hashlib
+import io
+import os
+import tempfile
+
+from django.conf import settings
+
+
+TESTDATA_DIR = getattr(settings, 'TESTDATA_DIR', os.path.join(settings.BASE_DIR, 'testdata'))
+
+CHUNK_SIZE = 1024 * 1024
+
+# Digest of b"", which is never written to disk
+EMPTY = hashlib.sha256(b'').hexdigest()
+
+
+def digest_of(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def path_for(digest):
+    return os.path.join(TESTDATA_DIR, digest[:2], f"{digest}.gz")
+
+
+def put(data):
+    """Store `data` (bytes or str) and return its (digest, size)."""
+    if isinstance(data, str):
+        data = data.encode()
+    digest = digest_of(data)
+    if digest != EMPTY and not os.path.exists(path_for(digest)):
+        put_file(io.BytesIO(data))
+    return digest, len(data)
+
+
+def put_file(src):
+    """Store the contents of binary file object `src` without reading it all into memory."""
+    os.makedirs(TESTDATA_DIR, exist_ok=True)
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp = tempfile.mkstemp(dir=TESTDATA_DIR, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as out:
+            for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                hasher.update(chunk)
+                size += len(chunk)
+                out.write(chunk)
+        digest = hasher.hexdigest()
+        if digest != EMPTY:
+            _publish(tmp, digest)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return digest, size
+
+
+def _publish(tmp, digest):
+    # Rename into place so readers never see a partly written blob
+    path = path_for(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    os.replace(tmp, path)
+
+
+def open_blob(digest):
+    """Binary file object streaming the uncompressed contents of `digest`."""
+    if digest == EMPTY:
+        return io.BytesIO(b'')
+    return gzip.open(path_for(digest), 'rb')
+
+
+def read(digest):
+    with open_blob(digest) as f:
+        return f.read()
+
+
+def prune(referenced):
+    """Delete blobs whose digest is not in `referenced`; returns how many were removed."""
+    removed = 0
+    if not os.path.isdir(TESTDATA_DIR):
+        return removed
+    for root, _dirs, files in os.walk(TESTDATA_DIR):
+        for name in files:
+            if name.endswith('.gz') and name[:-3] not in referenced:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
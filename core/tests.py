@@ -1,3 +1,1624 @@
-from django.test import TestCase
+import io
+import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import requests
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import executors, judge
+from . import checkers, testdata, teststats, verdicts
+from .executors import LocalExecutor
+from .jobs import enqueue, queue_status, run_pending
+from .judge_queue import (
+    UNAVAILABLE_RETRY_SECONDS, claim_next, judge_submission, process_next, status_payload, test_cases_for,
+)
+from .mock_piston import MockPistonServer
+from .leaderboard import leaderboard_page, neighbourhood
+from .models import User, Problem, Submission, ForumThread, XPEvent, QueuedJob, ExecutionSlot, Contest, TestRun
+from .models import AnalyticsSnapshot, DailyActivity, SubmissionRollup, UserProblemStatus, UserStats
+from .models import TestCase as ProblemTestCase
+from .resilience import CircuitBreaker, ExecutionUnavailable, Gate
+from . import analytics, problemstats, rejudge, reports, scheduler, telemetry, userstats
+from .throttle import Throttled, execution_slot, take
+from .ranking import compute_and_update_ranks, update_ranks_for_xp_change, remove_from_ranks
+from .xp import award_xp, reconcile_balances
+
+
+def setUpModule():
+    # Keep test data written by TestCase.save() and report PDFs out of the real stores
+    global _testdata_dir, _patches
+    _testdata_dir = tempfile.TemporaryDirectory()
+    _patches = [mock.patch.object(testdata, 'TESTDATA_DIR', os.path.join(_testdata_dir.name, 'testdata')),
+                mock.patch.object(reports, 'REPORT_DIR', os.path.join(_testdata_dir.name, 'reports'))]
+    for patch in _patches:
+        patch.start()
+
+
+def tearDownModule():
+    for patch in _patches:
+        patch.stop()
+    _testdata_dir.cleanup()
+
+
+def _live_group_members(pgid):
+    """Pids of processes in group `pgid` that have not exited."""
+    members = []
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/stat') as f:
+                # Fields after the parenthesized name: state, ppid, pgrp
+                state, _, pgrp = f.read().rsplit(')', 1)[1].split()[:3]
+        except OSError:
+            continue
+        if int(pgrp) == pgid and state != 'Z':
+            members.append(int(pid))
+    return members
+
+
+def submit_and_judge(client, problem, passed, user=None):
+    """Submit to `problem` through the view, as `user` if given, and judge it with a stubbed verdict."""
+    if user is not None:
+        client.force_login(user)
+    response = client.post(reverse('submit_solution', args=[problem.id]),
+                           {'code': f'# {random.random()}'}, content_type='application/json')
+    outcome = {"verdict": "passed" if passed else "failed", "results": []}
+    with mock.patch('core.judge.grade', return_value=outcome):
+        judge_submission(claim_next('w'), 'w')
+    return Submission.objects.get(pk=response.json()['submission_id'])
+
+
+class IncrementalRankTests(TestCase):
+    """The incremental rank engine must agree with a full recompute."""
+
+    COLLEGES = ['Alpha', 'Beta', 'Gamma']
+
+    def setUp(self):
+        self.rng = random.Random(1234)
+        for i in range(60):
+            User.objects.create(
+                username=f'student{i}',
+                college=self.rng.choice(self.COLLEGES),
+                xp=self.rng.choice([0, 5, 10, 15, 20, 40]),
+            )
+        User.objects.create(username='admin', role='Admin', xp=999)
+        compute_and_update_ranks()
+
+    def ranks(self):
+        return {u: (g, c) for u, g, c in User.objects.values_list('username', 'global_rank', 'college_rank')}
+
+    def assert_matches_full_recompute(self):
+        incremental = self.ranks()
+        compute_and_update_ranks()
+        self.assertEqual(incremental, self.ranks())
+
+    def test_random_xp_events(self):
+        students = list(User.objects.filter(role='Student'))
+        for _ in range(200):
+            user = self.rng.choice(students)
+            old_xp = user.xp
+            user.xp = max(0, user.xp + self.rng.choice([2, 5, 10, 25, -5]))
+            user.save(update_fields=['xp'])
+            update_ranks_for_xp_change(user, old_xp)
+            self.assert_matches_full_recompute()
+
+    def test_new_student_and_college_change(self):
+        newcomer = User.objects.create(username='newcomer', college='Beta', xp=0)
+        update_ranks_for_xp_change(newcomer, old_xp=None)
+        self.assert_matches_full_recompute()
+
+        mover = User.objects.get(username='student3')
+        old_college = mover.college
+        mover.college = 'Delta' if old_college != 'Delta' else 'Alpha'
+        mover.save(update_fields=['college'])
+        update_ranks_for_xp_change(mover, mover.xp, old_college=old_college)
+        self.assert_matches_full_recompute()
+
+    def test_remove_student(self):
+        leaver = User.objects.filter(role='Student').order_by('-xp').first()
+        remove_from_ranks(leaver)
+        leaver.delete()
+        self.assert_matches_full_recompute()
+
+    def test_only_moved_rows_are_written(self):
+        # Two students already share 40 XP, so moving a 15 XP student who
+        # is not alone on 15 up to 40 touches nobody else's rank.
+        User.objects.filter(role='Student').update(xp=15, college='Alpha')
+        User.objects.filter(username__in=['student0', 'student1']).update(xp=40)
+        compute_and_update_ranks()
+        before = self.ranks()
+
+        user = User.objects.get(username='student2')
+        user.xp = 40
+        user.save(update_fields=['xp'])
+        update_ranks_for_xp_change(user, 15)
+
+        after = self.ranks()
+        self.assertEqual({u for u in before if before[u] != after[u]}, {'student2'})
+        self.assertEqual(after['student2'], (1, 1))
+        self.assert_matches_full_recompute()
+
+
+class RankRebuildTests(TestCase):
+    """The window-function rebuild must produce dense XP ranks."""
+
+    def test_rebuild_matches_dense_ranking(self):
+        xps = [50, 50, 40, 30, 30, 10, 0]
+        for i, xp in enumerate(xps):
+            User.objects.create(username=f's{i}', college='Alpha' if i % 2 else 'Beta', xp=xp)
+        User.objects.create(username='admin', role='Admin', xp=100)
+
+        changed = compute_and_update_ranks(chunk_size=3)
+        self.assertEqual(changed, len(xps))
+
+        for college in ('Alpha', 'Beta'):
+            distinct = sorted({u.xp for u in User.objects.filter(role='Student', college=college)}, reverse=True)
+            for u in User.objects.filter(role='Student', college=college):
+                self.assertEqual(u.college_rank, distinct.index(u.xp) + 1)
+        distinct = sorted(set(xps), reverse=True)
+        for u in User.objects.filter(role='Student'):
+            self.assertEqual(u.global_rank, distinct.index(u.xp) + 1)
+        self.assertEqual(User.objects.get(username='admin').global_rank, 0)
+
+        # A second pass has nothing left to fix
+        self.assertEqual(compute_and_update_ranks(), 0)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(7)
+        for i in range(40):
+            User.objects.create(username=f'u{i:02d}', college='Alpha' if i % 3 else 'Beta',
+                                xp=rng.choice([0, 10, 20, 30]))
+        compute_and_update_ranks()
+        self.expected = list(User.objects.filter(role='Student')
+                             .order_by('-xp', 'username').values_list('username', flat=True))
+
+    def test_keyset_pages_cover_everything_in_order(self):
+        seen, cursor = [], None
+        while True:
+            rows, cursor = leaderboard_page(cursor=cursor, limit=7)
+            seen.extend(r['username'] for r in rows)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected)
+
+    def test_neighbourhood(self):
+        me = User.objects.get(username=self.expected[20])
+        rows = [r['username'] for r in neighbourhood(me, 3)]
+        self.assertEqual(rows, self.expected[17:24])
+
+        top = User.objects.get(username=self.expected[0])
+        self.assertEqual([r['username'] for r in neighbourhood(top, 2)], self.expected[:3])
+
+    def test_api(self):
+        me = User.objects.get(username='u05')
+        self.client.force_login(me)
+
+        data = self.client.get(reverse('leaderboard_api'), {'scope': 'college', 'limit': 100}).json()
+        self.assertEqual(data['college'], me.college)
+        self.assertTrue(all(r['college'] == me.college for r in data['results']))
+        self.assertIsNone(data['next_cursor'])
+
+        response = self.client.get(reverse('leaderboard_api'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+        data = self.client.get(reverse('leaderboard_around_me_api'), {'n': 2}).json()
+        self.assertIn('u05', [r['username'] for r in data['results']])
+
+        self.assertEqual(self.client.get(reverse('leaderboard')).status_code, 200)
+
+
+class XPLedgerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='alice', xp=0)
+        self.problem = Problem.objects.create(title='Sum', difficulty='Easy', points=30)
+
+    def test_reply_records_event_and_balance(self):
+        thread = ForumThread.objects.create(title='t', content='c', author=self.user)
+        self.client.force_login(self.user)
+        self.client.post(reverse('add_reply', args=[thread.id]), {'content': 'hi'})
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.xp, 5)
+        event = XPEvent.objects.get(user=self.user)
+        self.assertEqual((event.delta, event.reason), (5, 'forum_reply'))
+        self.assertEqual(event.source.content, 'hi')
+
+    def test_problem_pays_out_once(self):
+        self.assertTrue(award_xp(self.user, 30, 'problem_solved', source=self.problem))
+        self.assertFalse(award_xp(self.user, 30, 'problem_solved', source=self.problem))
+
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.xp, self.user.problem_solved), (30, 1))
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 1)
+
+    def test_stale_instance_does_not_lose_updates(self):
+        stale = User.objects.get(pk=self.user.pk)
+        award_xp(self.user, 10, 'forum_thread')
+        award_xp(stale, 5, 'forum_reply')
+        self.assertEqual(User.objects.get(pk=self.user.pk).xp, 15)
+
+    def test_reconcile_repairs_drift(self):
+        award_xp(self.user, 2500, 'adjustment')
+        Submission.objects.create(user=self.user, problem=self.problem, code='', passed=True)
+        User.objects.filter(pk=self.user.pk).update(xp=7, level=1, problem_solved=0)
+
+        self.assertEqual(reconcile_balances(), 1)
+        self.user.refresh_from_db()
+        self.assertEqual((self.user.xp, self.user.level, self.user.problem_solved), (2500, 2, 1))
+        self.assertEqual(reconcile_balances(), 0)
+
+
+class BackgroundQueueTests(TestCase):
+
+    def setUp(self):
+        for i in range(30):
+            User.objects.create(username=f'q{i}', college='Alpha' if i % 2 else 'Beta', xp=i % 4 * 10)
+        compute_and_update_ranks()
+
+    def test_awards_are_coalesced_into_one_rank_refresh(self):
+        users = list(User.objects.filter(role='Student')[:5])
+        for user in users:
+            award_xp(user, 25, 'adjustment')
+            award_xp(user, 5, 'adjustment')
+
+        # XP is applied immediately, ranks wait for the worker
+        self.assertEqual({r['key']: r['depth'] for r in queue_status()}['ranks'], 10)
+        self.assertTrue(all(u.ranked_xp == u.xp - 30 for u in User.objects.filter(pk__in=[u.pk for u in users])))
+
+        self.assertEqual(run_pending()['ranks'][0], 10)
+        self.assertFalse(QueuedJob.objects.exists())
+
+        incremental = {u: (g, c) for u, g, c in User.objects.values_list('username', 'global_rank', 'college_rank')}
+        self.assertEqual(compute_and_update_ranks(), 0)
+        self.assertEqual(incremental, {u: (g, c) for u, g, c in
+                                       User.objects.values_list('username', 'global_rank', 'college_rank')})
+
+    def test_large_burst_falls_back_to_full_rebuild(self):
+        for user in User.objects.all():
+            award_xp(user, 7, 'adjustment')
+        with mock.patch('core.ranking.FULL_REBUILD_THRESHOLD', 3), \
+                mock.patch('core.ranking.update_ranks_for_xp_change') as per_user:
+            run_pending()
+        per_user.assert_not_called()
+        self.assertEqual(compute_and_update_ranks(), 0)
+
+
+class ParallelJudgeTests(TestCase):
+    """The mock server echoes stdin, so a case passes when input == expected."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockPistonServer(latency=0.01).start()
+        cls.patcher = mock.patch.object(executors, 'PISTON_API', cls.server.url)
+        cls.patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.patcher.stop()
+        cls.server.stop()
+        super().tearDownClass()
+
+    def cases(self, expected, hidden=True):
+        return [ProblemTestCase(input_data=f"{i}", expected_output=e, is_hidden=hidden)
+                for i, e in enumerate(expected)]
+
+    def test_verdicts_match_sequential_grading(self):
+        scenarios = [
+            ['0', '1', '2', '3'],
+            ['0', '1', 'x', '3', 'y', '5'],
+            ['x', '1', '2'],
+        ]
+        for expected in scenarios:
+            for hidden in (True, False):
+                cases = self.cases(expected, hidden)
+                parallel = judge.grade('', 'python', cases)
+                sequential = judge.grade('', 'python', cases, parallel=False)
+                parallel.pop('timing'), sequential.pop('timing')
+                self.assertEqual(parallel, sequential)
+
+    def test_results_shape(self):
+        outcome = judge.grade('', 'python', self.cases(['0', '1', 'x', '3', 'y'], hidden=False))
+        self.assertIsNone(outcome.pop('timing')['compile'])
+        self.assertEqual(outcome, {"verdict": "failed", "results": [
+            {"status": "Passed"}, {"status": "Passed"},
+            {"status": "Failed", "input": "2", "expected": "x", "actual": "2"},
+        ]})
+
+    def test_api_failure_is_an_error_verdict(self):
+        with mock.patch.object(self.server, 'failure_rate', 1.0):
+            outcome = judge.grade('', 'python', self.cases(['0', '1']))
+        self.assertEqual(outcome["verdict"], "error")
+
+    def test_submit_solution(self):
+        user = User.objects.create(username='solver')
+        problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        for tc in self.cases(['0', '1', '2']):
+            tc.problem = problem
+            tc.save()
+        self.client.force_login(user)
+
+        url = reverse('submit_solution', args=[problem.id])
+        queued = self.client.post(url, {'code': 'print(input())'}, content_type='application/json').json()
+        self.assertEqual(queued['status'], 'queued')
+        self.assertEqual(self.client.get(queued['status_url']).json()['status'], 'queued')
+
+        self.assertTrue(process_next('worker-1'))
+        data = self.client.get(queued['status_url']).json()
+        self.assertEqual(data['status'], 'success')
+        self.assertIn('+10 XP', data['message'])
+        submission = Submission.objects.get(user=user)
+        self.assertEqual((submission.passed, submission.verdict, submission.status), (True, 'Accepted', 'Finished'))
+        self.assertEqual(User.objects.get(pk=user.pk).xp, 10)
+
+        tc = ProblemTestCase.objects.get(problem=problem, input_hash=testdata.digest_of(b'1'))
+        tc.expected_output = 'nope'
+        tc.save()
+        queued = self.client.post(url, {'code': 'print(input())'}, content_type='application/json').json()
+        process_next('worker-1')
+        data = self.client.get(queued['status_url']).json()
+        self.assertEqual(data['status'], 'failed')
+        self.assertEqual(data['results'][-1]['expected'], 'Hidden')
+
+
+class JudgeQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='queued')
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10,
+                                              sample_input='1', sample_output='1')
+        verdicts._cache.clear()
+
+    def submit(self):
+        return Submission.objects.create(user=self.user, problem=self.problem, code='', status='Queued')
+
+    def test_each_submission_is_leased_once(self):
+        first, second = self.submit(), self.submit()
+        self.assertEqual(claim_next('a').pk, first.pk)
+        self.assertEqual(claim_next('b').pk, second.pk)
+        self.assertIsNone(claim_next('c'))
+
+    def test_expired_lease_is_taken_over_and_stale_result_discarded(self):
+        self.submit()
+        stale = claim_next('a')
+        Submission.objects.filter(pk=stale.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        fresh = claim_next('b')
+        self.assertEqual((fresh.pk, fresh.attempts), (stale.pk, 2))
+
+        passed = {"verdict": "passed", "results": [{"status": "Passed"}]}
+        with mock.patch('core.judge.grade', return_value=passed):
+            self.assertFalse(judge_submission(stale, 'a'))
+            self.assertTrue(judge_submission(fresh, 'b'))
+        self.assertEqual(Submission.objects.get(pk=fresh.pk).verdict, 'Accepted')
+        self.assertEqual(XPEvent.objects.filter(user=self.user).count(), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        submission = self.submit()
+        Submission.objects.filter(pk=submission.pk).update(attempts=3)
+        claimed = claim_next('a')
+        with mock.patch('core.judge.grade') as grade:
+            judge_submission(claimed, 'a')
+        grade.assert_not_called()
+        self.assertEqual(Submission.objects.get(pk=submission.pk).verdict, 'Error')
+
+    def test_unexpected_error_is_retried_not_fatal(self):
+        submission = self.submit()
+        with mock.patch('core.judge_queue.judge_submission', side_effect=RuntimeError('database is locked')), \
+                self.assertLogs('core.judge_queue', 'ERROR'):
+            self.assertTrue(process_next('a'))
+        leased = Submission.objects.get(pk=submission.pk)
+        self.assertEqual(leased.status, 'Running')
+        self.assertLessEqual(leased.lease_expires_at, timezone.now() + timedelta(seconds=UNAVAILABLE_RETRY_SECONDS))
+
+
+class LocalExecutorTests(TestCase):
+
+    def setUp(self):
+        artifacts = tempfile.TemporaryDirectory()
+        self.addCleanup(artifacts.cleanup)
+        self.executor = LocalExecutor(workers=2, cpu_seconds=1, wall_seconds=2, memory_mb=64, output_bytes=4096,
+                                      artifact_dir=artifacts.name, cache_size=3)
+
+    def test_runs_python_in_piston_shape(self):
+        result = self.executor.execute('python', 'print(input()[::-1])', 'abc')
+        self.assertEqual(result['run']['stdout'], 'cba\n')
+        self.assertEqual((result['run']['code'], result['run']['signal']), (0, None))
+
+    def test_reports_cpu_time_and_peak_memory(self):
+        run = self.executor.execute('python', 'x = bytearray(32 * 1024 * 1024)\nsum(range(3 * 10**6))', '')['run']
+        self.assertEqual(run['code'], 0)
+        self.assertGreater(run['cpu_time'], 10)
+        self.assertGreaterEqual(run['wall_time'], run['cpu_time'] * 0.5)
+        self.assertGreater(run['memory'], 32 * 1024 * 1024)
+
+    def test_limits(self):
+        scenarios = [
+            ('while True: pass', 'CPU time limit exceeded'),
+            ('import time; time.sleep(30)', 'Time limit exceeded'),
+            ('print("x" * 10000)', 'Output limit exceeded'),
+            ('x = bytearray(256 * 1024 * 1024)', 'MemoryError'),
+        ]
+        # With prlimit, and with the Python fallback where it is missing
+        for prlimit in {executors._PRLIMIT, None}:
+            with mock.patch.object(executors, '_PRLIMIT', prlimit):
+                for code, message in scenarios:
+                    with self.subTest(prlimit=prlimit, message=message):
+                        run = self.executor.execute('python', code, '')['run']
+                        self.assertNotEqual(run['code'], 0)
+                        self.assertIn(message, run['stderr'])
+                        self.assertLessEqual(len(run['stdout']), 4096)
+
+    def test_forked_processes_are_refused_or_killed(self):
+        # Bounded, in case neither holds: root is exempt from RLIMIT_NPROC
+        code = (
+            "import os, time\n"
+            "print(os.getpid(), flush=True)\n"
+            "for n in range(100):\n"
+            "    try:\n"
+            "        if os.fork() == 0:\n"
+            "            time.sleep(30)\n"
+            "            os._exit(0)\n"
+            "    except OSError:\n"
+            "        print('refused', flush=True)\n"
+            "        break\n"
+        )
+        executor = LocalExecutor(workers=1, wall_seconds=5, max_processes=8, artifact_dir=self.executor.artifact_dir)
+        for prlimit in {executors._PRLIMIT, None}:
+            with self.subTest(prlimit=prlimit), mock.patch.object(executors, '_PRLIMIT', prlimit):
+                stdout = executor.execute('python', code, '')['run']['stdout'].split()
+                if os.geteuid() != 0:
+                    self.assertIn('refused', stdout)
+                # SIGKILL takes a moment to land
+                deadline = time.monotonic() + 2
+                while _live_group_members(int(stdout[0])) and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                self.assertEqual(_live_group_members(int(stdout[0])), [])
+
+    @skipUnless(shutil.which('g++'), 'g++ is not installed')
+    def test_compiled_language(self):
+        ok = self.executor.execute('cpp', '#include <iostream>\nint main(){int a; std::cin >> a; std::cout << a * 2;}', '21')
+        self.assertEqual((ok['compile']['code'], ok['run']['stdout']), (0, '42'))
+        broken = self.executor.execute('cpp', 'int main({', '')
+        self.assertNotEqual(broken['run']['code'], 0)
+        self.assertIn('error', broken['run']['stderr'])
+
+    @skipUnless(shutil.which('g++'), 'g++ is not installed')
+    def test_compiles_once_and_caches_the_artifact(self):
+        code = '#include <iostream>\nint main(){int a; std::cin >> a; std::cout << a;}'
+        cases = [ProblemTestCase(input_data=str(i), expected_output=str(i)) for i in range(4)]
+        with mock.patch.dict(executors._executors, {'local': self.executor}), \
+                mock.patch.object(executors, 'BACKEND', 'local'), \
+                mock.patch.object(self.executor, '_spawn', wraps=self.executor._spawn) as spawn:
+            first = judge.grade(code, 'cpp', cases)
+            self.assertEqual(spawn.call_count, 1 + len(cases))
+            again = judge.grade(code, 'cpp', cases)
+            self.assertEqual(spawn.call_count, 1 + 2 * len(cases))
+            broken = judge.grade('int main({', 'cpp', cases)
+        self.assertEqual((first['verdict'], again['verdict']), ('passed', 'passed'))
+        self.assertGreater(first['timing']['compile'], 0)
+        self.assertEqual(again['timing']['compile'], 0)
+        self.assertEqual(broken['message'], 'Compilation Error')
+
+        for i in range(4):
+            self.executor.prepare('python', f'print({i})')
+        self.assertEqual(len(os.listdir(self.executor.artifact_dir)), 3)
+
+    def test_unsupported_language_is_an_api_error(self):
+        self.assertNotIn('run', self.executor.execute('cobol', '', ''))
+
+    def test_backend_is_chosen_from_settings(self):
+        user = User.objects.create(username='offline')
+        self.client.force_login(user)
+        with mock.patch.object(executors, 'BACKEND', 'local'):
+            data = self.client.post(reverse('run_code'), {'code': 'print(int(input()) + 1)', 'stdin': '41'},
+                                    content_type='application/json').json()
+            outcome = judge.grade('print(input())', 'python', [ProblemTestCase(input_data='7', expected_output='7')])
+        self.assertEqual((data['version'], data['run']['stdout']), ('local', '42\n'))
+        self.assertEqual(outcome['verdict'], 'passed')
+
+
+class VerdictCacheTests(TestCase):
+
+    def setUp(self):
+        verdicts._cache.clear()
+        self.user = User.objects.create(username='repeat')
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        ProblemTestCase.objects.create(problem=self.problem, input_data='1', expected_output='1')
+
+    def submit(self, code):
+        submission = Submission.objects.create(user=self.user, problem=self.problem, code=code, status='Queued')
+        judge_submission(claim_next('w'), 'w')
+        return Submission.objects.get(pk=submission.pk)
+
+    def test_identical_code_is_graded_once(self):
+        passed = {"verdict": "passed", "results": [{"status": "Passed"}]}
+        with mock.patch('core.judge.grade', return_value=passed) as grade:
+            first = self.submit('print(input())\n')
+            second = self.submit('print(input())\r\n\n')
+        self.assertEqual(grade.call_count, 1)
+        self.assertTrue(first.passed and second.passed)
+        self.assertTrue(second.result['cached'])
+        self.assertNotIn('XP', second.result['message'])
+        self.assertEqual(User.objects.get(pk=self.user.pk).xp, 10)
+
+    def test_editing_test_cases_invalidates(self):
+        failed = {"verdict": "failed", "results": [{"status": "Failed"}]}
+        with mock.patch('core.judge.grade', return_value=failed) as grade:
+            self.submit('x')
+            tc = ProblemTestCase.objects.get(problem=self.problem)
+            tc.expected_output = '2'
+            tc.save()
+            self.submit('x')
+            ProblemTestCase.objects.create(problem=self.problem, input_data='3', expected_output='3')
+            self.submit('x')
+            self.submit('x')
+        self.assertEqual(grade.call_count, 3)
+
+    def test_errors_are_not_cached(self):
+        error = {"verdict": "error", "message": "Execution API Failed", "details": ""}
+        with mock.patch('core.judge.grade', return_value=error) as grade:
+            self.submit('x')
+            self.submit('x')
+        self.assertEqual(grade.call_count, 2)
+
+    def test_lru_eviction(self):
+        cache = verdicts.LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+
+
+class TestDataStoreTests(TestCase):
+
+    def setUp(self):
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        patcher = mock.patch.object(testdata, 'TESTDATA_DIR', store.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.problem = Problem.objects.create(title='Big', difficulty='Hard', points=50)
+
+    def test_rows_keep_only_a_reference(self):
+        big = '\n'.join(str(i) for i in range(200000))
+        first = ProblemTestCase.objects.create(problem=self.problem, input_data=big, expected_output=big)
+        second = ProblemTestCase.objects.create(problem=self.problem, input_data=big, expected_output='')
+
+        path = testdata.path_for(first.input_hash)
+        self.assertEqual(first.input_hash, second.input_hash)
+        self.assertEqual(first.input_size, len(big))
+        self.assertLess(os.path.getsize(path), len(big) / 3)
+        self.assertEqual(len([n for _, _, files in os.walk(testdata.TESTDATA_DIR) for n in files]), 1)
+
+        loaded = ProblemTestCase.objects.get(pk=first.pk)
+        self.assertEqual(loaded.expected_output, big)
+        with loaded.open_input() as f:
+            self.assertEqual(f.read(7), b'0\n1\n2\n3')
+
+        self.assertEqual(testdata.prune({first.input_hash}), 0)
+        ProblemTestCase.objects.all().delete()
+        self.assertEqual(testdata.prune(set()), 1)
+
+    def test_admin_edits_data_through_the_store(self):
+        case = ProblemTestCase.objects.create(problem=self.problem, input_data='1 2', expected_output='4')
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw'))
+        url = reverse('admin:core_testcase_change', args=[case.pk])
+        self.assertContains(self.client.get(url), '1 2')
+
+        response = self.client.post(url, {'problem': self.problem.pk, 'input_data': '1 2',
+                                          'expected_output': '3\n', 'is_hidden': 'on'})
+        self.assertEqual(response.status_code, 302)
+        case.refresh_from_db()
+        self.assertEqual((case.expected_output, case.output_hash), ('3\n', testdata.digest_of(b'3\n')))
+        self.assertEqual(case.input_data, '1 2')
+
+        # New cases can be added from the problem's page
+        url = reverse('admin:core_problem_change', args=[self.problem.pk])
+        data = {'title': 'Big', 'statement': 'Add', 'input_fmt': 'a b', 'output_fmt': 'a+b', 'constraints': '-',
+                'difficulty': 'Hard', 'points': 50, 'checker': 'exact', 'checker_epsilon': 1e-6,
+                'test_cases-TOTAL_FORMS': 2, 'test_cases-INITIAL_FORMS': 1,
+                'test_cases-0-id': case.pk, 'test_cases-0-problem': self.problem.pk,
+                'test_cases-0-input_data': '1 2', 'test_cases-0-expected_output': '3\n',
+                'test_cases-1-problem': self.problem.pk,
+                'test_cases-1-input_data': '5 5', 'test_cases-1-expected_output': '10'}
+        response = self.client.post(url, data)
+        self.assertEqual(response.status_code, 302, response.context and response.context['errors'])
+        added = ProblemTestCase.objects.exclude(pk=case.pk).get()
+        self.assertEqual((added.input_data, added.expected_output), ('5 5', '10'))
+
+    def test_admin_does_not_write_back_problem_counters(self):
+        self.client.force_login(User.objects.create_superuser('root', 'root@example.com', 'pw'))
+        url = reverse('admin:core_problem_change', args=[self.problem.pk])
+        form = self.client.get(url).context['adminform'].form
+        self.assertFalse({'attempts', 'accepted', 'attempted_users', 'solved_users'} & set(form.fields))
+
+        # Submissions counted while the form was open
+        problemstats.record_submission(self.problem.pk, True)
+        data = {'title': 'Big', 'statement': 'Add', 'input_fmt': 'a b', 'output_fmt': 'a+b', 'constraints': '-',
+                'difficulty': 'Hard', 'points': 60, 'checker': 'exact', 'checker_epsilon': 1e-6,
+                'test_cases-TOTAL_FORMS': 0, 'test_cases-INITIAL_FORMS': 0}
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        self.problem.refresh_from_db()
+        self.assertEqual((self.problem.points, self.problem.attempts, self.problem.attempted_users), (60, 1, 1))
+
+
+class CheckerTests(TestCase):
+
+    def check(self, checker, actual, expected, **kwargs):
+        # Tiny chunks so every case also crosses chunk boundaries
+        return checker(io.BytesIO(actual.encode()), io.BytesIO(expected.encode()), chunk_size=3, **kwargs)
+
+    def test_exact(self):
+        for actual, ok in [('1 2\n3', True), ('\n1 2\n3  \n', True), ('1 2\n3 4', False),
+                           ('1 2', False), ('1  2\n3', False), ('', False)]:
+            self.assertEqual(self.check(checkers.exact, actual, '  1 2\n3 \n\n'), ok, actual)
+
+    def test_tokens(self):
+        self.assertTrue(self.check(checkers.tokens, '1   2\n\n 3', '1 2 3\n'))
+        self.assertFalse(self.check(checkers.tokens, '1 23', '1 2 3'))
+        self.assertFalse(self.check(checkers.tokens, '1 2', '1 2 3'))
+
+    def test_floats(self):
+        self.assertTrue(self.check(checkers.floats, '0.3333334 yes 1e9', '0.333333 yes 1000000001', epsilon=1e-6))
+        self.assertFalse(self.check(checkers.floats, '0.334', '0.333', epsilon=1e-6))
+        self.assertFalse(self.check(checkers.floats, 'Yes 1', 'yes 1', epsilon=1e-6))
+
+    def test_problem_checker_is_used_for_grading(self):
+        problem = Problem.objects.create(title='Sum', difficulty='Easy', points=10, checker='custom', checker_code=(
+            "import sys\n"
+            "inp, exp, act = (open(p).read().split() for p in sys.argv[1:])\n"
+            "sys.exit(0 if int(act[0]) == sum(map(int, inp)) else 1)\n"
+        ))
+        case = ProblemTestCase(problem=problem, input_data='2 3', expected_output='')
+        with mock.patch.object(executors, 'BACKEND', 'local'):
+            passed = verdicts.grade(problem, 'print(sum(map(int, input().split())))', 'python', [case])
+            failed = verdicts.grade(problem, 'print(6)', 'python', [case])
+            problem.checker_code = 'raise SystemExit(3)'
+            broken = verdicts.grade(problem, 'print(6)', 'python', [case])
+        self.assertEqual([passed['verdict'], failed['verdict'], broken['verdict']], ['passed', 'failed', 'error'])
+        self.assertEqual(broken['message'], 'Checker Error')
+
+    def test_dashboard_rejects_bad_checker_settings(self):
+        self.client.force_login(User.objects.create(username='setter', role='Admin'))
+        form = {'title': 'Sum', 'difficulty': 'Easy', 'statement': 'Add', 'input_fmt': 'a b',
+                'output_fmt': 'a+b', 'constraints': '-', 'sample_input': '1 2', 'sample_output': '3'}
+        for bad, error in (({'checker': 'float', 'checker_epsilon': 'tiny'}, 'Epsilon'),
+                           ({'checker': 'float', 'checker_epsilon': '-1'}, 'Epsilon'),
+                           ({'checker': 'fuzzy'}, 'Unknown checker'),
+                           ({'checker': 'custom'}, 'Django admin')):
+            response = self.client.post(reverse('add_problem'), {**form, **bad}, follow=True)
+            self.assertRedirects(response, reverse('admin_dashboard'))
+            self.assertIn(error, ' '.join(str(m) for m in response.context['messages']))
+        self.assertFalse(Problem.objects.exists())
+
+        self.client.post(reverse('add_problem'), {**form, 'checker': 'float', 'checker_epsilon': '0.01'})
+        self.assertEqual(Problem.objects.values_list('checker', 'checker_epsilon').get(), ('float', 0.01))
+
+
+class ResilientClientTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockPistonServer(latency=0.01).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.fail_next = 0
+        self.server.latency = 0.01
+        for patcher in (mock.patch.object(executors, 'PISTON_API', self.server.url),
+                        mock.patch.object(executors, 'backoff', return_value=0)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.executor = executors.PistonExecutor()
+
+    def run_once(self):
+        return self.executor.execute('python', '', 'hi')
+
+    def test_transient_errors_are_retried(self):
+        self.server.failure_status = 503
+        self.addCleanup(setattr, self.server, 'failure_status', 500)
+        self.server.fail_next = 2
+        self.assertEqual(self.run_once()['run']['stdout'], 'hi')
+        stats = self.executor.stats()
+        self.assertEqual((stats['requests'], stats['retries'], stats['breaker']), (3, 2, 'closed'))
+
+    def test_breaker_opens_fails_fast_and_recovers(self):
+        now = [0.0]
+        self.executor.breaker = CircuitBreaker(threshold=2, reset_after=30, clock=lambda: now[0])
+        with mock.patch.object(executors, 'PISTON_API', 'http://127.0.0.1:9/execute'):
+            with self.assertRaises(ExecutionUnavailable):
+                self.run_once()
+            self.assertEqual(self.executor.stats()['breaker'], 'open')
+            with self.assertRaises(ExecutionUnavailable) as raised:
+                self.run_once()
+        self.assertEqual(raised.exception.retry_after, 30)
+        self.assertEqual(self.executor.stats()['requests'], 2)
+
+        now[0] = 31
+        self.assertEqual(self.executor.stats()['breaker'], 'half-open')
+        self.assertEqual(self.run_once()['run']['stdout'], 'hi')
+        self.assertEqual(self.executor.stats()['breaker'], 'closed')
+
+    def test_failed_trial_call_reopens_breaker(self):
+        now = [0.0]
+        self.executor.breaker = CircuitBreaker(threshold=1, reset_after=30, clock=lambda: now[0])
+        with mock.patch.object(executors, 'PISTON_API', 'http://127.0.0.1:9/execute'):
+            with self.assertRaises(ExecutionUnavailable):
+                self.run_once()
+
+        now[0] = 31
+        with mock.patch.object(self.executor.get_session(), 'post', side_effect=requests.exceptions.ChunkedEncodingError):
+            with self.assertRaises(requests.exceptions.ChunkedEncodingError):
+                self.run_once()
+        self.assertEqual((self.executor.stats()['breaker'], self.executor.breaker.retry_after()), ('open', 30))
+
+        now[0] = 62
+        self.assertEqual(self.run_once()['run']['stdout'], 'hi')
+        self.assertEqual(self.executor.stats()['breaker'], 'closed')
+
+    def test_server_error_page_is_not_json(self):
+        page = requests.Response()
+        page.status_code, page._content = 500, b'<html>Internal Server Error</html>'
+        with mock.patch.object(self.executor.get_session(), 'post', return_value=page):
+            self.assertEqual(self.run_once(), {"message": "HTTP 500"})
+        self.assertEqual(self.executor.stats()['failures'], 1)
+
+    def test_full_gate_does_not_spend_the_trial_call(self):
+        now = [31.0]
+        self.executor.breaker = CircuitBreaker(threshold=1, reset_after=30, clock=lambda: now[0])
+        self.executor.breaker.opened_at = 0.0
+        self.executor.gate = Gate(1, timeout=0.01)
+        with self.executor.gate.enter():
+            with self.assertRaises(ExecutionUnavailable):
+                self.run_once()
+        self.assertEqual(self.run_once()['run']['stdout'], 'hi')
+        self.assertEqual(self.executor.stats()['breaker'], 'closed')
+
+    def test_in_flight_limit(self):
+        self.server.latency = 0.2
+        self.executor.gate = Gate(2, timeout=0.05)
+        before = dict(self.server.stats, max_in_flight=0)
+        self.server.stats['max_in_flight'] = 0
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(self.run_once()['run']['stdout'])
+            except ExecutionUnavailable:
+                outcomes.append('busy')
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(sorted(outcomes), ['busy', 'busy', 'hi', 'hi'])
+        self.assertEqual(self.executor.stats()['rejected'], 2)
+        self.assertLessEqual(self.server.stats['max_in_flight'], 2)
+        self.assertEqual(self.server.stats['requests'] - before['requests'], 2)
+
+    def test_run_code_answers_503_when_unavailable(self):
+        self.client.force_login(User.objects.create(username='runner'))
+        with mock.patch('core.judge.execute', side_effect=ExecutionUnavailable('down', retry_after=4.2)):
+            response = self.client.post(reverse('run_code'), {'code': ''}, content_type='application/json')
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '5'))
+
+    def test_queued_submission_waits_for_the_backend(self):
+        user = User.objects.create(username='patient')
+        problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10, sample_input='1', sample_output='1')
+        submission = Submission.objects.create(user=user, problem=problem, code='', status='Queued')
+        unavailable = {"verdict": "error", "message": judge.UNAVAILABLE, "details": "down"}
+        with mock.patch('core.judge.grade', return_value=unavailable):
+            self.assertFalse(judge_submission(claim_next('w'), 'w'))
+        submission.refresh_from_db()
+        self.assertEqual(submission.status, 'Running')
+        self.assertLessEqual(submission.lease_expires_at, timezone.now() + timedelta(seconds=31))
+
+
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create(username='eager')
+        self.client.force_login(self.user)
+
+    def run_code(self):
+        with mock.patch('core.judge.execute', return_value={"run": {"stdout": "ok"}}):
+            return self.client.post(reverse('run_code'), {'code': ''}, content_type='application/json')
+
+    def test_bucket_allows_a_burst_then_refills(self):
+        # 6 per minute: a token every 10 seconds, up to 3 at once
+        self.assertEqual([take('k', 6, 60, 3, now=100) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(take('k', 6, 60, 3, now=100), 10)
+        self.assertAlmostEqual(take('k', 6, 60, 3, now=104), 6)
+        self.assertEqual(take('k', 6, 60, 3, now=110), 0)
+        # A long pause refills the bucket only up to the burst
+        self.assertEqual([take('k', 6, 60, 3, now=1000) for _ in range(3)], [0, 0, 0])
+        self.assertGreater(take('k', 6, 60, 3, now=1000), 0)
+
+    def test_run_code_answers_429_past_the_limit(self):
+        with mock.patch.dict('core.throttle.RATES', {'run_code': (2, 60, 2)}):
+            statuses = [self.run_code().status_code for _ in range(2)]
+            refused = self.run_code()
+            self.assertEqual(statuses, [200, 200])
+            self.assertEqual(refused.status_code, 429)
+            self.assertEqual(refused['Retry-After'], '30')
+
+            # Limits are per user
+            self.client.force_login(User.objects.create(username='patient'))
+            self.assertEqual(self.run_code().status_code, 200)
+
+    def test_submit_is_limited_separately(self):
+        problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10, sample_input='1', sample_output='1')
+        url = reverse('submit_solution', args=[problem.id])
+        with mock.patch.dict('core.throttle.RATES', {'run_code': (1, 60, 1), 'submit': (1, 60, 1)}):
+            self.assertEqual(self.run_code().status_code, 200)
+            first = self.client.post(url, {'code': ''}, content_type='application/json')
+            second = self.client.post(url, {'code': ''}, content_type='application/json')
+        self.assertEqual((first.status_code, second.status_code), (202, 429))
+        self.assertEqual(Submission.objects.count(), 1)
+
+    def test_global_execution_cap(self):
+        with mock.patch('core.throttle.MAX_EXECUTIONS', 2):
+            with execution_slot(), execution_slot():
+                with self.assertRaises(Throttled):
+                    with execution_slot():
+                        pass
+                self.assertEqual(self.run_code().status_code, 429)
+            self.assertEqual(self.run_code().status_code, 200)
+
+            # A slot abandoned by a crashed process is reclaimed once its lease runs out
+            ExecutionSlot.objects.update(holder='gone', expires_at=timezone.now() - timedelta(seconds=1))
+            with execution_slot(), execution_slot():
+                pass
+
+
+class SchedulerTests(TestCase):
+
+    def setUp(self):
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10, sample_input='1', sample_output='1')
+        self.heavy = User.objects.create(username='heavy')
+        self.light = User.objects.create(username='light')
+
+    def queue(self, user, priority=scheduler.PRACTICE):
+        return Submission.objects.create(user=user, problem=self.problem, code='', status='Queued', priority=priority)
+
+    def claim_all(self):
+        claimed = []
+        while (submission := claim_next('w')) is not None:
+            claimed.append(submission.pk)
+            # Finish it so it stops being claimable
+            Submission.objects.filter(pk=submission.pk).update(status='Finished')
+        return claimed
+
+    def test_live_contest_problems_get_contest_priority(self):
+        now = timezone.now()
+        contest = Contest.objects.create(title='Cup', start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1))
+        self.assertEqual(scheduler.priority_for(self.problem), scheduler.PRACTICE)
+        contest.problems.add(self.problem)
+        self.assertEqual(scheduler.priority_for(self.problem), scheduler.CONTEST)
+        self.assertEqual(scheduler.priority_for(self.problem, at=now + timedelta(hours=2)), scheduler.PRACTICE)
+
+        self.client.force_login(self.light)
+        self.client.post(reverse('submit_solution', args=[self.problem.id]), {'code': ''}, content_type='application/json')
+        self.assertEqual(Submission.objects.get().priority, scheduler.CONTEST)
+
+    def test_dashboard_contest_gets_its_problems(self):
+        self.client.force_login(User.objects.create(username='organizer', role='Admin'))
+        self.assertContains(self.client.get(reverse('admin_dashboard')), f'value="{self.problem.id}"')
+        now = timezone.now()
+        self.client.post(reverse('add_contest'), {
+            'title': 'Cup', 'start_time': (now - timedelta(hours=1)).isoformat(),
+            'end_time': (now + timedelta(hours=1)).isoformat(), 'problems': [self.problem.id, 9999],
+        })
+        self.assertEqual(list(Contest.objects.get().problems.all()), [self.problem])
+        self.assertEqual(scheduler.priority_for(self.problem), scheduler.CONTEST)
+
+    def test_contest_submissions_jump_the_queue(self):
+        practice = self.queue(self.light)
+        contest = self.queue(self.heavy, scheduler.CONTEST)
+        self.assertEqual(self.claim_all(), [contest.pk, practice.pk])
+        self.assertEqual(status_payload(self.queue(self.light))['queue_position'], 0)
+
+    def test_users_take_turns_within_a_class(self):
+        heavy = [self.queue(self.heavy) for _ in range(3)]
+        light = [self.queue(self.light) for _ in range(2)]
+        self.assertEqual(self.claim_all(), [heavy[0].pk, light[0].pk, heavy[1].pk, light[1].pk, heavy[2].pk])
+
+    def test_run_code_yields_while_submissions_wait(self):
+        with mock.patch('core.throttle.MAX_EXECUTIONS', 8), mock.patch.object(scheduler, 'RUN_CODE_SHARE', 0.25):
+            self.assertEqual(scheduler.run_code_slots(), 8)
+            self.queue(self.heavy)
+            self.assertEqual(scheduler.run_code_slots(), 2)
+            with scheduler.run_code_slot(), scheduler.run_code_slot():
+                with self.assertRaises(Throttled):
+                    with scheduler.run_code_slot():
+                        pass
+
+    def test_queue_stats_per_class(self):
+        now = timezone.now()
+        waited = self.queue(self.light, scheduler.CONTEST)
+        Submission.objects.filter(pk=waited.pk).update(status='Finished', submitted_at=now - timedelta(seconds=4), started_at=now)
+        self.queue(self.heavy)
+        rows = {row['class']: row for row in scheduler.queue_stats()}
+        self.assertEqual(set(rows), {'contest', 'practice', 'run_code'})
+        self.assertEqual((rows['contest']['waiting'], rows['contest']['started']), (0, 1))
+        self.assertAlmostEqual(rows['contest']['avg_wait'], 4, places=1)
+        self.assertEqual(rows['practice']['waiting'], 1)
+
+
+class TestOrderTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockPistonServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(executors, 'PISTON_API', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        verdicts._cache.clear()
+        self.user = User.objects.create(username='tester')
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        # The mock server echoes stdin, so a case passes when input == output
+        self.sample = self.case('1', '1', is_hidden=False)
+        self.easy = self.case('2', '2')
+        self.tricky = self.case('3', 'edge case')
+
+    def case(self, given, wanted, is_hidden=True):
+        return ProblemTestCase.objects.create(problem=self.problem, input_data=given,
+                                              expected_output=wanted, is_hidden=is_hidden)
+
+    def judge(self, code='print(input())'):
+        Submission.objects.create(user=self.user, problem=self.problem, code=code, status='Queued')
+        judge_submission(claim_next('w'), 'w')
+
+    def test_samples_first_then_likely_failures(self):
+        self.easy.runs, self.easy.failures = 10, 0
+        self.tricky.runs, self.tricky.failures = 10, 9
+        ordered = teststats.order([self.easy, self.tricky, self.sample])
+        self.assertEqual(ordered, [self.sample, self.tricky, self.easy])
+        # Without history the smallest hidden input goes first
+        big = ProblemTestCase(input_data='x' * 100, is_hidden=True)
+        self.assertEqual(teststats.order([big, ProblemTestCase(input_data='')])[0].input_size, 0)
+
+    def test_judging_records_history_and_reorders(self):
+        self.judge()
+        counts = dict(ProblemTestCase.objects.values_list('pk', 'failures'))
+        self.assertEqual(counts[self.tricky.pk], 1)
+        self.assertEqual(ProblemTestCase.objects.get(pk=self.sample.pk).runs, 1)
+
+        # A verdict from the cache ran nothing and adds no history
+        self.judge()
+        self.assertEqual(ProblemTestCase.objects.get(pk=self.tricky.pk).runs, 1)
+
+        for tc in [self.case(str(n), str(n)) for n in range(4, 8)]:
+            ProblemTestCase.objects.filter(pk=tc.pk).update(runs=5)
+        ProblemTestCase.objects.filter(pk=self.easy.pk).update(runs=5)
+        order = [tc.pk for tc in test_cases_for(self.problem)]
+        self.assertEqual(order[:2], [self.sample.pk, self.tricky.pk])
+
+    def test_retried_and_discarded_runs_add_no_history(self):
+        def unavailable(problem, code, language, test_cases, observe):
+            observe(test_cases[0], False, None)
+            return {"verdict": "error", "message": judge.UNAVAILABLE}
+
+        Submission.objects.create(user=self.user, problem=self.problem, code='print(input())', status='Queued')
+        with mock.patch('core.verdicts.grade', side_effect=unavailable):
+            self.assertFalse(judge_submission(claim_next('a'), 'a'))
+        stale = Submission.objects.get()
+        Submission.objects.filter(pk=stale.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        claim_next('b')
+        self.assertFalse(judge_submission(stale, 'a'))
+        self.assertEqual(sum(ProblemTestCase.objects.values_list('runs', flat=True)), 0)
+
+    def test_replay_reports_saved_calls(self):
+        for n in range(4, 10):
+            self.case(str(n), str(n))
+        for code in ('a', 'b', 'c'):
+            Submission.objects.create(user=self.user, problem=self.problem, code=code, status='Finished')
+        out = io.StringIO()
+        call_command('replay_test_order', stdout=out)
+        # In id order the tricky case is always third; history order learns
+        # from the first replay to run it right after the sample
+        self.assertIn("3 submissions replayed", out.getvalue())
+        self.assertIn("executor calls: 27 without fail-fast, 9 in id order, 7 in failure-history order", out.getvalue())
+
+
+class RejudgeTests(TestCase):
+
+    def setUp(self):
+        verdicts._cache.clear()
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        self.case = ProblemTestCase.objects.create(problem=self.problem, input_data='1', expected_output='1')
+        self.users = [User.objects.create(username=f'u{i}') for i in range(3)]
+        self.outputs = {}
+
+    def submit(self, user, output):
+        # Fake programs print whatever the test maps their code to
+        code = f"print({output!r})"
+        self.outputs[code] = output
+        Submission.objects.create(user=user, problem=self.problem, code=code, status='Queued')
+        with mock.patch('core.judge.get_executor', return_value=self.executor()):
+            judge_submission(claim_next('w'), 'w')
+
+    def executor(self):
+        outputs = self.outputs
+
+        class Echo:
+            def prepare(self, language, code):
+                return executors.Program(language, code)
+
+            def run(self, program, stdin, stdout=None, output_limit=None):
+                stdout.write(outputs[program.code].encode())
+                return {"run": {"stdout": outputs[program.code], "stderr": "", "code": 0}}
+        return Echo()
+
+    def rejudge(self, **kwargs):
+        with mock.patch('core.judge.get_executor', return_value=self.executor()):
+            return rejudge.rejudge(**kwargs)
+
+    def test_fixed_expected_output_flips_verdicts_and_xp_once(self):
+        right, wrong, other = self.users
+        self.submit(right, '1')
+        self.submit(wrong, '2')
+        self.submit(other, '1')
+        self.assertEqual(self.rejudge()["total"], 0)
+
+        # The setter fixes the expected output: '2' was right all along
+        self.case.expected_output = '2'
+        self.case.save()
+        with mock.patch('core.jobs.refresh_ranks') as refresh:
+            counts = self.rejudge(workers=2)
+        self.assertEqual((counts["total"], counts["rejudged"], counts["changed"]), (3, 3, 3))
+        refresh.assert_called_once_with({right.pk, wrong.pk, other.pk})
+
+        xp = dict(User.objects.values_list('username', 'xp'))
+        self.assertEqual((xp['u0'], xp['u1'], xp['u2']), (0, 10, 0))
+        # The award stays in the ledger, offset by a revocation
+        ledger = XPEvent.objects.filter(user=right).order_by('pk')
+        self.assertEqual([(e.reason, e.delta) for e in ledger], [('problem_solved', 10), ('solve_revoked', -10)])
+        self.assertIsNotNone(ledger[0].revoked_at)
+        self.assertEqual(User.objects.get(pk=wrong.pk).problem_solved, 1)
+        self.assertEqual(Submission.objects.get(user=wrong).verdict, 'Accepted')
+        self.assertFalse(QueuedJob.objects.filter(key='solve_awards').exists())
+        self.assertEqual(self.rejudge()["total"], 0)
+
+    def test_revoked_solve_can_be_earned_again(self):
+        user = self.users[0]
+        self.submit(user, '1')
+        self.case.expected_output = '2'
+        self.case.save()
+        self.rejudge()
+        self.assertEqual(User.objects.get(pk=user.pk).xp, 0)
+
+        self.submit(user, '2')
+        user.refresh_from_db()
+        self.assertEqual((user.xp, user.problem_solved), (10, 1))
+        self.assertEqual(list(XPEvent.objects.filter(user=user).order_by('pk').values_list('reason', 'delta')),
+                         [('problem_solved', 10), ('solve_revoked', -10), ('problem_solved', 10)])
+        self.assertEqual(reconcile_balances(), 0)
+
+    def test_interrupted_rejudge_resumes(self):
+        for user in self.users:
+            self.submit(user, '1')
+        self.case.expected_output = '2'
+        self.case.save()
+
+        real_store, calls = rejudge._store, []
+
+        def crash_after_one(*args):
+            if calls:
+                raise KeyboardInterrupt
+            calls.append(args)
+            real_store(*args)
+
+        with mock.patch.object(rejudge, '_store', crash_after_one), self.assertRaises(KeyboardInterrupt):
+            self.rejudge(workers=1)
+        # One verdict was stored and its XP change is waiting for settlement
+        self.assertEqual(QueuedJob.objects.filter(key='solve_awards').count(), 1)
+
+        out = io.StringIO()
+        call_command('rejudge', stdout=out)
+        self.assertIn("Rejudged 2 of 2 submissions", out.getvalue())
+        self.assertEqual(XPEvent.objects.filter(reason='problem_solved', revoked_at=None).count(), 0)
+        self.assertEqual(XPEvent.objects.filter(reason='solve_revoked').count(), 3)
+        self.assertEqual(list(User.objects.values_list('xp', flat=True).distinct()), [0])
+
+
+class TelemetryTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = MockPistonServer(latency=0.02).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+        super().tearDownClass()
+
+    def setUp(self):
+        patcher = mock.patch.object(executors, 'PISTON_API', self.server.url)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        verdicts._cache.clear()
+        self.user = User.objects.create(username='timed')
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        for i in range(3):
+            ProblemTestCase.objects.create(problem=self.problem, input_data=str(i), expected_output=str(i))
+
+    def judge(self, language='python'):
+        Submission.objects.create(user=self.user, problem=self.problem, code='', language=language, status='Queued')
+        judge_submission(claim_next('w'), 'w')
+
+    def test_each_test_run_is_recorded(self):
+        self.judge()
+        runs = TestRun.objects.filter(submission__user=self.user)
+        self.assertEqual(runs.count(), 3)
+        for run in runs:
+            self.assertTrue(run.passed)
+            self.assertGreaterEqual(run.round_trip_ms, 20)
+            self.assertEqual(run.wall_ms, 20)
+            self.assertEqual(run.memory_bytes, 1)
+
+        # A cached verdict ran nothing, so it records nothing
+        self.judge()
+        self.assertEqual(TestRun.objects.count(), 3)
+
+    def test_latency_report_and_dashboard(self):
+        self.judge('python')
+        self.judge('cpp')
+        report = {row['name']: row for row in telemetry.latency_report('language')}
+        self.assertEqual(set(report), {'python', 'cpp'})
+        python = report['python']
+        self.assertEqual((python['tests'], python['queue_wait']['count']), (3, 1))
+        self.assertEqual(sum(bar['count'] for bar in python['round_trip']['histogram']), 3)
+        self.assertEqual(python['wall']['p95'], 20)
+        self.assertEqual(telemetry.latency_report('problem')[0]['name'], 'Echo')
+
+        # The dashboard shows it from the analytics snapshot
+        analytics.cache.delete(analytics.CACHE_KEY)
+        self.addCleanup(analytics.cache.delete, analytics.CACHE_KEY)
+        self.client.force_login(User.objects.create(username='boss', role='Admin'))
+        self.assertNotContains(self.client.get(reverse('admin_dashboard')), 'cpp')
+        call_command('refresh_analytics', stdout=io.StringIO())
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertContains(response, 'Judge Latency')
+        self.assertContains(response, 'cpp')
+        self.assertEqual(response.context['latency'][0]['rows'][0]['round_trip']['count'], 3)
+
+    def test_problems_sharing_a_title_are_reported_apart(self):
+        self.judge()
+        self.problem = Problem.objects.create(title='Echo', difficulty='Easy', points=10)
+        ProblemTestCase.objects.create(problem=self.problem, input_data='0', expected_output='0')
+        self.judge()
+        rows = telemetry.latency_report('problem')
+        self.assertEqual(sorted((row['name'], row['tests']) for row in rows), [('Echo', 1), ('Echo', 3)])
+
+    def test_old_runs_are_pruned(self):
+        self.judge()
+        TestRun.objects.filter(pk=TestRun.objects.first().pk).update(
+            recorded_at=timezone.now() - timedelta(days=telemetry.RETENTION_DAYS + 1))
+        self.assertEqual(telemetry.prune(), 1)
+        self.assertEqual(TestRun.objects.count(), 2)
+
+    def test_histogram_buckets(self):
+        self.assertEqual(telemetry.histogram([1, 10, 11, 10**6], buckets=(10, 100)), [2, 1, 1])
+
+
+class BenchThroughputTests(TransactionTestCase):
+    # The test database is shared-cache SQLite in memory, where concurrent
+    # writers fail instead of waiting: one client, judging afterwards
+
+    def test_benchmark_reports_both_endpoints(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'bench.json')
+            out = io.StringIO()
+            call_command('bench_throughput', '--in-place', '--requests', '6', '--concurrency', '1',
+                         '--judge-workers', '0', '--tests', '2', '--latency', '0', '--output', path, stdout=out)
+            with open(path) as f:
+                report = json.load(f)
+
+        self.assertIn('submit (graded)', out.getvalue())
+        results = report['results']
+        self.assertEqual(results['run_code']['statuses'], {'200': 6})
+        self.assertEqual(results['submit']['request']['statuses'], {'202': 6})
+        self.assertEqual(results['submit']['graded']['verdicts'], {'Accepted': 6})
+        # Unique code per submission: every one is judged, none answered from the cache
+        self.assertEqual(results['mock']['requests'], 6 + 6 * 2)
+        self.assertGreater(results['run_code']['queries_per_request'], 0)
+        self.assertEqual(report['config']['requests'], 6)
+
+    def test_concurrent_submits_wait_for_each_other(self):
+        # Without --in-place the benchmark switches to a file database, where
+        # writers on other connections wait out the busy timeout
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'bench.json')
+            call_command('bench_throughput', '--endpoints', 'submit', '--requests', '40', '--concurrency', '4',
+                         '--judge-workers', '2', '--tests', '1', '--latency', '0', '--output', path,
+                         stdout=io.StringIO())
+            with open(path) as f:
+                submit = json.load(f)['results']['submit']
+        self.assertEqual(submit['request']['statuses'], {'202': 40})
+        self.assertEqual(submit['graded']['verdicts'], {'Accepted': 40})
+
+    def test_failed_requests_are_reported_apart(self):
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'bench.json')
+            out = io.StringIO()
+            with mock.patch('core.scheduler.priority_for', side_effect=[RuntimeError('boom')] * 2 + [0] * 2), \
+                    self.assertRaises(CommandError):
+                call_command('bench_throughput', '--in-place', '--endpoints', 'submit', '--requests', '4',
+                             '--concurrency', '1', '--judge-workers', '0', '--tests', '1', '--latency', '0',
+                             '--output', path, stdout=out)
+            with open(path) as f:
+                request = json.load(f)['results']['submit']['request']
+        self.assertEqual((request['count'], request['failed']), (2, 2))
+        self.assertEqual(request['statuses'], {'500': 2, '202': 2})
+        self.assertIn('2 of 4 requests FAILED', out.getvalue())
+
+
+class UserStatsTests(TestCase):
+
+    def setUp(self):
+        verdicts._cache.clear()
+        self.user = User.objects.create(username='counted')
+        self.client.force_login(self.user)
+        self.easy = Problem.objects.create(title='Easy', difficulty='Easy', points=10)
+        self.hard = Problem.objects.create(title='Hard', difficulty='Hard', points=50)
+
+    def test_summaries_follow_submissions_and_verdicts(self):
+        submit_and_judge(self.client, self.easy, False)
+        first = submit_and_judge(self.client, self.easy, True)
+        submit_and_judge(self.client, self.easy, True)
+        submit_and_judge(self.client, self.hard, False)
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(
+            (stats.attempts, stats.accepted, stats.solved, stats.easy_solved, stats.hard_solved), (4, 2, 1, 1, 0)
+        )
+        easy = UserProblemStatus.objects.get(user=self.user, problem=self.easy)
+        self.assertEqual((easy.attempts, easy.accepted, easy.first_solved_at), (3, 2, first.finished_at))
+        self.assertEqual(userstats.check(), [])
+
+        response = self.client.get(reverse('stats'))
+        self.assertEqual((response.context['total_submissions'], response.context['solved_problems']), (4, 1))
+        self.assertEqual(response.context['difficulty_stats'], {'Easy': 1, 'Medium': 0, 'Hard': 0})
+        self.assertEqual(self.client.get(reverse('download_report_pdf'))['Content-Type'], 'application/pdf')
+
+    def test_rejudge_flip_refreshes_summaries(self):
+        solved = submit_and_judge(self.client, self.easy, True)
+        Submission.objects.filter(pk=solved.pk).update(passed=False, verdict='Wrong Answer')
+        enqueue('solve_awards', solved.pk)
+        run_pending()
+
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.attempts, stats.accepted, stats.solved, stats.easy_solved), (1, 0, 0, 0))
+        self.assertEqual(userstats.check(), [])
+
+    def test_check_reports_drift_and_rebuild_repairs_it(self):
+        submit_and_judge(self.client, self.easy, True)
+        submit_and_judge(self.client, self.hard, True)
+        UserStats.objects.filter(user=self.user).update(solved=7)
+        UserProblemStatus.objects.filter(problem=self.hard).delete()
+        # Changing a difficulty is not tracked incrementally
+        Problem.objects.filter(pk=self.easy.pk).update(difficulty='Medium')
+
+        drift = {(kind, field) for kind, _, field, _, _ in userstats.check()}
+        self.assertEqual(drift, {('user', 'solved'), ('user', 'easy_solved'), ('user', 'medium_solved'),
+                                 ('status', 'row')})
+        with self.assertRaises(CommandError):
+            call_command('check_user_stats', stdout=io.StringIO())
+
+        call_command('rebuild_user_stats', stdout=io.StringIO())
+        self.assertEqual(userstats.check(), [])
+        stats = UserStats.objects.get(user=self.user)
+        self.assertEqual((stats.solved, stats.medium_solved, stats.hard_solved), (2, 1, 1))
+
+    def test_recount_runs_inside_the_replacing_transaction(self):
+        submit_and_judge(self.client, self.easy, True)
+        depth = len(connection.savepoint_ids)
+        seen = []
+        expected = userstats._expected
+
+        def counted(*args):
+            seen.append(len(connection.savepoint_ids))
+            return expected(*args)
+
+        with mock.patch('core.userstats._expected', side_effect=counted):
+            userstats.refresh([self.user.pk])
+            userstats.rebuild()
+        # A submission judged between counting and replacing would be lost
+        self.assertEqual(seen, [depth + 1, depth + 1])
+        self.assertEqual(userstats.check(), [])
+
+
+class DailyActivityTests(TestCase):
+
+    def setUp(self):
+        verdicts._cache.clear()
+        self.user = User.objects.create(username='daily')
+        self.client.force_login(self.user)
+        self.problem = Problem.objects.create(title='Daily', difficulty='Easy', points=10)
+
+    def test_activity_follows_submissions(self):
+        submit_and_judge(self.client, self.problem, False)
+        submit_and_judge(self.client, self.problem, True)
+        today = DailyActivity.objects.get(user=self.user, day=timezone.localdate())
+        self.assertEqual((today.submissions, today.accepted), (2, 1))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.streak, 1)
+        self.assertEqual(userstats.check(), [])
+
+        response = self.client.get(reverse('stats'), {'days': 30})
+        chart = response.context['daily_submissions']
+        self.assertEqual(len(chart), 30)
+        self.assertEqual((chart[-1]['submissions'], chart[0]['submissions']), (2, 0))
+        self.assertEqual(sum(day is not None for week in response.context['heatmap'] for day in week), 365)
+        # Unknown windows fall back to a week
+        response = self.client.get(reverse('stats'), {'days': 12})
+        self.assertEqual(len(response.context['daily_submissions']), 7)
+
+    def test_streak_counts_consecutive_days(self):
+        today = timezone.localdate()
+        for back in (1, 2, 4):
+            DailyActivity.objects.create(user=self.user, day=today - timedelta(days=back), submissions=1)
+        # Not submitting yet today does not break the streak
+        self.assertEqual(userstats.streak(self.user, today), 2)
+        self.assertEqual(userstats.streak(self.user, today + timedelta(days=2)), 0)
+        submit_and_judge(self.client, self.problem, False)
+        self.user.refresh_from_db()
+        self.assertEqual((userstats.streak(self.user), self.user.streak), (3, 3))
+
+    def test_rebuild_repairs_days(self):
+        submit_and_judge(self.client, self.problem, True)
+        DailyActivity.objects.filter(user=self.user).update(accepted=5)
+        DailyActivity.objects.create(user=self.user, day=timezone.localdate() - timedelta(days=3), submissions=2)
+        drift = {(kind, field) for kind, _, field, _, _ in userstats.check()}
+        self.assertEqual(drift, {('day', 'accepted'), ('day', 'row')})
+        userstats.rebuild()
+        self.assertEqual(userstats.check(), [])
+
+
+class ProblemCounterTests(TestCase):
+
+    def setUp(self):
+        verdicts._cache.clear()
+        self.problem = Problem.objects.create(title='Counted', difficulty='Easy', points=10)
+        self.alice = User.objects.create(username='alice')
+        self.bob = User.objects.create(username='bob')
+
+    def counters(self):
+        self.problem.refresh_from_db()
+        return tuple(getattr(self.problem, name) for name in problemstats.COUNTERS)
+
+    def test_counters_follow_submissions_and_verdicts(self):
+        submit_and_judge(self.client, self.problem, False, user=self.alice)
+        submit_and_judge(self.client, self.problem, True, user=self.alice)
+        submit_and_judge(self.client, self.problem, True, user=self.alice)
+        submit_and_judge(self.client, self.problem, False, user=self.bob)
+
+        self.assertEqual(self.counters(), (4, 2, 2, 1))
+        self.assertEqual(self.problem.acceptance, '50.0%')
+        self.assertEqual(problemstats.reconcile(), 0)
+
+    def test_reconcile_repairs_drift(self):
+        submit_and_judge(self.client, self.problem, True, user=self.alice)
+        Problem.objects.filter(pk=self.problem.pk).update(attempts=9, solved_users=0)
+        Problem.objects.create(title='Untouched', difficulty='Hard', points=50, attempts=3)
+
+        call_command('reconcile_acceptance', stdout=io.StringIO())
+        self.assertEqual(self.counters(), (1, 1, 1, 1))
+        self.assertFalse(Problem.objects.filter(title='Untouched', attempts__gt=0).exists())
+
+    def test_problem_list_is_one_query(self):
+        submit_and_judge(self.client, self.problem, True, user=self.alice)
+        Problem.objects.create(title='Other', difficulty='Hard', points=50)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('problems'))
+        self.assertContains(response, '100.0%')
+        self.assertEqual(len([q for q in queries if 'core_problem' in q['sql']]), 1)
+
+
+class AnalyticsTests(TestCase):
+
+    def setUp(self):
+        cache_key = analytics.CACHE_KEY
+        analytics.cache.delete(cache_key)
+        self.addCleanup(analytics.cache.delete, cache_key)
+        self.problem = Problem.objects.create(title='Insight', difficulty='Easy', points=10)
+        self.north = User.objects.create(username='north', college='North')
+        self.south = User.objects.create(username='south', college='South')
+
+    def submit(self, user, language, passed, status='Finished'):
+        problemstats.record_submission(self.problem.id, False)
+        if passed:
+            problemstats.record_accepted(self.problem.id, False)
+        return Submission.objects.create(user=user, problem=self.problem, code='x', language=language,
+                                         passed=passed, status=status)
+
+    def test_snapshot_summarizes_rollup(self):
+        self.submit(self.north, 'python', True)
+        self.submit(self.north, 'python', False)
+        self.submit(self.south, 'cpp', True)
+        hours, snapshot = analytics.refresh()
+        self.assertEqual(hours, 1)
+        data = snapshot.data
+
+        self.assertEqual([(r['language'], r['submissions'], r['solve_rate']) for r in data['languages']],
+                         [('python', 2, 50.0), ('cpp', 1, 100.0)])
+        self.assertEqual({(r['college'], r['submissions']) for r in data['colleges']}, {('North', 2), ('South', 1)})
+        self.assertEqual((len(data['hourly']), data['hourly'][-1]['submissions']), (24, 3))
+        self.assertEqual((data['problems'][0]['attempts'], data['problems'][0]['solve_rate']), (3, 66.7))
+
+        admin = User.objects.create(username='insight-admin', role='Admin')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin_dashboard'))
+        self.assertContains(response, 'Submission Insights')
+        self.assertEqual(response.context['insights_as_of'], snapshot.created_at)
+        # Served from the cache until the next refresh
+        with self.assertNumQueries(0):
+            self.assertEqual(analytics.latest(), (snapshot.created_at, data))
+
+    def test_refresh_recounts_hours_with_late_verdicts(self):
+        late = self.submit(self.north, 'python', False, status='Queued')
+        Submission.objects.filter(pk=late.pk).update(submitted_at=timezone.now() - timedelta(hours=3))
+        analytics.refresh()
+        self.assertEqual(SubmissionRollup.objects.get().accepted, 0)
+
+        Submission.objects.filter(pk=late.pk).update(status='Finished', passed=True)
+        self.submit(self.south, 'cpp', False)
+        hours, _ = analytics.refresh()
+        self.assertEqual(hours, 2)
+        self.assertEqual(sorted(SubmissionRollup.objects.values_list('language', 'accepted')),
+                         [('cpp', 0), ('python', 1)])
+        self.assertEqual(AnalyticsSnapshot.objects.count(), 1)
+
+        # Judged hours older than the last run are left alone until --full
+        Submission.objects.filter(pk=late.pk).update(passed=False)
+        analytics.refresh()
+        self.assertEqual(SubmissionRollup.objects.get(language='python').accepted, 1)
+        call_command('refresh_analytics', '--full', stdout=io.StringIO())
+        self.assertEqual(SubmissionRollup.objects.get(language='python').accepted, 0)
+
+
+class ReportCacheTests(TestCase):
+
+    def setUp(self):
+        # User ids are reused between tests, so each gets an empty cache
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        patcher = mock.patch.object(reports, 'REPORT_DIR', workdir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create(username='reported', college='North')
+        self.client.force_login(self.user)
+
+    def test_unchanged_report_is_served_from_cache_on_both_urls(self):
+        first = self.client.get('/stats/download/')
+        self.assertEqual(first['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+        etag = first['ETag']
+
+        with mock.patch.object(reports, 'render') as render:
+            second = self.client.get('/report/download/')
+            self.assertEqual(second['ETag'], etag)
+            self.assertEqual(self.client.get('/stats/download/', headers={'If-None-Match': etag}).status_code, 304)
+        render.assert_not_called()
+
+        # New stats are a new version
+        UserStats.objects.create(user=self.user, attempts=3, accepted=1, solved=1, easy_solved=1)
+        third = self.client.get('/report/download/', headers={'If-None-Match': etag})
+        self.assertEqual(third.status_code, 200)
+        self.assertNotEqual(third['ETag'], etag)
+
+    def test_slow_render_serves_previous_report_or_asks_to_retry(self):
+        never = Future()
+        with mock.patch.object(reports, 'render', return_value=never), mock.patch.object(reports, 'WAIT_SECONDS', 0):
+            response = self.client.get('/stats/download/')
+            self.assertEqual((response.status_code, response['Retry-After']), (503, '2'))
+
+            previous = reports.path_for(self.user.id, 'old')
+            os.makedirs(os.path.dirname(previous))
+            with open(previous, 'wb') as f:
+                f.write(b'%PDF old')
+            response = self.client.get('/stats/download/')
+            self.assertEqual(response['ETag'], '"old"')
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF old')
+
+    def test_previous_report_removed_while_falling_back(self):
+        current = reports.path_for(self.user.id, reports.version(reports.report_data(self.user)))
+        previous = reports.path_for(self.user.id, 'old')
+        os.makedirs(os.path.dirname(previous))
+        with open(previous, 'wb') as f:
+            f.write(b'%PDF old')
+
+        calls = []
+
+        def latest(user_id, exclude):
+            calls.append(exclude)
+            if len(calls) == 1:
+                # The render lands right after the wait timed out, and removes the old report
+                with open(current, 'wb') as f:
+                    f.write(b'%PDF new')
+                reports._remove(previous)
+                return previous
+            return None
+
+        with mock.patch.object(reports, 'render', return_value=Future()), mock.patch.object(reports, 'WAIT_SECONDS', 0), \
+                mock.patch.object(reports, '_latest', side_effect=latest):
+            response = self.client.get('/stats/download/')
+        self.assertEqual((response.status_code, len(calls)), (200, 2))
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF new')
+
+    def test_college_export_streams_every_students_report(self):
+        self.client.get('/stats/download/')  # already cached
+        for name in ('ada', 'brian'):
+            student = User.objects.create(username=name, college='North')
+            UserStats.objects.create(user=student, attempts=2, accepted=1, solved=1, hard_solved=1)
+        User.objects.create(username='elsewhere', college='South')
+
+        with self.assertNumQueries(2):
+            self.assertEqual([d['username'] for d in reports.college_data('North')], ['ada', 'brian', 'reported'])
+
+        summary = {}
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(reports.export_college('North', summary))))
+        self.assertEqual(sorted(archive.namelist()), ['ada.pdf', 'brian.pdf', 'reported.pdf', 'summary.txt'])
+        self.assertTrue(archive.read('ada.pdf').startswith(b'%PDF'))
+        self.assertEqual((summary['students'], summary['cached'], summary['rendered']), (3, 1, 2))
+        self.assertEqual(set(summary['timings']), {'collect', 'render', 'zip', 'total'})
+
+        self.client.force_login(User.objects.create(username='officer', role='Admin'))
+        response = self.client.get(reverse('college_reports'), {'college': 'North'})
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="north-reports.zip"')
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIn('3 students of North: 3 reports from the cache', archive.read('summary.txt').decode())
+
+    def test_college_export_caps_renders_in_flight(self):
+        for n in range(5):
+            User.objects.create(username=f'student{n}', college='East')
+        outstanding, peak = set(), [0]
+
+        class Counting(ThreadPoolExecutor):
+            def submit(self, *args, **kwargs):
+                future = super().submit(*args, **kwargs)
+                outstanding.add(future)
+                future.add_done_callback(outstanding.discard)
+                peak[0] = max(peak[0], len(outstanding))
+                return future
+
+        summary = {}
+        with Counting(max_workers=4) as executor:
+            archive = zipfile.ZipFile(io.BytesIO(b''.join(reports.export_college('East', summary, executor, in_flight=2))))
+        self.assertEqual((len(archive.namelist()), summary['rendered']), (6, 5))
+        self.assertLessEqual(peak[0], 2)
@@ -0,0 +1,53 @@
+"""
+Pass/fail history of test cases.
+
+Grading stops at the first case that does not pass, so running the case
+most likely to fail first saves the executions of every case that would
+have passed before it. The judge records each case it completes in
+TestCase.runs / failures, and order() sorts a problem's cases by that
+history.
+"""
+from django.db.models import F
+
+from .models import TestCase
+
+
+def failure_rate(runs, failures):
+    # Smoothed, so a case with little history starts in the middle
+    return (failures + 1) / (runs + 2)
+
+
+def order(test_cases, stats=None):
+    """`test_cases` in judging order.
+
+    Visible (sample) cases stay first in their given order: they are cheap,
+    and failing one gives the student an input they can see. Hidden cases
+    follow by descending failure rate, then smallest input first. `stats`
+    maps pk -> (runs, failures) to use instead of the stored counts.
+    """
+    def rate(tc):
+        runs, failures = stats.get(tc.pk, (0, 0)) if stats is not None else (tc.runs, tc.failures)
+        return failure_rate(runs, failures)
+
+    samples = [tc for tc in test_cases if not tc.is_hidden]
+    hidden = sorted((tc for tc in test_cases if tc.is_hidden),
+                    key=lambda tc: (-rate(tc), tc.input_size, tc.pk or 0))
+    return samples + hidden
+
+
+def record(outcomes):
+    """Add judged cases to the history. `outcomes` holds (test_case, passed) pairs."""
+    passed = [tc.pk for tc, ok in outcomes if ok and tc.pk]
+    failed = [tc.pk for tc, ok in outcomes if not ok and tc.pk]
+    if passed:
+        TestCase.objects.filter(pk__in=passed).update(runs=F('runs') + 1)
+    if failed:
+        TestCase.objects.filter(pk__in=failed).update(runs=F('runs') + 1, failures=F('failures') + 1)
+
+
+def calls_until_verdict(results):
+    """Executions a one-at-a-time fail-fast run makes, given whether each case passes, in run order."""
+    for i, ok in enumerate(results):
+        if not ok:
+            return i + 1
+    return len(results)
@@ -0,0 +1,127 @@
+"""
+Admission control for the endpoints that run code.
+
+Each user has a token bucket per endpoint, configured in THROTTLE_RATES as
+(requests, per_seconds, burst). A bucket is kept as one number, the time
+at which it would be full again (the GCRA form of a token bucket).
+Admitting a request moves that time forward by one token's worth. A
+request is refused while this would put it more than a full burst ahead
+of now. Rows are changed with conditional UPDATEs, so all web processes
+sharing the database see the same buckets.
+
+On top of that, at most THROTTLE_MAX_EXECUTIONS `run_code` executions run
+at once across all processes, each holding a leased ExecutionSlot row.
+"""
+import math
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .models import ExecutionSlot, RateLimit
+
+
+# endpoint -> (requests, per_seconds, burst); endpoints not listed are not limited
+RATES = getattr(settings, 'THROTTLE_RATES', {
+    'run_code': (20, 60, 10),
+    'submit': (10, 60, 5),
+})
+# Executions running at once across all web processes; None for no cap
+MAX_EXECUTIONS = getattr(settings, 'THROTTLE_MAX_EXECUTIONS', 16)
+# A slot left behind by a crashed process is reused after this long
+SLOT_SECONDS = getattr(settings, 'THROTTLE_SLOT_SECONDS', 60)
+
+
+class Throttled(Exception):
+    """The request is over a limit; it may be retried in `retry_after` seconds."""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def take(key, requests, per, burst, now=None):
+    """Take a token from bucket `key`. Returns 0 if admitted, else the seconds until a token is free."""
+    now = time.time() if now is None else now
+    interval = per / requests
+    for _ in range(5):
+        tat = RateLimit.objects.filter(key=key).values_list('tat', flat=True).first()
+        new_tat = max(tat or now, now) + interval
+        wait = new_tat - now - burst * interval
+        if wait > 0:
+            return wait
+        if tat is None:
+            try:
+                with transaction.atomic():
+                    RateLimit.objects.create(key=key, tat=new_tat)
+                return 0
+            except IntegrityError:
+                continue
+        if RateLimit.objects.filter(key=key, tat=tat).update(tat=new_tat):
+            return 0
+    # Lost every race on this key: the user is sending requests in parallel
+    return interval
+
+
+def throttle(endpoint):
+    """View decorator applying the RATES[endpoint] bucket of the logged-in user to POSTs."""
+    def decorate(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method == 'POST' and endpoint in RATES:
+                wait = take(f"{endpoint}:{request.user.pk}", *RATES[endpoint])
+                if wait:
+                    return too_many_requests(Throttled("Too many requests, slow down", wait))
+            return view(request, *args, **kwargs)
+        return wrapped
+    return decorate
+
+
+@contextmanager
+def execution_slot(limit=None):
+    """Hold one of the first `limit` (default MAX_EXECUTIONS) global slots, or raise Throttled if all are taken."""
+    limit = MAX_EXECUTIONS if limit is None else limit
+    if not limit:
+        yield
+        return
+    holder = uuid.uuid4().hex
+    slot = _claim_slot(holder, limit)
+    if slot is None:
+        raise Throttled("Too many programs are running right now, try again shortly", retry_after=1)
+    try:
+        yield
+    finally:
+        ExecutionSlot.objects.filter(slot=slot, holder=holder).update(holder='', expires_at=None)
+
+
+def _claim_slot(holder, limit):
+    now = timezone.now()
+    expires_at = now + timedelta(seconds=SLOT_SECONDS)
+    busy = set(ExecutionSlot.objects.filter(expires_at__gt=now).values_list('slot', flat=True))
+    free = Q(expires_at=None) | Q(expires_at__lte=now)
+    for slot in range(limit):
+        if slot in busy:
+            continue
+        if ExecutionSlot.objects.filter(free, slot=slot).update(holder=holder, expires_at=expires_at):
+            return slot
+        try:
+            with transaction.atomic():
+                ExecutionSlot.objects.create(slot=slot, holder=holder, expires_at=expires_at)
+            return slot
+        except IntegrityError:
+            # Exists and was taken since we looked
+            continue
+    return None
+
+
+def too_many_requests(error):
+    response = JsonResponse({"status": "error", "error": str(error), "message": str(error)}, status=429)
+    response['Retry-After'] = str(max(1, math.ceil(error.retry_after)))
+    return response
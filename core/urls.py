@@ -11,6 +11,9 @@ urlpatterns = [
     path('problem/<int:id>/', views.solve_problem, name='solve_problem'),
     path('contests/', views.contests, name='contests'),
     path('contest/<int:id>/', views.contest_overview, name='contest_overview'),
+    path('leaderboard/', views.leaderboard, name='leaderboard'),
+    path('api/leaderboard/', views.leaderboard_api, name='leaderboard_api'),
+    path('api/leaderboard/around-me/', views.leaderboard_around_me_api, name='leaderboard_around_me_api'),
 
     # =====================
     # Forum URLs
@@ -36,10 +39,12 @@ urlpatterns = [
     path('admin-panel/', views.admin_dashboard, name='admin_dashboard'),
     path('admin/add-problem/', views.add_problem, name='add_problem'),
     path('admin/add-contest/', views.add_contest, name='add_contest'),
+    path('admin-panel/college-reports/', views.college_reports, name='college_reports'),
 
     # =====================
     # Code Execution
     # =====================
     path('problem/<int:id>/submit/', views.submit_solution, name='submit_solution'),
+    path('submission/<int:id>/status/', views.submission_status, name='submission_status'),
     path('run/code/', views.run_code, name='run_code'),
 ]
@@ -0,0 +1,217 @@
+"""
+Per-user submission statistics, kept current as submissions come in.
+
+UserProblemStatus has one row per problem a user submitted to: attempts,
+accepted submissions and when the problem was first solved. UserStats
+holds the user's totals, with solved counts per difficulty, so the stats
+page and the PDF report read one row instead of aggregating the user's
+whole history. DailyActivity has the user's submissions per day, for the
+activity charts (activity()) and the streak (streak()).
+
+record_submission() runs when a submission is created and
+record_accepted() when a judge stores a passing verdict, each inside the
+caller's transaction and with F() updates. Verdicts flipped by a rejudge
+are settled by refresh(). Deleting a problem or changing its difficulty
+is not tracked; `manage.py rebuild_user_stats` recomputes everything and
+`manage.py check_user_stats` reports rows that have drifted.
+"""
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Min, Q
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyActivity, Submission, User, UserProblemStatus, UserStats
+
+
+DIFFICULTY_FIELDS = {'Easy': 'easy_solved', 'Medium': 'medium_solved', 'Hard': 'hard_solved'}
+STATS_FIELDS = ('attempts', 'accepted', 'solved', 'easy_solved', 'medium_solved', 'hard_solved')
+STATUS_FIELDS = ('attempts', 'accepted', 'first_solved_at')
+ACTIVITY_FIELDS = ('submissions', 'accepted')
+# Windows the activity chart offers, in days
+WINDOWS = (7, 30, 365)
+
+
+def _bump(model, lookup, **deltas):
+    """Add `deltas` to the row matching `lookup`, creating it if needed. True if it was created."""
+    increments = {name: F(name) + delta for name, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**increments):
+        return False
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+        return True
+    except IntegrityError:
+        # Created by a concurrent submission in the meantime
+        model.objects.filter(**lookup).update(**increments)
+        return False
+
+
+def record_submission(submission):
+    """Count a new submission as an attempt. True if it is the user's first at its problem."""
+    first = _bump(UserProblemStatus, {'user_id': submission.user_id, 'problem_id': submission.problem_id}, attempts=1)
+    _bump(UserStats, {'user_id': submission.user_id}, attempts=1)
+    if _bump(DailyActivity, _day_of(submission), submissions=1):
+        # First submission of the day extends (or restarts) the streak
+        User.objects.filter(pk=submission.user_id).update(streak=streak(submission.user_id))
+    return first
+
+
+def record_accepted(submission, at):
+    """Count a passing verdict stored at `at`; the first one for its problem also counts as a solve.
+
+    Returns True for that first one.
+    """
+    pair = {'user_id': submission.user_id, 'problem_id': submission.problem_id}
+    _bump(UserProblemStatus, pair, accepted=1)
+    first = UserProblemStatus.objects.filter(**pair, first_solved_at=None).update(first_solved_at=at)
+    if not first:
+        # A worker that finished later may have stored its verdict first
+        UserProblemStatus.objects.filter(**pair, first_solved_at__gt=at).update(first_solved_at=at)
+    deltas = {'accepted': 1}
+    if first:
+        deltas['solved'] = 1
+        field = DIFFICULTY_FIELDS.get(submission.problem.difficulty)
+        if field:
+            deltas[field] = 1
+    _bump(UserStats, {'user_id': submission.user_id}, **deltas)
+    _bump(DailyActivity, _day_of(submission), accepted=1)
+    return bool(first)
+
+
+def _day_of(submission):
+    return {'user_id': submission.user_id, 'day': timezone.localdate(submission.submitted_at)}
+
+
+def stats_for(user):
+    """`user`'s UserStats, all zero if they never submitted."""
+    return UserStats.objects.filter(user=user).first() or UserStats(user=user)
+
+
+def activity(user, days, today=None):
+    """`user`'s submissions and accepted ones on each of the `days` days up to `today`, oldest first."""
+    today = today or timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    rows = {
+        row['day']: row
+        for row in DailyActivity.objects.filter(user=user, day__range=(start, today)).values('day', *ACTIVITY_FIELDS)
+    }
+    return [
+        rows.get(day, {'day': day, 'submissions': 0, 'accepted': 0})
+        for day in (start + timedelta(days=n) for n in range(days))
+    ]
+
+
+def streak(user, today=None):
+    """Consecutive days with a submission, up to `today` or, if `user` has not submitted yet today, yesterday."""
+    today = today or timezone.localdate()
+    days = DailyActivity.objects.filter(user=user, day__lte=today).order_by('-day').values_list('day', flat=True)
+    count, expected = 0, today
+    for day in days.iterator():
+        if count == 0 and day == today - timedelta(days=1):
+            expected = day
+        if day != expected:
+            break
+        count += 1
+        expected -= timedelta(days=1)
+    return count
+
+
+def refresh(user_ids):
+    """Recompute the rows of `user_ids` from their submissions."""
+    with transaction.atomic():
+        _lock(UserProblemStatus.objects.filter(user_id__in=user_ids), UserStats.objects.filter(user_id__in=user_ids))
+        statuses, totals, days = _expected(user_ids)
+        _replace(statuses, totals, days, UserProblemStatus.objects.filter(user_id__in=user_ids),
+                 UserStats.objects.filter(user_id__in=user_ids), DailyActivity.objects.filter(user_id__in=user_ids))
+
+
+def rebuild():
+    """Replace every row with values recomputed from submissions. Returns (statuses, users, days) written."""
+    with transaction.atomic():
+        _lock(UserProblemStatus.objects.all(), UserStats.objects.all())
+        statuses, totals, days = _expected()
+        _replace(statuses, totals, days, UserProblemStatus.objects.all(), UserStats.objects.all(),
+                 DailyActivity.objects.all())
+    return len(statuses), len(totals), len(days)
+
+
+def _lock(*querysets):
+    # Judges recording a verdict now wait until the new rows are in, so no
+    # submission judged between counting and replacing is lost. Taken in
+    # the order record_submission() and record_accepted() bump them.
+    for rows in querysets:
+        list(rows.select_for_update().values_list('pk', flat=True))
+
+
+def check():
+    """Rows that differ from the submissions, as (kind, key, field, stored, expected) tuples."""
+    statuses, totals, days = _expected()
+    drift = []
+    stored = {
+        (row.pop('user_id'), row.pop('problem_id')): row
+        for row in UserProblemStatus.objects.values('user_id', 'problem_id', *STATUS_FIELDS)
+    }
+    for key in statuses.keys() | stored.keys():
+        drift += _compare('status', key, STATUS_FIELDS, stored.get(key), statuses.get(key))
+    stored = {row.pop('user_id'): row for row in UserStats.objects.values('user_id', *STATS_FIELDS)}
+    for key in totals.keys() | stored.keys():
+        drift += _compare('user', key, STATS_FIELDS, stored.get(key), totals.get(key))
+    stored = {
+        (row.pop('user_id'), row.pop('day')): row
+        for row in DailyActivity.objects.values('user_id', 'day', *ACTIVITY_FIELDS)
+    }
+    for key in days.keys() | stored.keys():
+        drift += _compare('day', key, ACTIVITY_FIELDS, stored.get(key), days.get(key))
+    return sorted(drift, key=str)
+
+
+def _replace(statuses, totals, days, old_statuses, old_totals, old_days):
+    old_statuses.delete()
+    old_totals.delete()
+    old_days.delete()
+    UserProblemStatus.objects.bulk_create(
+        [UserProblemStatus(user_id=u, problem_id=p, **values) for (u, p), values in statuses.items()],
+        batch_size=2000,
+    )
+    UserStats.objects.bulk_create([UserStats(user_id=u, **values) for u, values in totals.items()], batch_size=2000)
+    DailyActivity.objects.bulk_create(
+        [DailyActivity(user_id=u, day=d, **values) for (u, d), values in days.items()], batch_size=2000,
+    )
+
+
+def _compare(kind, key, fields, stored, expected):
+    if stored is None or expected is None:
+        return [(kind, key, 'row', 'present' if stored else 'missing', 'present' if expected else 'missing')]
+    return [(kind, key, f, stored[f], expected[f]) for f in fields if stored[f] != expected[f]]
+
+
+def _expected(user_ids=None):
+    """({(user_id, problem_id): status fields}, {user_id: totals}, {(user_id, day): activity}) as the submissions say."""
+    submissions = Submission.objects.all()
+    if user_ids is not None:
+        submissions = submissions.filter(user_id__in=user_ids)
+    rows = (
+        submissions.order_by().values('user_id', 'problem_id', 'problem__difficulty')
+        .annotate(attempts=Count('id'), accepted=Count('id', filter=Q(passed=True)),
+                  # Submissions from before the judge queue have no finished_at
+                  first_solved_at=Min(Coalesce('finished_at', 'submitted_at'), filter=Q(passed=True)))
+    )
+    statuses, totals = {}, {}
+    for row in rows:
+        user_id, difficulty = row.pop('user_id'), row.pop('problem__difficulty')
+        statuses[user_id, row.pop('problem_id')] = row
+        total = totals.setdefault(user_id, dict.fromkeys(STATS_FIELDS, 0))
+        total['attempts'] += row['attempts']
+        total['accepted'] += row['accepted']
+        if row['first_solved_at'] is not None:
+            total['solved'] += 1
+            if difficulty in DIFFICULTY_FIELDS:
+                total[DIFFICULTY_FIELDS[difficulty]] += 1
+    days = {
+        (row.pop('user_id'), row.pop('day')): row
+        for row in submissions.order_by().values('user_id', day=TruncDate('submitted_at'))
+        .annotate(submissions=Count('id'), accepted=Count('id', filter=Q(passed=True)))
+    }
+    return statuses, totals, days
@@ -0,0 +1,102 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from . import checkers, judge
+from .executors import ALIASES
+
+
+# Verdicts remembered per judge process
+CACHE_SIZE = getattr(settings, 'JUDGE_VERDICT_CACHE_SIZE', 1024)
+
+
+class LRUCache:
+    """A thread-safe mapping that forgets its least recently used entries past `maxsize`."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+_cache = LRUCache(CACHE_SIZE)
+
+
+def test_set_hash(test_cases):
+    """Version of a problem's test data: changes whenever a case is added, edited or removed."""
+    digest = hashlib.sha256()
+    for tc in sorted(test_cases, key=lambda tc: (tc.pk is None, tc.pk or 0)):
+        for part in (str(tc.pk), tc.input_hash, tc.output_hash, str(tc.is_hidden)):
+            digest.update(part.encode())
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def normalize_code(code):
+    # Line endings and trailing whitespace at the end of the file never
+    # change what a program does
+    return (code or "").replace('\r\n', '\n').rstrip()
+
+
+def judge_version(problem, test_cases):
+    """Hash of what a verdict on `problem` depends on besides the code: its test set and checker."""
+    return hashlib.sha256(f"{test_set_hash(test_cases)}:{checkers.describe(problem)}".encode()).hexdigest()
+
+
+def cache_key(problem, test_cases, language, code):
+    code_hash = hashlib.sha256(normalize_code(code).encode()).hexdigest()
+    return (problem.pk, judge_version(problem, test_cases), ALIASES.get(language, language), code_hash)
+
+
+def grade(problem, code, language, test_cases, observe=None):
+    """judge.grade(), remembering verdicts for code already graded on this test set.
+
+    Only "passed" and "failed" verdicts are kept: an error may come from a
+    flaky backend or a time limit and is worth running again. The key
+    includes a hash of the test cases and the problem's checker settings,
+    so editing a problem's tests or checker makes its old verdicts
+    unreachable and they age out of the cache. A remembered outcome is
+    returned with "cached": True, and nothing is passed to `observe`.
+    """
+    test_cases = list(test_cases)
+    key = cache_key(problem, test_cases, language, code)
+    outcome = _cache.get(key)
+    if outcome is not None:
+        return dict(outcome, cached=True)
+
+    outcome = judge.grade(code, language, test_cases, check=checkers.for_problem(problem), observe=observe)
+    if outcome["verdict"] in ("passed", "failed"):
+        _cache.set(key, outcome)
+    return outcome
+
+
+def cache_stats():
+    return {"size": len(_cache), "maxsize": _cache.maxsize, "hits": _cache.hits, "misses": _cache.misses}
@@ -0,0 +1,128 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .jobs import enqueue
+from .models import Problem, User, XPEvent, Submission, XP_PER_LEVEL
+
+
+def level_for_xp(xp):
+    return 1 + xp // XP_PER_LEVEL
+
+
+def award_xp(user, delta, reason, source=None):
+    """Record an XP event and apply it to the user's balance atomically.
+
+    The balance is bumped with an F() expression so concurrent awards never
+    overwrite each other, and only the xp/level/problem_solved columns are
+    written. `user` is refreshed in place. Ranks are not touched here: a
+    "ranks" marker is queued for the background worker, so the cost does
+    not grow with the number of users. Returns False (and changes nothing)
+    if the ledger already holds this award, which is how a problem only
+    ever pays out once per user.
+    """
+    source_type = ContentType.objects.get_for_model(source) if source is not None else None
+    source_id = source.pk if source is not None else None
+
+    updates = {
+        'xp': F('xp') + delta,
+        'level': 1 + (F('xp') + delta) / XP_PER_LEVEL,
+    }
+    if reason == 'problem_solved':
+        updates['problem_solved'] = F('problem_solved') + 1
+
+    try:
+        with transaction.atomic():
+            XPEvent.objects.create(
+                user=user, delta=delta, reason=reason,
+                source_type=source_type, source_id=source_id,
+            )
+            User.objects.filter(pk=user.pk).update(**updates)
+            # The UPDATE holds the row lock, so this read is our own result
+            user.xp, user.level, user.problem_solved = (
+                User.objects.filter(pk=user.pk).values_list('xp', 'level', 'problem_solved').get()
+            )
+            enqueue('ranks', user.pk)
+    except IntegrityError:
+        return False
+    return True
+
+
+def revoke_solve_award(user, problem):
+    """Withdraw `user`'s award for solving `problem`, reversing award_xp().
+
+    Used when a rejudge leaves the user with no passing submission. The
+    ledger keeps the award, marked revoked, and gains a 'solve_revoked'
+    event that offsets it, so a later correct submission can earn the
+    award again. Returns False if there was no award.
+    """
+    source_type = ContentType.objects.get_for_model(problem)
+    with transaction.atomic():
+        event = XPEvent.objects.select_for_update().filter(
+            user=user, reason='problem_solved', source_type=source_type, source_id=problem.pk, revoked_at=None
+        ).first()
+        if event is None:
+            return False
+        now = timezone.now()
+        XPEvent.objects.filter(pk=event.pk).update(revoked_at=now)
+        XPEvent.objects.create(user=user, delta=-event.delta, reason='solve_revoked',
+                               source_type=source_type, source_id=problem.pk, created_at=now)
+        User.objects.filter(pk=user.pk).update(
+            xp=F('xp') - event.delta,
+            level=1 + (F('xp') - event.delta) / XP_PER_LEVEL,
+            problem_solved=F('problem_solved') - 1,
+        )
+        enqueue('ranks', user.pk)
+    return True
+
+
+def sync_solve_awards(pairs):
+    """Make solve awards agree with passing submissions for (user_id, problem_id) pairs.
+
+    Returns the ids of users whose XP changed.
+    """
+    source_type = ContentType.objects.get_for_model(Problem)
+    changed = set()
+    for user_id, problem_id in pairs:
+        solved = Submission.objects.filter(user_id=user_id, problem_id=problem_id, passed=True).exists()
+        awarded = XPEvent.objects.filter(
+            user_id=user_id, reason='problem_solved', source_type=source_type, source_id=problem_id,
+            revoked_at=None,
+        ).exists()
+        if solved == awarded:
+            continue
+        user, problem = User.objects.get(pk=user_id), Problem.objects.get(pk=problem_id)
+        if solved:
+            award_xp(user, problem.points, 'problem_solved', source=problem)
+        else:
+            revoke_solve_award(user, problem)
+        changed.add(user_id)
+    return changed
+
+
+def reconcile_balances():
+    """Bring User.xp/level/problem_solved back in line with their sources.
+
+    XP is the sum of the user's ledger, level follows from XP, and
+    problem_solved is the number of distinct problems with a passing
+    submission. Returns the number of users corrected.
+    """
+    ledger = dict(
+        XPEvent.objects.values('user').annotate(total=Sum('delta')).values_list('user', 'total')
+    )
+    solved = dict(
+        Submission.objects.filter(passed=True)
+        .values('user').annotate(n=Count('problem', distinct=True)).values_list('user', 'n')
+    )
+
+    to_update = []
+    for u in User.objects.only('pk', 'xp', 'level', 'problem_solved').iterator(chunk_size=2000):
+        xp = ledger.get(u.pk, 0)
+        expected = (xp, level_for_xp(xp), solved.get(u.pk, 0))
+        if (u.xp, u.level, u.problem_solved) != expected:
+            u.xp, u.level, u.problem_solved = expected
+            to_update.append(u)
+
+    User.objects.bulk_update(to_update, ['xp', 'level', 'problem_solved'], batch_size=2000)
+    return len(to_update)